@@ -0,0 +1 @@
+# Offline benchmark suites (not shipped in the Docker image)
@@ -0,0 +1,352 @@
+"""
+Offline benchmark for the Telegram message queue (TelegramMessageQueue).
+
+Runs the queue against a fake Bot with configurable API latency, transient
+error rate and flood-control (retry_after) injection. No network or database
+is used.
+
+Throughput runs enqueue N messages at once (like a broadcast) and report
+delivered msg/s and p50/p99 enqueue-to-send latency. Memory runs enqueue
+large broadcasts that share one payload and report what the pending queue holds.
+
+Usage:
+    python -m benchmarks.queue_benchmark --sizes 500,2000 --latency-ms 80
+
+    # Scheduling overhead without Telegram's rate limit
+    python -m benchmarks.queue_benchmark --rate 5000 --burst 100 --per-chat-rate 0
+
+    # Flaky API: 2% network errors, 1% flood waits of 1s
+    python -m benchmarks.queue_benchmark --error-rate 0.02 --retry-after-rate 0.01
+
+    # Fail (exit code 1) if msg/s dropped or p99 grew by more than 20%
+    python -m benchmarks.queue_benchmark --json-out current.json \\
+        --baseline previous.json --max-regression 0.2
+"""
+import argparse
+import asyncio
+import json
+import logging
+import random
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass, asdict
+from datetime import datetime, timezone
+from typing import Any, List, Optional
+
+from aiogram.exceptions import TelegramNetworkError, TelegramRetryAfter
+from aiogram.methods import SendMessage
+
+from bot.utils import MessageContent, build_queue_call
+from bot.utils.message_queue import (
+    GLOBAL_BURST_SIZE,
+    GLOBAL_MESSAGES_PER_SECOND,
+    PRIORITY_BULK,
+    USER_QUEUE_MAX_PENDING,
+    QueuedMessage,
+    TelegramMessageQueue,
+)
+
+# Defaults mirror MessageQueueManager.user_queue
+DEFAULT_MAX_IN_FLIGHT = 10
+DEFAULT_PER_CHAT_RATE = 1.0
+DEFAULT_PER_CHAT_BURST = 3
+CHAT_ID_OFFSET = 10_000_000_000
+BROADCAST_TEXT = "Benchmark broadcast " + "x" * 400
+
+
+@dataclass
+class QueueBenchResult:
+    size: int
+    delivered: int
+    failed: int
+    wall_seconds: float
+    messages_per_second: float
+    p50_ms: float
+    p99_ms: float
+    retry_after: int
+    transient_retries: int
+    peak_pending: int
+
+
+@dataclass
+class BroadcastMemoryResult:
+    size: int
+    pending: int
+    payloads: int
+    queue_mb: float
+    traced_mb: float
+    bytes_per_message: float
+
+
+class FakeBot:
+    """Any bot method: waits `latency` and returns True, or raises an injected error"""
+
+    def __init__(self, latency_ms: float, jitter_ms: float, error_rate: float,
+                 retry_after_rate: float, retry_after_seconds: float, seed: int):
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.error_rate = error_rate
+        self.retry_after_rate = retry_after_rate
+        self.retry_after_seconds = retry_after_seconds
+        self.calls = 0
+        self._random = random.Random(seed)
+
+    def __getattr__(self, method_name: str):
+        async def call(**kwargs: Any) -> bool:
+            self.calls += 1
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+            await asyncio.sleep(delay)
+            roll = self._random.random()
+            if roll < self.retry_after_rate:
+                raise TelegramRetryAfter(
+                    method=SendMessage(chat_id=kwargs["chat_id"], text=""),
+                    message="Flood control exceeded",
+                    retry_after=self.retry_after_seconds,
+                )
+            if roll < self.retry_after_rate + self.error_rate:
+                raise TelegramNetworkError(
+                    method=SendMessage(chat_id=kwargs["chat_id"], text=""),
+                    message="Injected network error",
+                )
+            return True
+        return call
+
+
+def _build_queue(bot: FakeBot, args: argparse.Namespace,
+                 max_pending: Optional[int]) -> TelegramMessageQueue:
+    return TelegramMessageQueue(
+        bot=bot,
+        messages_per_second=args.rate,
+        burst_size=args.burst,
+        max_in_flight=args.max_in_flight,
+        per_chat_messages_per_second=args.per_chat_rate or None,
+        per_chat_burst_size=args.per_chat_burst,
+        max_pending=max_pending,
+    )
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[int(fraction * (len(sorted_values) - 1))]
+
+
+async def run_throughput(args: argparse.Namespace, size: int) -> QueueBenchResult:
+    bot = FakeBot(args.latency_ms, args.jitter_ms, args.error_rate,
+                  args.retry_after_rate, args.retry_after_seconds, args.seed)
+    queue = _build_queue(bot, args, USER_QUEUE_MAX_PENDING)
+    method_name, kwargs = build_queue_call(
+        MessageContent(content_type="text", text=BROADCAST_TEXT), parse_mode="HTML")
+
+    enqueued_at: List[float] = [0.0] * size
+    latencies: List[float] = []
+    failed = 0
+    finished = asyncio.Event()
+    done = 0
+
+    def make_callback(index: int):
+        async def on_result(result: Any) -> None:
+            nonlocal done, failed
+            done += 1
+            if isinstance(result, Exception):
+                failed += 1
+            else:
+                latencies.append(time.perf_counter() - enqueued_at[index])
+            if done == size:
+                finished.set()
+        return on_result
+
+    started = time.perf_counter()
+    for index in range(size):
+        await queue.add_message(QueuedMessage(
+            chat_id=CHAT_ID_OFFSET + index % args.chats,
+            method_name=method_name,
+            kwargs=kwargs,
+            callback=make_callback(index),
+            priority=PRIORITY_BULK,
+        ))
+        enqueued_at[index] = time.perf_counter()
+    await finished.wait()
+    wall_seconds = time.perf_counter() - started
+
+    latencies.sort()
+    return QueueBenchResult(
+        size=size,
+        delivered=len(latencies),
+        failed=failed,
+        wall_seconds=round(wall_seconds, 3),
+        messages_per_second=round(len(latencies) / wall_seconds, 1) if wall_seconds > 0 else 0.0,
+        p50_ms=round(_percentile(latencies, 0.50) * 1000, 1),
+        p99_ms=round(_percentile(latencies, 0.99) * 1000, 1),
+        retry_after=queue.counters["retry_after"],
+        transient_retries=queue.counters["transient_retries"],
+        peak_pending=queue.peak_pending,
+    )
+
+
+async def run_broadcast_memory(args: argparse.Namespace, size: int) -> BroadcastMemoryResult:
+    """Queue `size` bulk messages sharing one payload and measure them before any is sent"""
+    bot = FakeBot(args.latency_ms, args.jitter_ms, 0.0, 0.0, 0, args.seed)
+    # No max_pending: the whole broadcast has to sit in the queue to be measured
+    queue = _build_queue(bot, args, None)
+    method_name, kwargs = build_queue_call(
+        MessageContent(content_type="text", text=BROADCAST_TEXT), parse_mode="HTML")
+
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    # add_message never suspends without backpressure, so no sender runs in between
+    for index in range(size):
+        await queue.add_message(QueuedMessage(
+            chat_id=CHAT_ID_OFFSET + index,
+            method_name=method_name,
+            kwargs=kwargs,
+            priority=PRIORITY_BULK,
+        ))
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    usage = queue.memory_usage()
+    await queue.drain(0)
+
+    return BroadcastMemoryResult(
+        size=size,
+        pending=usage["messages"],
+        payloads=usage["payloads"],
+        queue_mb=round(usage["bytes"] / (1024 * 1024), 2),
+        traced_mb=round((after - before) / (1024 * 1024), 2),
+        bytes_per_message=round((after - before) / size, 1) if size else 0.0,
+    )
+
+
+def _print_throughput(results: List[QueueBenchResult]) -> None:
+    header = f"{'size':>8} {'delivered':>10} {'failed':>7} {'wall_s':>9} {'msg/s':>8} " \
+             f"{'p50_ms':>9} {'p99_ms':>9} {'retry_after':>12} {'transient':>10} {'peak':>7}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r.size:>8} {r.delivered:>10} {r.failed:>7} {r.wall_seconds:>9.3f} "
+              f"{r.messages_per_second:>8.1f} {r.p50_ms:>9.1f} {r.p99_ms:>9.1f} "
+              f"{r.retry_after:>12} {r.transient_retries:>10} {r.peak_pending:>7}")
+
+
+def _print_memory(results: List[BroadcastMemoryResult]) -> None:
+    header = f"{'broadcast':>10} {'pending':>9} {'payloads':>9} {'queue_mb':>9} " \
+             f"{'traced_mb':>10} {'bytes/msg':>10}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r.size:>10} {r.pending:>9} {r.payloads:>9} {r.queue_mb:>9.2f} "
+              f"{r.traced_mb:>10.2f} {r.bytes_per_message:>10.1f}")
+
+
+def compare_with_baseline(results: List[QueueBenchResult], baseline_path: str,
+                          max_regression: float) -> List[str]:
+    """Return human readable regressions against a previous --json-out file"""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {row["size"]: row for row in json.load(f)["throughput"]}
+
+    regressions: List[str] = []
+    for r in results:
+        previous = baseline.get(r.size)
+        if not previous:
+            continue
+        old_rate = previous.get("messages_per_second") or 0
+        if old_rate and r.messages_per_second < old_rate * (1 - max_regression):
+            regressions.append(
+                f"size={r.size}: messages_per_second {old_rate} -> {r.messages_per_second} "
+                f"({(r.messages_per_second / old_rate - 1) * 100:.1f}%)"
+            )
+        for metric in ("p50_ms", "p99_ms"):
+            old_value = previous.get(metric) or 0
+            new_value = getattr(r, metric)
+            if old_value and new_value > old_value * (1 + max_regression):
+                regressions.append(
+                    f"size={r.size}: {metric} {old_value} -> {new_value} "
+                    f"(+{(new_value / old_value - 1) * 100:.1f}%)"
+                )
+    return regressions
+
+
+def _parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the Telegram message queue with a fake Bot")
+    parser.add_argument("--sizes", default="500,2000",
+                        help="Comma-separated message counts for throughput runs")
+    parser.add_argument("--chats", type=int, default=1_000_000,
+                        help="Distinct chats the messages go to (fewer chats = per-chat limits matter)")
+    parser.add_argument("--broadcast-sizes", default="10000,100000",
+                        help="Comma-separated broadcast sizes for memory runs (empty to skip)")
+    parser.add_argument("--latency-ms", type=float, default=80.0, help="Fake API call latency")
+    parser.add_argument("--jitter-ms", type=float, default=40.0, help="Uniform +/- latency jitter")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="Share of calls failing with a transient network error")
+    parser.add_argument("--retry-after-rate", type=float, default=0.0,
+                        help="Share of calls answered with flood control (retry_after)")
+    parser.add_argument("--retry-after-seconds", type=float, default=1.0)
+    parser.add_argument("--rate", type=float, default=GLOBAL_MESSAGES_PER_SECOND,
+                        help="Queue-wide messages per second")
+    parser.add_argument("--burst", type=float, default=GLOBAL_BURST_SIZE)
+    parser.add_argument("--max-in-flight", type=int, default=DEFAULT_MAX_IN_FLIGHT)
+    parser.add_argument("--per-chat-rate", type=float, default=DEFAULT_PER_CHAT_RATE,
+                        help="Messages per second per chat (0 = no per-chat limit)")
+    parser.add_argument("--per-chat-burst", type=int, default=DEFAULT_PER_CHAT_BURST)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json-out", help="Write results as JSON to this path")
+    parser.add_argument("--baseline", help="Previous --json-out file to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2,
+                        help="Allowed relative drop of msg/s or growth of p50/p99 vs baseline")
+    parser.add_argument("--log-level", default="ERROR")
+    return parser.parse_args(argv)
+
+
+async def main(argv: Optional[List[str]] = None) -> int:
+    args = _parse_args(argv)
+    logging.basicConfig(level=args.log_level.upper(), stream=sys.stderr,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    if args.error_rate < 0 or args.retry_after_rate < 0 or args.error_rate + args.retry_after_rate >= 1:
+        print("--error-rate and --retry-after-rate must be non-negative and sum to less than 1.",
+              file=sys.stderr)
+        return 2
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    broadcast_sizes = [int(s) for s in args.broadcast_sizes.split(",") if s.strip()]
+
+    throughput: List[QueueBenchResult] = []
+    for size in sizes:
+        print(f"Queue benchmark: throughput size={size}", file=sys.stderr)
+        throughput.append(await run_throughput(args, size))
+    memory: List[BroadcastMemoryResult] = []
+    for size in broadcast_sizes:
+        print(f"Queue benchmark: broadcast memory size={size}", file=sys.stderr)
+        memory.append(await run_broadcast_memory(args, size))
+
+    if throughput:
+        _print_throughput(throughput)
+    if memory:
+        if throughput:
+            print()
+        _print_memory(memory)
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump({
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "options": {key: value for key, value in vars(args).items()
+                            if key not in ("json_out", "baseline", "log_level")},
+                "throughput": [asdict(r) for r in throughput],
+                "broadcast_memory": [asdict(r) for r in memory],
+            }, f, indent=2)
+
+    if args.baseline:
+        regressions = compare_with_baseline(throughput, args.baseline, args.max_regression)
+        if regressions:
+            print("\nRegressions vs baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print("\nNo regressions vs baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -13,9 +13,14 @@ from bot.middlewares.i18n import I18nMiddleware, get_i18n_instance, JsonI18n
 from bot.middlewares.ban_check_middleware import BanCheckMiddleware
 from bot.middlewares.action_logger_middleware import ActionLoggerMiddleware
 from bot.middlewares.profile_sync import ProfileSyncMiddleware
+from bot.middlewares.in_flight_updates import InFlightUpdatesMiddleware
+from bot.middlewares.read_session import ReadSessionMiddleware
+from bot.middlewares.query_stats import QueryStatsMiddleware, QueryStatsTagMiddleware
+from db.read_replica import ReadSessionRouter
 
 
-def build_dispatcher(settings: Settings, async_session_factory: sessionmaker) -> tuple[Dispatcher, Bot, Dict]:
+def build_dispatcher(settings: Settings, async_session_factory: sessionmaker,
+                     read_session_router: ReadSessionRouter) -> tuple[Dispatcher, Bot, Dict]:
     """
     Создаёт и настраивает диспетчер с ботом и всеми middleware
     
@@ -36,14 +41,29 @@ def build_dispatcher(settings: Settings, async_session_factory: sessionmaker) ->
 
         dp["i18n_instance"] = i18n_instance
         dp["async_session_factory"] = async_session_factory
+        dp["read_session_factory"] = read_session_router
 
         # Порядок middleware важен! Внешние выполняются первыми
+        dp.update.outer_middleware(InFlightUpdatesMiddleware())
+        # До сессии БД: учитываются и запросы middleware, и финальный commit
+        dp.update.outer_middleware(QueryStatsMiddleware(settings))
         dp.update.outer_middleware(DBSessionMiddleware(async_session_factory))
         dp.update.outer_middleware(I18nMiddleware(i18n=i18n_instance, settings=settings))
         dp.update.outer_middleware(ProfileSyncMiddleware())
         dp.update.outer_middleware(BanCheckMiddleware(settings=settings, i18n_instance=i18n_instance))
         dp.update.outer_middleware(ActionLoggerMiddleware(settings=settings))
 
+        # Обработчики с флагом read_replica читают с реплики (если она настроена)
+        read_session_middleware = ReadSessionMiddleware(read_session_router)
+        dp.message.middleware(read_session_middleware)
+        dp.callback_query.middleware(read_session_middleware)
+        dp.inline_query.middleware(read_session_middleware)
+
+        # Помечаем запросы апдейта роутером и обработчиком
+        query_stats_tag_middleware = QueryStatsTagMiddleware()
+        for observer in (dp.message, dp.callback_query, dp.inline_query, dp.pre_checkout_query):
+            observer.middleware(query_stats_tag_middleware)
+
         logging.info("Dispatcher and Bot successfully created with all middleware configured")
         
         return dp, bot, {"i18n_instance": i18n_instance}
@@ -14,6 +14,11 @@ from bot.services.stars_service import StarsService
 from bot.services.tribute_service import TributeService
 from bot.services.crypto_pay_service import CryptoPayService
 from bot.services.panel_webhook_service import PanelWebhookService
+from bot.services.unreachable_user_service import UnreachableUserService
+from bot.services.broadcast_service import BroadcastService
+from bot.services.message_log_retention_service import MessageLogRetentionService
+from bot.services.message_log_export_service import MessageLogExportService
+from db.read_replica import ReadSessionRouter
 
 
 def build_core_services(
@@ -22,6 +27,7 @@ def build_core_services(
     async_session_factory: sessionmaker,
     i18n: JsonI18n,
     bot_username_for_default_return: str,
+    read_session_router: ReadSessionRouter,
 ) -> Dict[str, Any]:
     """
     Создаёт все основные сервисы приложения
@@ -32,6 +38,7 @@ def build_core_services(
         async_session_factory: Фабрика сессий БД
         i18n: Экземпляр интернационализации
         bot_username_for_default_return: Username бота для YooKassa URL
+        read_session_router: Фабрика сессий для чтения (реплика или основная БД)
         
     Returns:
         Dict: Словарь со всеми сервисами
@@ -88,6 +95,18 @@ def build_core_services(
         # Panel Webhook Service
         panel_webhook_service = PanelWebhookService(bot, settings, i18n, async_session_factory, panel_service)
 
+        # Учёт пользователей, заблокировавших бота (для рассылок)
+        unreachable_user_service = UnreachableUserService(async_session_factory)
+
+        # Рассылки, сохраняемые в БД (продолжаются после перезапуска)
+        broadcast_service = BroadcastService(bot, settings, i18n, async_session_factory)
+
+        # Партиции журнала сообщений: создание новых месяцев, архив и удаление старых
+        message_log_retention_service = MessageLogRetentionService(settings, async_session_factory)
+
+        # Выгрузка журнала сообщений админам (потоково, в фоне)
+        message_log_export_service = MessageLogExportService(bot, settings, i18n, read_session_router)
+
         # YooKassa (последний, так как использует bot_username)
         yookassa_service = YooKassaService(
             shop_id=settings.YOOKASSA_SHOP_ID,
@@ -116,6 +135,10 @@ def build_core_services(
             "tribute_service": tribute_service,
             "panel_webhook_service": panel_webhook_service,
             "yookassa_service": yookassa_service,
+            "unreachable_user_service": unreachable_user_service,
+            "broadcast_service": broadcast_service,
+            "message_log_retention_service": message_log_retention_service,
+            "message_log_export_service": message_log_export_service,
         }
         
         logging.info(f"Successfully built {len(services)} core services")
@@ -1,8 +1,9 @@
 import asyncio
 import logging
+import signal
 from aiohttp import web
 from aiogram import Bot, Dispatcher
-from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler
 from sqlalchemy.orm import sessionmaker
 from typing import Dict, Any
 
@@ -45,7 +46,7 @@ async def build_and_start_web_app(
             app[key] = service
 
         # Настраиваем aiogram интеграцию с aiohttp
-        setup_application(app, dp, bot=bot)
+        _setup_dispatcher_lifecycle(app, dp, bot)
 
         # Настраиваем routes
         _setup_webhook_routes(app, settings)
@@ -58,6 +59,26 @@ async def build_and_start_web_app(
         raise
 
 
+def _setup_dispatcher_lifecycle(app: web.Application, dp: Dispatcher, bot: Bot) -> None:
+    """
+    Связывает startup/shutdown диспетчера с жизненным циклом приложения.
+
+    В отличие от setup_application из aiogram, shutdown диспетчера вызывается
+    в on_cleanup - после того, как сервер перестал принимать запросы и дождался
+    уже начатых, так что их обработка не попадает на закрытые сервисы и БД.
+    """
+    workflow_data = {"app": app, "dispatcher": dp, "bot": bot, **dp.workflow_data}
+
+    async def on_startup(*args, **kwargs) -> None:
+        await dp.emit_startup(**workflow_data)
+
+    async def on_cleanup(*args, **kwargs) -> None:
+        await dp.emit_shutdown(**workflow_data)
+
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+
+
 def _setup_webhook_routes(app: web.Application, settings: Settings) -> None:
     """
     Настраивает все webhook routes
@@ -125,10 +146,11 @@ async def _start_server(app: web.Application, settings: Settings) -> None:
         app: Web приложение
         settings: Настройки приложения
     """
+    # Создаём AppRunner; при остановке он ждёт начатые запросы не дольше таймаута
+    web_app_runner = web.AppRunner(
+        app, shutdown_timeout=settings.SHUTDOWN_REQUEST_TIMEOUT_SECONDS)
+    await web_app_runner.setup()
     try:
-        # Создаём AppRunner
-        web_app_runner = web.AppRunner(app)
-        await web_app_runner.setup()
         
         # Создаём TCP сайт
         site = web.TCPSite(
@@ -146,8 +168,9 @@ async def _start_server(app: web.Application, settings: Settings) -> None:
             f"🚀 AIOHTTP server started on http://{settings.WEB_SERVER_HOST}:{settings.WEB_SERVER_PORT}"
         )
 
-        # Ждём бесконечно (пока не будет отменено)
-        await asyncio.Event().wait()
+        # Ждём SIGTERM/SIGINT (или отмены задачи)
+        await _wait_for_stop_signal()
+        logging.warning("🛑 Stop signal received, shutting down web server...")
         
     except asyncio.CancelledError:
         logging.info("Web server task was cancelled")
@@ -155,6 +178,31 @@ async def _start_server(app: web.Application, settings: Settings) -> None:
     except Exception as e:
         logging.error(f"Error starting web server: {e}", exc_info=True)
         raise
+    finally:
+        # Перестаём принимать запросы, ждём начатые, затем on_cleanup -> shutdown диспетчера
+        await web_app_runner.cleanup()
+        logging.info("AIOHTTP server stopped")
+
+
+async def _wait_for_stop_signal() -> None:
+    """Ждёт SIGTERM или SIGINT"""
+    loop = asyncio.get_running_loop()
+    stop_event = asyncio.Event()
+    stop_signals = (signal.SIGTERM, signal.SIGINT)
+    try:
+        for sig in stop_signals:
+            loop.add_signal_handler(sig, stop_event.set)
+    except NotImplementedError:
+        # Windows: остановка только через KeyboardInterrupt / отмену задачи
+        pass
+    try:
+        await stop_event.wait()
+    finally:
+        for sig in stop_signals:
+            try:
+                loop.remove_signal_handler(sig)
+            except NotImplementedError:
+                pass
 
 
 def validate_webhook_config(settings: Settings) -> None:
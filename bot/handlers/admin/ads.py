@@ -9,6 +9,7 @@ from config.settings import Settings
 from bot.middlewares.i18n import JsonI18n
 from db.dal import ad_dal
 from bot.states.admin_states import AdminStates
+from bot.utils.page_cursor import PagePosition, build_nav, id_key, pages_label, parse_position
 
 router = Router(name="admin_ads_router")
 
@@ -16,7 +17,18 @@ router = Router(name="admin_ads_router")
 PAGE_SIZE = 5
 
 
-@router.callback_query(F.data == "admin_action:ads")
+async def _campaigns_page(session: AsyncSession, i18n: JsonI18n, current_lang: str,
+                          position: PagePosition):
+    campaigns, has_more = await ad_dal.list_campaigns_paged(
+        session, page_size=PAGE_SIZE, before=id_key(position.before), after=id_key(position.after))
+    nav = build_nav(position, [(c.ad_campaign_id,) for c in campaigns], has_more)
+    total_count, exact = await ad_dal.estimate_campaigns(session)
+    from bot.keyboards.inline.admin_keyboards import get_ads_list_keyboard
+    return campaigns, get_ads_list_keyboard(
+        i18n, current_lang, campaigns, nav, pages_label(total_count, exact, PAGE_SIZE, nav))
+
+
+@router.callback_query(F.data == "admin_action:ads", flags={"read_replica": True})
 async def show_ads_menu(callback: types.CallbackQuery, settings: Settings, i18n_data: dict, session: AsyncSession):
     current_lang = i18n_data.get("current_language", settings.DEFAULT_LANGUAGE)
     i18n: Optional[JsonI18n] = i18n_data.get("i18n_instance")
@@ -31,18 +43,13 @@ async def show_ads_menu(callback: types.CallbackQuery, settings: Settings, i18n_
     total_revenue = totals.get("revenue", 0.0)
     overview = _("admin_ads_overview", revenue=f"{total_revenue:.2f}", cost=f"{total_cost:.2f}")
 
-    total_count = await ad_dal.count_campaigns(session)
-    if total_count == 0:
+    campaigns, reply_markup = await _campaigns_page(session, i18n, current_lang, PagePosition())
+    if not campaigns:
         text = overview + "\n\n" + _("admin_ads_empty")
         from bot.keyboards.inline.admin_keyboards import get_ads_menu_keyboard
         reply_markup = get_ads_menu_keyboard(i18n, current_lang)
     else:
-        current_page = 0
-        total_pages = max(1, (total_count + PAGE_SIZE - 1) // PAGE_SIZE)
-        campaigns = await ad_dal.list_campaigns_paged(session, page=current_page, page_size=PAGE_SIZE)
         text = overview + "\n\n" + _("admin_ads_header")
-        from bot.keyboards.inline.admin_keyboards import get_ads_list_keyboard
-        reply_markup = get_ads_list_keyboard(i18n, current_lang, campaigns, current_page, total_pages)
     await callback.message.edit_text(text, reply_markup=reply_markup)
     try:
         await callback.answer()
@@ -50,7 +57,7 @@ async def show_ads_menu(callback: types.CallbackQuery, settings: Settings, i18n_
         pass
 
 
-@router.callback_query(F.data.startswith("admin_ads:page:"))
+@router.callback_query(F.data.startswith("admin_ads:page:"), flags={"read_replica": True})
 async def ads_list_pagination(callback: types.CallbackQuery, settings: Settings, i18n_data: dict, session: AsyncSession):
     current_lang = i18n_data.get("current_language", settings.DEFAULT_LANGUAGE)
     i18n: Optional[JsonI18n] = i18n_data.get("i18n_instance")
@@ -59,21 +66,12 @@ async def ads_list_pagination(callback: types.CallbackQuery, settings: Settings,
         await callback.answer("Language error.", show_alert=True)
         return
 
-    try:
-        page = int(callback.data.split(":")[2])
-    except Exception:
-        page = 0
+    position = parse_position(callback.data.split(":", 2)[2])
 
     totals = await ad_dal.get_totals(session)
     overview = _("admin_ads_overview", revenue=f"{totals.get('revenue', 0.0):.2f}", cost=f"{totals.get('cost', 0.0):.2f}")
-    total_count = await ad_dal.count_campaigns(session)
-    total_pages = max(1, (total_count + PAGE_SIZE - 1) // PAGE_SIZE)
-    page = max(0, min(page, total_pages - 1))
-
-    campaigns = await ad_dal.list_campaigns_paged(session, page=page, page_size=PAGE_SIZE)
     text = overview + "\n\n" + _("admin_ads_header")
-    from bot.keyboards.inline.admin_keyboards import get_ads_list_keyboard
-    reply_markup = get_ads_list_keyboard(i18n, current_lang, campaigns, page, total_pages)
+    _campaigns, reply_markup = await _campaigns_page(session, i18n, current_lang, position)
     try:
         await callback.message.edit_text(text, reply_markup=reply_markup)
         await callback.answer()
@@ -82,7 +80,7 @@ async def ads_list_pagination(callback: types.CallbackQuery, settings: Settings,
         await callback.answer()
 
 
-@router.callback_query(F.data.startswith("admin_ads:card:"))
+@router.callback_query(F.data.startswith("admin_ads:card:"), flags={"read_replica": True})
 async def show_ad_card(callback: types.CallbackQuery, settings: Settings, i18n_data: dict, session: AsyncSession):
     current_lang = i18n_data.get("current_language", settings.DEFAULT_LANGUAGE)
     i18n: Optional[JsonI18n] = i18n_data.get("i18n_instance")
@@ -93,7 +91,7 @@ async def show_ad_card(callback: types.CallbackQuery, settings: Settings, i18n_d
 
     parts = callback.data.split(":")
     camp_id = int(parts[2])
-    back_page = int(parts[3]) if len(parts) > 3 else 0
+    back_page = parts[3] if len(parts) > 3 else "0"
 
     camp = await ad_dal.get_campaign_by_id(session, camp_id)
     if not camp:
@@ -136,9 +134,8 @@ async def ads_delete_prompt(callback: types.CallbackQuery, settings: Settings, i
         return
 
     try:
-        _, _, camp_id_str, back_page_str = callback.data.split(":", 3)
+        _, _, camp_id_str, back_page = callback.data.split(":", 3)
         camp_id = int(camp_id_str)
-        back_page = int(back_page_str)
     except Exception:
         await callback.answer(i18n.gettext(current_lang, "error_try_again"), show_alert=True)
         return
@@ -171,7 +168,7 @@ async def ads_delete_cancel(callback: types.CallbackQuery, settings: Settings, i
     try:
         parts = callback.data.split(":", 3)
         camp_id = int(parts[2])
-        back_page = int(parts[3])
+        back_page = parts[3]
     except Exception:
         await callback.answer(_("error_try_again"), show_alert=True)
         return
@@ -217,7 +214,7 @@ async def ads_delete_confirm(callback: types.CallbackQuery, settings: Settings,
     try:
         parts = callback.data.split(":", 3)
         camp_id = int(parts[2])
-        back_page = int(parts[3])
+        back_page = parts[3]
     except Exception:
         await callback.answer(_("error_try_again"), show_alert=True)
         return
@@ -235,13 +232,9 @@ async def ads_delete_confirm(callback: types.CallbackQuery, settings: Settings,
         revenue=f"{totals.get('revenue', 0.0):.2f}",
         cost=f"{totals.get('cost', 0.0):.2f}",
     )
-    total_count = await ad_dal.count_campaigns(session)
-    total_pages = max(1, (total_count + PAGE_SIZE - 1) // PAGE_SIZE)
-    page = max(0, min(back_page, total_pages - 1))
-    campaigns = await ad_dal.list_campaigns_paged(session, page=page, page_size=PAGE_SIZE)
     text = overview + "\n\n" + _("admin_ads_header")
-    from bot.keyboards.inline.admin_keyboards import get_ads_list_keyboard
-    reply_markup = get_ads_list_keyboard(i18n, current_lang, campaigns, page, total_pages)
+    _campaigns, reply_markup = await _campaigns_page(
+        session, i18n, current_lang, parse_position(back_page))
     try:
         await callback.message.edit_text(text, reply_markup=reply_markup)
         await callback.answer(_("admin_ads_deleted_success"), show_alert=True)
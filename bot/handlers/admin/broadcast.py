@@ -1,6 +1,7 @@
 import logging
 import asyncio
 from aiogram import Router, F, types, Bot
+from aiogram.filters import Command
 from aiogram.exceptions import TelegramRetryAfter, TelegramBadRequest
 
 from aiogram.fsm.context import FSMContext
@@ -9,17 +10,19 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from config.settings import Settings
 
-from db.dal import user_dal, message_log_dal
+from db.dal import user_dal
 
 from bot.states.admin_states import AdminStates
 from bot.keyboards.inline.admin_keyboards import (
     get_broadcast_confirmation_keyboard,
     get_back_to_admin_panel_keyboard,
     get_admin_panel_keyboard,
+    get_broadcast_jobs_list_keyboard,
 )
 from bot.middlewares.i18n import JsonI18n
+from bot.services.broadcast_service import BroadcastService
 from bot.utils.message_queue import get_queue_manager
-from bot.utils import get_message_content, send_message_by_type, send_message_via_queue, MessageContent
+from bot.utils import get_message_content, send_message_by_type, MessageContent
 
 router = Router(name="admin_broadcast_router")
 
@@ -208,6 +211,7 @@ async def confirm_broadcast_callback_handler(
     bot: Bot,
     settings: Settings,
     session: AsyncSession,
+    broadcast_service: BroadcastService,
 ):
     current_lang = i18n_data.get("current_language", settings.DEFAULT_LANGUAGE)
     i18n: Optional[JsonI18n] = i18n_data.get("i18n_instance")
@@ -239,92 +243,33 @@ async def confirm_broadcast_callback_handler(
         await callback.message.edit_text(_("admin_broadcast_sending_started"), reply_markup=None)
         await callback.answer()
 
+        if not get_queue_manager():
+            await callback.message.edit_text("❌ Ошибка: система очередей не инициализирована", reply_markup=None)
+            await state.clear()
+            return
+
         target = user_fsm_data.get("broadcast_target", "all")
-        if target == "active":
-            user_ids = await user_dal.get_user_ids_with_active_subscription(session)
-        elif target == "inactive":
-            user_ids = await user_dal.get_user_ids_without_active_subscription(session)
-        else:
-            user_ids = await user_dal.get_all_active_user_ids_for_broadcast(session)
-
-        sent_count = 0
-        failed_count = 0
         admin_user = callback.from_user
         logging.info(
-            f"Admin {admin_user.id} broadcasting '{(content.text or '')[:50]}...' to {len(user_ids)} users."
+            f"Admin {admin_user.id} broadcasting '{(content.text or '')[:50]}...' to target '{target}'."
         )
 
-        # Get message queue manager
-        queue_manager = get_queue_manager()
-        if not queue_manager:
-            await callback.message.edit_text("❌ Ошибка: система очередей не инициализирована", reply_markup=None)
-            return
-
-        # Queue all messages for sending
-        for uid in user_ids:
-            try:
-                await send_message_via_queue(
-                    queue_manager, 
-                    uid, 
-                    content,
-                    parse_mode="HTML",
-                    disable_web_page_preview=True,
-                )
-                sent_count += 1
-                
-                # Log successful queuing
-                await message_log_dal.create_message_log(
-                    session,
-                    {
-                        "user_id": admin_user.id,
-                        "telegram_username": admin_user.username,
-                        "telegram_first_name": admin_user.first_name,
-                        "event_type": "admin_broadcast_queued",
-                        "content": f"To user {uid}: [{content.content_type}] {(content.text or '')[:70]}...",
-                        "is_admin_event": True,
-                        "target_user_id": uid,
-                    },
-                )
-            except Exception as e:
-                failed_count += 1
-                logging.warning(
-                    f"Failed to queue broadcast to {uid}: {type(e).__name__} – {e}"
-                )
-                await message_log_dal.create_message_log(
-                    session,
-                    {
-                        "user_id": admin_user.id,
-                        "telegram_username": admin_user.username,
-                        "telegram_first_name": admin_user.first_name,
-                        "event_type": "admin_broadcast_failed",
-                        "content": f"For user {uid}: {type(e).__name__} – {str(e)[:70]}...",
-                        "is_admin_event": True,
-                        "target_user_id": uid,
-                    },
-                )
-
-        try:
-            await session.commit()
-        except Exception as e_commit:
-            await session.rollback()
-            logging.error(f"Error committing broadcast logs: {e_commit}")
-
-        # Get queue stats for detailed report
-        queue_stats = queue_manager.get_queue_stats()
-        
-        result_message = f"""🚀 Рассылка поставлена в очередь!
-📤 В очередь добавлено: {sent_count}
-❌ Ошибок: {failed_count}
-
-📊 Статус очередей:
-👥 Очередь пользователей: {queue_stats['user_queue_size']} сообщений
-📢 Очередь групп: {queue_stats['group_queue_size']} сообщений
-
-ℹ️ Сообщения будут отправлены автоматически с соблюдением лимитов Telegram."""
-        await callback.message.answer(
-            result_message,
-            reply_markup=get_back_to_admin_panel_keyboard(current_lang, i18n),
+        # Задача рассылки сохраняется в БД и переживает перезапуск бота;
+        # это сообщение показывает её прогресс
+        job = await broadcast_service.create_job(
+            admin_id=admin_user.id,
+            target=target,
+            content=content,
+            progress_chat_id=callback.message.chat.id,
+            progress_message_id=callback.message.message_id,
+            admin_username=admin_user.username,
+            admin_first_name=admin_user.first_name,
         )
+        text, markup = broadcast_service.render_job_progress(job, current_lang)
+        try:
+            await callback.message.edit_text(text, reply_markup=markup)
+        except TelegramBadRequest:
+            pass
 
     elif action == "cancel":
         await callback.message.edit_text(
@@ -334,3 +279,94 @@ async def confirm_broadcast_callback_handler(
         await callback.answer()
 
     await state.clear()
+
+
+@router.callback_query(F.data.startswith("broadcast_job:"))
+async def broadcast_job_action_handler(
+    callback: types.CallbackQuery,
+    i18n_data: dict,
+    settings: Settings,
+    broadcast_service: BroadcastService,
+):
+    current_lang = i18n_data.get("current_language", settings.DEFAULT_LANGUAGE)
+    i18n: Optional[JsonI18n] = i18n_data.get("i18n_instance")
+    if not i18n or not callback.message:
+        await callback.answer("Error processing broadcast action.", show_alert=True)
+        return
+    _ = lambda key, **kwargs: i18n.gettext(current_lang, key, **kwargs)
+
+    try:
+        _prefix, action, job_id_str = callback.data.split(":")
+        job_id = int(job_id_str)
+    except ValueError:
+        await callback.answer("Invalid data.", show_alert=True)
+        return
+
+    actions = {
+        "pause": broadcast_service.pause_job,
+        "resume": broadcast_service.resume_job,
+        "cancel": broadcast_service.cancel_job,
+    }
+    if action in actions and not await actions[action](job_id):
+        await callback.answer(_("admin_broadcast_job_action_unavailable"), show_alert=True)
+        return
+
+    job = await broadcast_service.get_job(job_id)
+    if not job:
+        await callback.answer(_("admin_broadcast_job_not_found"), show_alert=True)
+        return
+
+    text, markup = broadcast_service.render_job_progress(job, current_lang)
+    try:
+        await callback.message.edit_text(text, reply_markup=markup)
+    except TelegramBadRequest:
+        # "message is not modified" when nothing changed since the last refresh
+        pass
+    await callback.answer()
+
+
+@router.message(Command("broadcasts"))
+async def broadcast_jobs_command(
+    message: types.Message,
+    i18n_data: dict,
+    settings: Settings,
+    broadcast_service: BroadcastService,
+):
+    """Recent broadcast jobs, each opens its progress card"""
+    current_lang = i18n_data.get("current_language", settings.DEFAULT_LANGUAGE)
+    i18n: Optional[JsonI18n] = i18n_data.get("i18n_instance")
+    if not i18n:
+        await message.reply("Language service error.")
+        return
+    _ = lambda key, **kwargs: i18n.gettext(current_lang, key, **kwargs)
+
+    jobs = await broadcast_service.get_recent_jobs(limit=10)
+    await message.answer(
+        _("admin_broadcast_jobs_title") if jobs else _("admin_broadcast_jobs_empty"),
+        reply_markup=get_broadcast_jobs_list_keyboard(jobs, current_lang, i18n),
+    )
+
+
+@router.message(Command("reset_unreachable"))
+async def reset_unreachable_users_command(
+    message: types.Message,
+    i18n_data: dict,
+    settings: Settings,
+    session: AsyncSession,
+):
+    """Clear "bot blocked" / "chat not found" flags so the next broadcast re-checks these users"""
+    current_lang = i18n_data.get("current_language", settings.DEFAULT_LANGUAGE)
+    i18n: Optional[JsonI18n] = i18n_data.get("i18n_instance")
+    if not i18n:
+        await message.reply("Language service error.")
+        return
+    _ = lambda key, **kwargs: i18n.gettext(current_lang, key, **kwargs)
+
+    reset_count = await user_dal.reset_unreachable_users(session)
+    await session.commit()
+    logging.info(f"Admin {message.from_user.id} reset unreachable flags for {reset_count} users.")
+    await message.answer(_(
+        "admin_unreachable_reset_done",
+        default="✅ Сброшены отметки недоступности: {count}. Эти пользователи снова попадут в рассылку.",
+        count=reset_count,
+    ))
@@ -16,6 +16,8 @@ from bot.middlewares.i18n import JsonI18n
 from bot.services.panel_api_service import PanelApiService
 from bot.services.subscription_service import SubscriptionService
 from bot.utils.message_queue import get_queue_manager
+from db.database_setup import get_db_pool_stats, get_replica_stats
+from db.query_metrics import get_handler_query_stats
 
 from . import broadcast as admin_broadcast_handlers
 from .promo import create as admin_promo_create_handlers
@@ -28,6 +30,18 @@ from . import logs_admin as admin_logs_handlers
 
 router = Router(name="admin_common_router")
 
+# Panel actions that only read: served from the read replica when there is one
+READ_ONLY_ADMIN_ACTIONS = {
+    "stats", "users_stats", "revenue_stats", "support_stats", "users_list",
+    "view_banned", "view_promos", "promo_management", "view_logs_menu",
+    "view_payments", "ads",
+}
+
+
+def _read_only_admin_action(callback: types.CallbackQuery, data: dict) -> bool:
+    action_parts = (callback.data or "").split(":")
+    return len(action_parts) > 1 and action_parts[1] in READ_ONLY_ADMIN_ACTIONS
+
 
 async def update_all_user_names_from_admin_panel(
     message: types.Message,
@@ -138,7 +152,8 @@ async def admin_panel_command_handler(
                              i18n, current_lang, settings))
 
 
-@router.callback_query(F.data.startswith("admin_action:"))
+@router.callback_query(F.data.startswith("admin_action:"),
+                       flags={"read_replica": _read_only_admin_action})
 async def admin_panel_actions_callback_handler(
         callback: types.CallbackQuery, state: FSMContext, settings: Settings,
         i18n_data: dict, bot: Bot, panel_service: PanelApiService,
@@ -237,7 +252,7 @@ async def admin_panel_actions_callback_handler(
             session=session)
         await callback.answer(_("admin_sync_initiated_from_panel"))
     elif action == "queue_status":
-        await show_queue_status_handler(callback, i18n_data)
+        await show_queue_status_handler(callback, i18n_data, settings)
     elif action == "view_payments":
         from . import payments as admin_payments_handlers
         await admin_payments_handlers.view_payments_handler(
@@ -324,7 +339,8 @@ async def admin_section_handler(callback: types.CallbackQuery, state: FSMContext
         await callback.answer()
 
 
-async def show_queue_status_handler(callback: types.CallbackQuery, i18n_data: dict):
+async def show_queue_status_handler(callback: types.CallbackQuery, i18n_data: dict,
+                                    settings: Settings):
     """Show message queue status to admin"""
     current_lang = i18n_data.get("current_language", "ru")
     i18n: Optional[JsonI18n] = i18n_data.get("i18n_instance")
@@ -352,12 +368,48 @@ async def show_queue_status_handler(callback: types.CallbackQuery, i18n_data: di
         message_text = _(
             "admin_queue_status_info",
             user_queue_size=stats['user_queue_size'],
+            user_transactional=stats['user_pending_by_priority']['transactional'],
+            user_interactive=stats['user_pending_by_priority']['interactive'],
+            user_bulk=stats['user_pending_by_priority']['bulk'],
+            user_peak=stats['user_peak_pending'],
+            user_memory_kb=stats['user_memory']['bytes'] // 1024,
             user_processing="✅ Да" if stats['user_queue_processing'] else "❌ Нет",
             user_recent=stats['user_recent_sends'],
             group_queue_size=stats['group_queue_size'],
             group_processing="✅ Да" if stats['group_queue_processing'] else "❌ Нет",
-            group_recent=stats['group_recent_sends']
+            group_recent=stats['group_recent_sends'],
+            user_retries=stats['user_counters']['retry_after'] + stats['user_counters']['transient_retries'],
+            user_dead_letters=stats['user_dead_letters'],
+            group_retries=stats['group_counters']['retry_after'] + stats['group_counters']['transient_retries'],
+            group_dead_letters=stats['group_dead_letters'],
         )
+        pool_stats = get_db_pool_stats()
+        if pool_stats:
+            message_text += _(
+                "admin_db_pool_status_info",
+                max_overflow=settings.DB_POOL_MAX_OVERFLOW,
+                **pool_stats,
+            )
+        replica_stats = get_replica_stats()
+        if replica_stats:
+            replica_usable = replica_stats.pop("replica_usable")
+            state_key = ("admin_db_replica_state_unchecked" if replica_usable is None
+                         else "admin_db_replica_state_in_use" if replica_usable
+                         else "admin_db_replica_state_fallback")
+            lag_seconds = replica_stats.pop("lag_seconds")
+            max_lag_seconds = replica_stats.pop("max_lag_seconds")
+            message_text += _(
+                "admin_db_replica_status_info",
+                state=_(state_key),
+                lag="?" if lag_seconds is None else f"{lag_seconds:.1f}",
+                max_lag_seconds=f"{max_lag_seconds:.0f}",
+                **replica_stats,
+            )
+        handler_query_stats = get_handler_query_stats()
+        if handler_query_stats:
+            message_text += _("admin_db_query_stats_header")
+            for row in handler_query_stats:
+                message_text += _("admin_db_query_stats_line", **row)
         
         from bot.keyboards.inline.admin_keyboards import get_back_to_admin_panel_keyboard
         
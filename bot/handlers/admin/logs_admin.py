@@ -1,10 +1,8 @@
 import logging
-import math
 import re
-import csv
-import io
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from aiogram import Router, F, types, Bot
+from aiogram.filters import StateFilter
 from aiogram.fsm.context import FSMContext
 from typing import Optional, List, Dict, Any
 
@@ -18,13 +16,20 @@ from db.models import MessageLog, User
 from bot.states.admin_states import AdminStates
 from bot.keyboards.inline.admin_keyboards import (
     get_logs_menu_keyboard, get_logs_pagination_keyboard,
-    get_back_to_admin_panel_keyboard)
+    get_logs_export_keyboard, get_back_to_admin_panel_keyboard)
 from bot.middlewares.i18n import JsonI18n
+from bot.services.message_log_export_service import LogExportFilters, MessageLogExportService
+from bot.utils.page_cursor import (
+    PageNav, PagePosition, build_nav, pages_label, parse_position, timestamp_key)
 
 router = Router(name="admin_logs_router")
 USERNAME_REGEX = re.compile(r"^[a-zA-Z0-9_]{5,32}$")
 
 
+def _log_key(log: MessageLog):
+    return (log.timestamp, log.log_id)
+
+
 async def display_logs_menu(callback: types.CallbackQuery, i18n_data: dict,
                             settings: Settings, session: AsyncSession):
     current_lang = i18n_data.get("current_language", settings.DEFAULT_LANGUAGE)
@@ -50,9 +55,8 @@ async def display_logs_menu(callback: types.CallbackQuery, i18n_data: dict,
 
 async def _display_formatted_logs(target_message: types.Message,
                                   logs: List[MessageLog],
-                                  total_logs: int,
-                                  current_page_idx: int,
-                                  settings: Settings,
+                                  nav: PageNav,
+                                  total_pages: str,
                                   title_key: str,
                                   base_pagination_callback_data: str,
                                   i18n: JsonI18n,
@@ -60,25 +64,22 @@ async def _display_formatted_logs(target_message: types.Message,
                                   title_kwargs: Optional[Dict[str,
                                                               Any]] = None):
     _ = lambda key, **kwargs: i18n.gettext(current_lang, key, **kwargs)
-    page_size = settings.LOGS_PAGE_SIZE
     actual_title_kwargs = title_kwargs or {}
-
-    if not logs and total_logs == 0:
+    reply_markup = get_logs_pagination_keyboard(
+        nav,
+        base_pagination_callback_data,
+        i18n,
+        current_lang,
+        back_to_logs_menu=True)
+
+    if not logs:
         text = _(
-            title_key, current_page=1, total_pages=1, **
+            title_key, current_page=nav.page + 1, total_pages=total_pages, **
             actual_title_kwargs) + "\n\n" + _("admin_no_logs_found")
-        reply_markup = get_logs_pagination_keyboard(
-            current_page_idx,
-            1,
-            base_pagination_callback_data,
-            i18n,
-            current_lang,
-            back_to_logs_menu=True)
     else:
-        total_pages = math.ceil(total_logs / page_size) if page_size > 0 else 1
         text = _(title_key,
-                 current_page=current_page_idx + 1,
-                 total_pages=max(1, total_pages),
+                 current_page=nav.page + 1,
+                 total_pages=total_pages,
                  **actual_title_kwargs) + "\n"
 
         log_entries_text = []
@@ -115,13 +116,6 @@ async def _display_formatted_logs(target_message: types.Message,
                   event_type=log_entry_model.event_type or 'N/A',
                   content_preview=content_preview).replace("\n", "\n  "))
         text += "\n\n".join(log_entries_text)
-        reply_markup = get_logs_pagination_keyboard(
-            current_page_idx,
-            total_pages,
-            base_pagination_callback_data,
-            i18n,
-            current_lang,
-            back_to_logs_menu=True)
 
     try:
         await target_message.edit_text(text,
@@ -153,17 +147,12 @@ async def _display_formatted_logs(target_message: types.Message,
                 break
 
 
-@router.callback_query(F.data.startswith("admin_logs:view_all"))
+@router.callback_query(F.data.startswith("admin_logs:view_all"), flags={"read_replica": True})
 async def view_all_logs_handler(callback: types.CallbackQuery,
                                 settings: Settings, i18n_data: dict,
                                 session: AsyncSession):
-    page_idx = 0
     parts = callback.data.split(":")
-    if len(parts) == 3:
-        try:
-            page_idx = int(parts[2])
-        except ValueError:
-            page_idx = 0
+    position = parse_position(parts[2] if len(parts) == 3 else "0")
 
     i18n: Optional[JsonI18n] = i18n_data.get("i18n_instance")
     current_lang = i18n_data.get("current_language", settings.DEFAULT_LANGUAGE)
@@ -171,16 +160,18 @@ async def view_all_logs_handler(callback: types.CallbackQuery,
         await callback.answer("Error processing request.", show_alert=True)
         return
 
-    logs_models = await message_log_dal.get_all_message_logs(
-        session, settings.LOGS_PAGE_SIZE, page_idx * settings.LOGS_PAGE_SIZE)
-    total_logs_count = await message_log_dal.count_all_message_logs(session)
+    logs_models, has_more = await message_log_dal.get_message_logs_page(
+        session, settings.LOGS_PAGE_SIZE,
+        before=timestamp_key(position.before),
+        after=timestamp_key(position.after))
+    total_logs, exact = await message_log_dal.estimate_all_message_logs(session)
+    nav = build_nav(position, [_log_key(log) for log in logs_models], has_more)
 
     await _display_formatted_logs(
         target_message=callback.message,
         logs=logs_models,
-        total_logs=total_logs_count,
-        current_page_idx=page_idx,
-        settings=settings,
+        nav=nav,
+        total_pages=pages_label(total_logs, exact, settings.LOGS_PAGE_SIZE, nav),
         title_key="admin_all_logs_title",
         base_pagination_callback_data="admin_logs:view_all",
         i18n=i18n,
@@ -208,7 +199,7 @@ async def prompt_user_for_logs_handler(callback: types.CallbackQuery,
     await callback.answer()
 
 
-@router.message(AdminStates.waiting_for_user_id_for_logs, F.text)
+@router.message(AdminStates.waiting_for_user_id_for_logs, F.text, flags={"read_replica": True})
 async def process_user_id_for_logs_handler(message: types.Message,
                                            state: FSMContext,
                                            settings: Settings, i18n_data: dict,
@@ -247,17 +238,18 @@ async def process_user_id_for_logs_handler(message: types.Message,
         f"@{user_model_for_logs.username}"
         if user_model_for_logs.username else f"ID {target_user_id}")
 
-    logs_models = await message_log_dal.get_user_message_logs(
-        session, target_user_id, settings.LOGS_PAGE_SIZE, 0)
-    total_user_logs_count = await message_log_dal.count_user_message_logs(
+    position = PagePosition()
+    logs_models, has_more = await message_log_dal.get_message_logs_page(
+        session, settings.LOGS_PAGE_SIZE, user_id=target_user_id)
+    total_user_logs, exact = await message_log_dal.estimate_user_message_logs(
         session, target_user_id)
+    nav = build_nav(position, [_log_key(log) for log in logs_models], has_more)
 
     await _display_formatted_logs(
         target_message=message,
         logs=logs_models,
-        total_logs=total_user_logs_count,
-        current_page_idx=0,
-        settings=settings,
+        nav=nav,
+        total_pages=pages_label(total_user_logs, exact, settings.LOGS_PAGE_SIZE, nav),
         title_key="admin_user_logs_title",
         base_pagination_callback_data=f"admin_logs:view_user:{target_user_id}",
         i18n=i18n,
@@ -265,14 +257,14 @@ async def process_user_id_for_logs_handler(message: types.Message,
         title_kwargs={"user_display": user_display_name})
 
 
-@router.callback_query(F.data.startswith("admin_logs:view_user:"))
+@router.callback_query(F.data.startswith("admin_logs:view_user:"), flags={"read_replica": True})
 async def view_user_logs_paginated_handler(callback: types.CallbackQuery,
                                            settings: Settings, i18n_data: dict,
                                            session: AsyncSession):
     try:
         parts = callback.data.split(":")
         target_user_id = int(parts[2])
-        page_idx = int(parts[3])
+        position = parse_position(parts[3])
     except (IndexError, ValueError):
         await callback.answer("Invalid log request format.", show_alert=True)
         return
@@ -294,18 +286,19 @@ async def view_user_logs_paginated_handler(callback: types.CallbackQuery,
         f"@{user_model_for_logs.username}"
         if user_model_for_logs.username else f"ID {target_user_id}")
 
-    logs_models = await message_log_dal.get_user_message_logs(
-        session, target_user_id, settings.LOGS_PAGE_SIZE,
-        page_idx * settings.LOGS_PAGE_SIZE)
-    total_user_logs_count = await message_log_dal.count_user_message_logs(
+    logs_models, has_more = await message_log_dal.get_message_logs_page(
+        session, settings.LOGS_PAGE_SIZE, user_id=target_user_id,
+        before=timestamp_key(position.before),
+        after=timestamp_key(position.after))
+    total_user_logs, exact = await message_log_dal.estimate_user_message_logs(
         session, target_user_id)
+    nav = build_nav(position, [_log_key(log) for log in logs_models], has_more)
 
     await _display_formatted_logs(
         target_message=callback.message,
         logs=logs_models,
-        total_logs=total_user_logs_count,
-        current_page_idx=page_idx,
-        settings=settings,
+        nav=nav,
+        total_pages=pages_label(total_user_logs, exact, settings.LOGS_PAGE_SIZE, nav),
         title_key="admin_user_logs_title",
         base_pagination_callback_data=f"admin_logs:view_user:{target_user_id}",
         i18n=i18n,
@@ -315,7 +308,8 @@ async def view_user_logs_paginated_handler(callback: types.CallbackQuery,
 
 
 @router.callback_query(F.data == "admin_action:view_logs_menu",
-                       AdminStates.waiting_for_user_id_for_logs)
+                       StateFilter(AdminStates.waiting_for_user_id_for_logs,
+                                   AdminStates.waiting_for_logs_export_filters))
 async def cancel_log_user_input_state_to_menu(callback: types.CallbackQuery,
                                               state: FSMContext,
                                               settings: Settings,
@@ -326,10 +320,57 @@ async def cancel_log_user_input_state_to_menu(callback: types.CallbackQuery,
     await display_logs_menu(callback, i18n_data, settings, session)
 
 
+def _parse_export_date(value: str) -> datetime:
+    return datetime.strptime(value, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+
+
+async def _parse_export_filters(text: str, session: AsyncSession) -> LogExportFilters:
+    """
+    "from:2025-01-01 to:2025-01-31 user:123 event:start"; any part may be
+    left out, "to" is inclusive. Raises ValueError on unknown input.
+    """
+    values: Dict[str, Any] = {}
+    for token in text.split():
+        key, sep, value = token.partition(":")
+        if not sep or not value:
+            raise ValueError(token)
+        key = key.lower()
+        if key == "from":
+            values["since"] = _parse_export_date(value)
+        elif key == "to":
+            values["until"] = _parse_export_date(value) + timedelta(days=1)
+        elif key == "user":
+            if value.isdigit():
+                values["user_id"] = int(value)
+            else:
+                user = await user_dal.get_user_by_username(session, value.lstrip("@"))
+                if not user:
+                    raise LookupError(value)
+                values["user_id"] = user.user_id
+        elif key == "event":
+            values["event_type"] = value
+        else:
+            raise ValueError(token)
+    return LogExportFilters(**values)
+
+
+async def _start_logs_export(message: types.Message, chat_id: int,
+                             filters: LogExportFilters,
+                             message_log_export_service: MessageLogExportService,
+                             i18n: JsonI18n, current_lang: str):
+    _ = lambda key, **kwargs: i18n.gettext(current_lang, key, **kwargs)
+    if message_log_export_service.start_export(chat_id, current_lang, filters):
+        await message.answer(_("admin_logs_csv_export_started"),
+                             reply_markup=get_logs_menu_keyboard(i18n, current_lang))
+    else:
+        await message.answer(_("admin_logs_export_already_running"))
+
+
 @router.callback_query(F.data == "admin_logs:export_csv")
 async def export_logs_csv_handler(callback: types.CallbackQuery,
-                                 settings: Settings, i18n_data: dict,
-                                 session: AsyncSession):
+                                  state: FSMContext,
+                                  settings: Settings, i18n_data: dict,
+                                  session: AsyncSession):
     i18n: Optional[JsonI18n] = i18n_data.get("i18n_instance")
     current_lang = i18n_data.get("current_language", settings.DEFAULT_LANGUAGE)
     if not i18n or not callback.message:
@@ -337,93 +378,56 @@ async def export_logs_csv_handler(callback: types.CallbackQuery,
         return
     _ = lambda key, **kwargs: i18n.gettext(current_lang, key, **kwargs)
 
-    await callback.answer(_(
-        "admin_logs_csv_export_started",
-        default="🔄 Начинаю экспорт логов в CSV..."
-    ))
+    await callback.message.edit_text(
+        text=_("admin_logs_export_prompt"),
+        reply_markup=get_logs_export_keyboard(i18n, current_lang),
+        parse_mode="HTML")
+    await state.set_state(AdminStates.waiting_for_logs_export_filters)
+    await callback.answer()
+
+
+@router.callback_query(F.data == "admin_logs:export_csv:all")
+async def export_all_logs_csv_handler(callback: types.CallbackQuery,
+                                      state: FSMContext,
+                                      settings: Settings, i18n_data: dict,
+                                      message_log_export_service: MessageLogExportService):
+    await state.clear()
+    i18n: Optional[JsonI18n] = i18n_data.get("i18n_instance")
+    current_lang = i18n_data.get("current_language", settings.DEFAULT_LANGUAGE)
+    if not i18n or not callback.message:
+        await callback.answer("Error processing CSV export.", show_alert=True)
+        return
 
+    await _start_logs_export(callback.message, callback.message.chat.id, LogExportFilters(),
+                             message_log_export_service, i18n, current_lang)
+    await callback.answer()
+
+
+@router.message(AdminStates.waiting_for_logs_export_filters, F.text)
+async def process_logs_export_filters_handler(message: types.Message,
+                                              state: FSMContext,
+                                              settings: Settings, i18n_data: dict,
+                                              session: AsyncSession,
+                                              message_log_export_service: MessageLogExportService):
+    i18n: Optional[JsonI18n] = i18n_data.get("i18n_instance")
+    current_lang = i18n_data.get("current_language", settings.DEFAULT_LANGUAGE)
+    if not i18n:
+        await message.reply("Language service error.")
+        return
+    _ = lambda key, **kwargs: i18n.gettext(current_lang, key, **kwargs)
+
+    input_text = (message.text or "").strip()
     try:
-        # Get all logs (limit to 10000 for performance)
-        logs_models = await message_log_dal.get_all_message_logs(
-            session, limit=10000, offset=0)
-        
-        if not logs_models:
-            await callback.message.answer(_(
-                "admin_logs_csv_no_data",
-                default="❌ Нет данных для экспорта"
-            ))
-            return
-
-        # Create CSV content
-        csv_buffer = io.StringIO()
-        csv_writer = csv.writer(csv_buffer, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL)
-        
-        # Write header
-        headers = [
-            _("admin_csv_header_log_id", default="Log ID"),
-            _("admin_csv_header_timestamp", default="Timestamp"),
-            _("admin_csv_header_user_id", default="User ID"),
-            _("admin_csv_header_telegram_username", default="Telegram Username"),
-            _("admin_csv_header_telegram_first_name", default="Telegram First Name"),
-            _("admin_csv_header_event_type", default="Event Type"),
-            _("admin_csv_header_content", default="Content"),
-            _("admin_csv_header_is_admin_event", default="Is Admin Event"),
-            _("admin_csv_header_target_user_id", default="Target User ID"),
-            _("admin_csv_header_raw_update_preview", default="Raw Update Preview")
-        ]
-        csv_writer.writerow(headers)
-        
-        # Write data rows
-        for log in logs_models:
-            # Format timestamp
-            timestamp_str = log.timestamp.strftime('%Y-%m-%d %H:%M:%S UTC') if log.timestamp else ''
-            
-            # Clean content and raw_update_preview (remove newlines and quotes for CSV)
-            content_clean = (log.content or '').replace('\n', ' ').replace('\r', ' ').strip()
-            raw_update_clean = (log.raw_update_preview or '').replace('\n', ' ').replace('\r', ' ').strip()
-            
-            row = [
-                log.log_id or '',
-                timestamp_str,
-                log.user_id or '',
-                log.telegram_username or '',
-                log.telegram_first_name or '',
-                log.event_type or '',
-                content_clean,
-                'Yes' if log.is_admin_event else 'No',
-                log.target_user_id or '',
-                raw_update_clean
-            ]
-            csv_writer.writerow(row)
-        
-        # Create file
-        csv_content = csv_buffer.getvalue()
-        csv_buffer.close()
-        
-        # Generate filename with current timestamp
-        now = datetime.now()
-        filename = f"message_logs_{now.strftime('%Y%m%d_%H%M%S')}.csv"
-        
-        # Send as document
-        csv_file = types.BufferedInputFile(
-            csv_content.encode('utf-8-sig'),  # BOM for Excel compatibility
-            filename=filename
-        )
-        
-        await callback.message.answer_document(
-            csv_file,
-            caption=_(
-                "admin_logs_csv_export_success",
-                default="✅ Экспорт логов завершен!\n\n📊 Записей: {count}\n📅 Дата экспорта: {date}",
-                count=len(logs_models),
-                date=now.strftime('%Y-%m-%d %H:%M:%S')
-            )
-        )
-        
-    except Exception as e:
-        logging.error(f"Error exporting logs to CSV: {e}", exc_info=True)
-        await callback.message.answer(_(
-            "admin_logs_csv_export_failed",
-            default="❌ Ошибка при экспорте логов: {error}",
-            error=str(e)
-        ))
+        filters = await _parse_export_filters(input_text, session)
+    except LookupError as e:
+        await message.answer(_("admin_log_user_not_found", input=str(e)))
+        return
+    except ValueError:
+        await message.answer(_("admin_logs_export_bad_filters"),
+                             reply_markup=get_logs_export_keyboard(i18n, current_lang),
+                             parse_mode="HTML")
+        return
+
+    await state.clear()
+    await _start_logs_export(message, message.chat.id, filters,
+                             message_log_export_service, i18n, current_lang)
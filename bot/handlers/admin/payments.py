@@ -140,7 +140,7 @@ async def view_payments_handler(callback: types.CallbackQuery, i18n_data: dict,
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("payments_page:"))
+@router.callback_query(F.data.startswith("payments_page:"), flags={"read_replica": True})
 async def payments_pagination_handler(callback: types.CallbackQuery, i18n_data: dict, 
                                     settings: Settings, session: AsyncSession):
     """Handle pagination for payments list."""
@@ -151,7 +151,7 @@ async def payments_pagination_handler(callback: types.CallbackQuery, i18n_data:
         await callback.answer("Error processing pagination.", show_alert=True)
 
 
-@router.callback_query(F.data == "payments_export_csv")
+@router.callback_query(F.data == "payments_export_csv", flags={"read_replica": True})
 async def export_payments_csv_handler(callback: types.CallbackQuery, i18n_data: dict, 
                                     settings: Settings, session: AsyncSession):
     """Export all successful payments to CSV file."""
@@ -15,6 +15,7 @@ from bot.states.admin_states import AdminStates
 from bot.keyboards.inline.admin_keyboards import get_back_to_admin_panel_keyboard, get_admin_panel_keyboard
 from aiogram.utils.keyboard import InlineKeyboardBuilder, InlineKeyboardButton
 from bot.middlewares.i18n import JsonI18n
+from bot.utils.page_cursor import PagePosition, build_nav, id_key, pages_label, parse_position
 
 router = Router(name="promo_manage_router")
 
@@ -87,7 +88,7 @@ async def view_promo_codes_handler(callback: types.CallbackQuery, i18n_data: dic
     await callback.answer()
 
 
-async def promo_management_handler(callback: types.CallbackQuery, i18n_data: dict, settings: Settings, session: AsyncSession, page: int = 0):
+async def promo_management_handler(callback: types.CallbackQuery, i18n_data: dict, settings: Settings, session: AsyncSession, position: PagePosition = PagePosition()):
     current_lang = i18n_data.get("current_language", "ru")
     i18n: Optional[JsonI18n] = i18n_data.get("i18n_instance")
     if not i18n or not callback.message:
@@ -96,18 +97,19 @@ async def promo_management_handler(callback: types.CallbackQuery, i18n_data: dic
     _ = lambda key, **kwargs: i18n.gettext(current_lang, key, **kwargs)
 
     page_size = 10  # Количество промокодов на странице
-    offset = page * page_size
-    
-    # Получаем общее количество промокодов
-    total_count = await promo_code_dal.get_promo_codes_count(session)
-    total_pages = (total_count + page_size - 1) // page_size if total_count > 0 else 1
-    
-    promo_models = await promo_code_dal.get_all_promo_codes_with_details(session, limit=page_size, offset=offset)
-    if not promo_models and page == 0:
+
+    promo_models, has_more = await promo_code_dal.get_all_promo_codes_with_details(
+        session, limit=page_size, before=id_key(position.before), after=id_key(position.after))
+    nav = build_nav(position, [(p.promo_code_id,) for p in promo_models], has_more)
+    if not promo_models and nav.page == 0 and nav.prev is None:
         await callback.message.edit_text(_("admin_promo_management_empty"), reply_markup=get_back_to_admin_panel_keyboard(current_lang, i18n), parse_mode="HTML")
         await callback.answer()
         return
 
+    # Примерное количество промокодов (точное для небольших таблиц)
+    total_count, exact = await promo_code_dal.estimate_promo_codes_count(session)
+    total_pages = pages_label(total_count, exact, page_size, nav)
+
     builder = InlineKeyboardBuilder()
     for promo in promo_models:
         status_emoji, status_text = get_promo_status_emoji_and_text(promo, i18n, current_lang)
@@ -115,15 +117,13 @@ async def promo_management_handler(callback: types.CallbackQuery, i18n_data: dic
         builder.row(InlineKeyboardButton(text=button_text, callback_data=f"promo_detail:{promo.promo_code_id}"))
     
     # Добавляем кнопки пагинации если есть больше одной страницы
-    if total_pages > 1:
-        pagination_buttons = []
-        if page > 0:
-            pagination_buttons.append(InlineKeyboardButton(text=_("prev_page_button"), callback_data=f"promo_management:{page-1}"))
-        if page < total_pages - 1:
-            pagination_buttons.append(InlineKeyboardButton(text=_("next_page_button"), callback_data=f"promo_management:{page+1}"))
-        
-        if pagination_buttons:
-            builder.row(*pagination_buttons)
+    pagination_buttons = []
+    if nav.prev is not None:
+        pagination_buttons.append(InlineKeyboardButton(text=_("prev_page_button"), callback_data=f"promo_management:{nav.prev}"))
+    if nav.next is not None:
+        pagination_buttons.append(InlineKeyboardButton(text=_("next_page_button"), callback_data=f"promo_management:{nav.next}"))
+    if pagination_buttons:
+        builder.row(*pagination_buttons)
     
     # Добавляем кнопки экспорта и возврата
     builder.row(InlineKeyboardButton(text="📄 Экспорт CSV", callback_data="promo_export_all"))
@@ -131,23 +131,24 @@ async def promo_management_handler(callback: types.CallbackQuery, i18n_data: dic
     
     # Формируем заголовок с информацией о страницах
     title = _("admin_promo_management_title")
-    if total_pages > 1:
-        title += f"\n{_('admin_promo_list_page_info', current=page+1, total=total_pages, count=total_count)}"
+    if pagination_buttons:
+        count = total_count if exact else f"~{total_count}"
+        title += f"\n{_('admin_promo_list_page_info', current=nav.page + 1, total=total_pages, count=count)}"
     
     await callback.message.edit_text(title, reply_markup=builder.as_markup(), parse_mode="HTML")
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("promo_management:"))
+@router.callback_query(F.data.startswith("promo_management:"), flags={"read_replica": True})
 async def promo_management_pagination_handler(callback: types.CallbackQuery, i18n_data: dict, settings: Settings, session: AsyncSession):
     try:
-        page = int(callback.data.split(":")[1])
-        await promo_management_handler(callback, i18n_data, settings, session, page)
-    except (ValueError, IndexError):
+        position = parse_position(callback.data.split(":")[1])
+        await promo_management_handler(callback, i18n_data, settings, session, position)
+    except IndexError:
         await callback.answer("Error processing pagination.", show_alert=True)
 
 
-@router.callback_query(F.data.startswith("promo_detail:"))
+@router.callback_query(F.data.startswith("promo_detail:"), flags={"read_replica": True})
 async def promo_detail_handler(callback: types.CallbackQuery, i18n_data: dict, session: AsyncSession):
     i18n: Optional[JsonI18n] = i18n_data.get("i18n_instance")
     current_lang = i18n_data.get("current_language")
@@ -196,7 +197,7 @@ async def promo_toggle_handler(callback: types.CallbackQuery, i18n_data: dict, s
         await callback.answer(_("admin_promo_not_found"), show_alert=True)
 
 
-@router.callback_query(F.data.startswith("promo_activations:"))
+@router.callback_query(F.data.startswith("promo_activations:"), flags={"read_replica": True})
 async def promo_activations_handler(callback: types.CallbackQuery, i18n_data: dict, settings: Settings, session: AsyncSession):
     i18n: Optional[JsonI18n] = i18n_data.get("i18n_instance")
     current_lang = i18n_data.get("current_language")
@@ -207,15 +208,16 @@ async def promo_activations_handler(callback: types.CallbackQuery, i18n_data: di
     try:
         parts = callback.data.split(":")
         promo_id = int(parts[1])
-        page = int(parts[2])
+        position = parse_position(parts[2])
         page_size = settings.LOGS_PAGE_SIZE
 
         promo = await promo_code_dal.get_promo_code_by_id(session, promo_id)
         if not promo:
             return await callback.answer(_("admin_promo_not_found"), show_alert=True)
 
-        total_activations = await promo_code_dal.count_promo_activations_by_code_id(session, promo_id)
-        activations = await promo_code_dal.get_promo_activations_by_code_id(session, promo_id, limit=page_size, offset=page * page_size)
+        activations, has_more = await promo_code_dal.get_promo_activations_page(
+            session, promo_id, page_size, before=id_key(position.before), after=id_key(position.after))
+        nav = build_nav(position, [(a.activation_id,) for a in activations], has_more)
         
         builder = InlineKeyboardBuilder()
         if not activations:
@@ -225,10 +227,10 @@ async def promo_activations_handler(callback: types.CallbackQuery, i18n_data: di
             text += "\n".join([_("admin_promo_activation_item", user_id=a.user_id, date=a.activated_at.strftime("%d.%m.%Y %H:%M")) for a in activations])
 
         nav_buttons = []
-        if page > 0:
-            nav_buttons.append(InlineKeyboardButton(text="⬅️", callback_data=f"promo_activations:{promo_id}:{page-1}"))
-        if (page + 1) * page_size < total_activations:
-            nav_buttons.append(InlineKeyboardButton(text="➡️", callback_data=f"promo_activations:{promo_id}:{page+1}"))
+        if nav.prev is not None:
+            nav_buttons.append(InlineKeyboardButton(text="⬅️", callback_data=f"promo_activations:{promo_id}:{nav.prev}"))
+        if nav.next is not None:
+            nav_buttons.append(InlineKeyboardButton(text="➡️", callback_data=f"promo_activations:{promo_id}:{nav.next}"))
         if nav_buttons:
             builder.row(*nav_buttons)
 
@@ -241,7 +243,7 @@ async def promo_activations_handler(callback: types.CallbackQuery, i18n_data: di
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("promo_export:"))
+@router.callback_query(F.data.startswith("promo_export:"), flags={"read_replica": True})
 async def promo_export_activations_handler(callback: types.CallbackQuery, i18n_data: dict, session: AsyncSession):
     i18n: Optional[JsonI18n] = i18n_data.get("i18n_instance")
     current_lang = i18n_data.get("current_language")
@@ -274,7 +276,7 @@ async def promo_export_activations_handler(callback: types.CallbackQuery, i18n_d
     await callback.answer()
 
 
-@router.callback_query(F.data == "promo_export_all")
+@router.callback_query(F.data == "promo_export_all", flags={"read_replica": True})
 async def promo_export_all_handler(callback: types.CallbackQuery, i18n_data: dict, session: AsyncSession):
     i18n: Optional[JsonI18n] = i18n_data.get("i18n_instance")
     current_lang = i18n_data.get("current_language")
@@ -286,7 +288,7 @@ async def promo_export_all_handler(callback: types.CallbackQuery, i18n_data: dic
         await callback.answer("📄 Создаю CSV файл...", show_alert=True)
         
         # Получаем все промокоды
-        all_promos = await promo_code_dal.get_all_promo_codes_with_details(session, limit=10000, offset=0)
+        all_promos, _has_more = await promo_code_dal.get_all_promo_codes_with_details(session, limit=10000)
         
         output = io.StringIO()
         writer = csv.writer(output)
@@ -345,7 +347,7 @@ async def promo_delete_handler(callback: types.CallbackQuery, i18n_data: dict, s
         if promo:
             await session.commit()
             await callback.answer(_("admin_promo_deleted_success", code=promo.code), show_alert=True)
-            await promo_management_handler(callback, i18n_data, settings, session, 0)
+            await promo_management_handler(callback, i18n_data, settings, session)
         else:
             await callback.answer(_("admin_promo_not_found"), show_alert=True)
     except (ValueError, IndexError):
@@ -1,6 +1,6 @@
 import logging
 from aiogram import Router, F, types
-from aiogram.filters import Command
+from aiogram.filters import Command, CommandObject
 from aiogram.fsm.context import FSMContext
 from typing import Optional, Dict, List
 from datetime import datetime
@@ -8,7 +8,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from config.settings import Settings
 
-from db.dal import user_dal, payment_dal, panel_sync_dal
+from db.dal import user_dal, payment_dal, panel_sync_dal, rollup_dal
 from db.models import Payment, PanelSyncStatus
 from bot.services.panel_api_service import PanelApiService
 
@@ -247,7 +247,7 @@ async def show_statistics_handler(callback: types.CallbackQuery,
                 break
 
 
-@router.message(Command("stats"))
+@router.message(Command("stats"), flags={"read_replica": True})
 async def stats_command_handler(
     message: types.Message,
     state: FSMContext,
@@ -277,7 +277,47 @@ async def stats_command_handler(
     await show_statistics_handler(fake_callback, i18n_data, settings, session)
 
 
-@router.message(Command("users_stats"))
+@router.message(Command("rebuild_rollups"))
+async def rebuild_rollups_command(
+    message: types.Message,
+    command: CommandObject,
+    i18n_data: dict,
+    settings: Settings,
+    session: AsyncSession,
+):
+    """Команда /rebuild_rollups [YYYY-MM-DD] - пересчитать дневные сводки статистики (с указанной даты)"""
+    current_lang = i18n_data.get("current_language", settings.DEFAULT_LANGUAGE)
+    i18n: Optional[JsonI18n] = i18n_data.get("i18n_instance")
+    if not i18n:
+        await message.answer("Language error.")
+        return
+    _ = lambda key, **kwargs: i18n.gettext(current_lang, key, **kwargs)
+
+    since = None
+    if command.args:
+        try:
+            since = datetime.strptime(command.args.strip(), "%Y-%m-%d").date()
+        except ValueError:
+            await message.answer(_("admin_rollups_rebuild_usage"))
+            return
+
+    try:
+        counts = await rollup_dal.rebuild_rollups(session, since=since)
+        await session.commit()
+    except Exception as e:
+        await session.rollback()
+        logging.error(f"Failed to rebuild rollups: {e}", exc_info=True)
+        await message.answer(_("admin_rollups_rebuild_failed"))
+        return
+    logging.info(f"Admin {message.from_user.id} rebuilt daily rollups since {since or 'the beginning'}.")
+    await message.answer(_(
+        "admin_rollups_rebuild_done",
+        since=since.isoformat() if since else "—",
+        rows=sum(counts.values()),
+    ))
+
+
+@router.message(Command("users_stats"), flags={"read_replica": True})
 async def users_stats_command_handler(
     message: types.Message,
     state: FSMContext,
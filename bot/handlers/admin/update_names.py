@@ -8,6 +8,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from config.settings import Settings
 from db.dal import user_dal
 from bot.services.panel_api_service import PanelApiService
+from bot.utils import edit_message_via_queue
 
 router = Router(name="admin_update_names_router")
 
@@ -28,14 +29,14 @@ async def update_all_user_names_command(
         users = await user_dal.get_all_users_with_panel_uuid(session)
         
         if not users:
-            await status_msg.edit_text("❌ Не найдено пользователей с panel_user_uuid")
+            await edit_message_via_queue(status_msg, "❌ Не найдено пользователей с panel_user_uuid")
             return
         
         updated_count = 0
         error_count = 0
         
         total_users = len(users)
-        await status_msg.edit_text(f"⏳ Обновляю имена для {total_users} пользователей...")
+        await edit_message_via_queue(status_msg, f"⏳ Обновляю имена для {total_users} пользователей...")
         
         for index, user in enumerate(users, 1):
             try:
@@ -75,7 +76,8 @@ async def update_all_user_names_command(
                 # Обновляем статус каждые 10 пользователей
                 if index % 10 == 0:
                     progress = (index / total_users) * 100
-                    await status_msg.edit_text(
+                    await edit_message_via_queue(
+                        status_msg,
                         f"⏳ Прогресс: {index}/{total_users} ({progress:.1f}%)\n"
                         f"✅ Обновлено: {updated_count}\n"
                         f"❌ Ошибок: {error_count}"
@@ -95,8 +97,8 @@ async def update_all_user_names_command(
         if error_count > 0:
             result_text += f"❌ Ошибок: {error_count}"
         
-        await status_msg.edit_text(result_text, parse_mode="Markdown")
+        await edit_message_via_queue(status_msg, result_text, parse_mode="Markdown")
         
     except Exception as e:
         logging.error(f"Critical error in update_all_names: {e}", exc_info=True)
-        await status_msg.edit_text(f"❌ Критическая ошибка: {str(e)}")
+        await edit_message_via_queue(status_msg, f"❌ Критическая ошибка: {str(e)}")
@@ -431,7 +431,7 @@ async def handle_view_user_logs(callback: types.CallbackQuery, user: User,
     
     try:
         # Get recent logs for user
-        logs = await message_log_dal.get_user_message_logs(session, user.user_id, limit=10, offset=0)
+        logs = await message_log_dal.get_user_message_logs(session, user.user_id, limit=10)
         
         if not logs:
             await callback.answer(_(
@@ -12,7 +12,7 @@ from bot.middlewares.i18n import JsonI18n
 router = Router(name="inline_mode_router")
 
 
-@router.inline_query()
+@router.inline_query(flags={"read_replica": True})
 async def inline_query_handler(inline_query: InlineQuery,
                                settings: Settings,
                                i18n_data: dict,
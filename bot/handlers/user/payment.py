@@ -22,6 +22,7 @@ from bot.middlewares.i18n import JsonI18n
 from config.settings import Settings
 from bot.services.notification_service import NotificationService
 from bot.keyboards.inline.user_keyboards import get_connect_and_main_keyboard
+from bot.utils import send_queued_message
 
 payment_processing_lock = asyncio.Lock()
 
@@ -32,7 +33,7 @@ YOOKASSA_EVENT_PAYMENT_CANCELED = 'payment.canceled'
 async def safe_send_message(bot: Bot, user_id: int, text: str, **kwargs):
     """Безопасная отправка сообщения с обработкой ошибок"""
     try:
-        await bot.send_message(user_id, text, **kwargs)
+        await send_queued_message(bot, user_id, text, **kwargs)
     except Exception as e:
         logging.error(f"Failed to send message to user {user_id}: {e}")
 
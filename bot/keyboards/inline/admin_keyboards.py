@@ -5,6 +5,7 @@ import math
 
 from config.settings import Settings
 from bot.middlewares.i18n import JsonI18n
+from bot.utils.page_cursor import PageNav
 from db.models import User
 
 
@@ -146,9 +147,19 @@ def get_logs_menu_keyboard(i18n_instance, lang: str) -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+def get_logs_export_keyboard(i18n_instance, lang: str) -> InlineKeyboardMarkup:
+    _ = lambda key, **kwargs: i18n_instance.gettext(lang, key, **kwargs)
+    builder = InlineKeyboardBuilder()
+    builder.button(text=_(key="admin_logs_export_all_button"),
+                   callback_data="admin_logs:export_csv:all")
+    builder.button(text=_(key="admin_logs_menu_title"),
+                   callback_data="admin_action:view_logs_menu")
+    builder.adjust(1)
+    return builder.as_markup()
+
+
 def get_logs_pagination_keyboard(
-        current_page: int,
-        total_pages: int,
+        nav: PageNav,
         base_callback_data: str,
         i18n_instance,
         lang: str,
@@ -156,16 +167,16 @@ def get_logs_pagination_keyboard(
     _ = lambda key, **kwargs: i18n_instance.gettext(lang, key, **kwargs)
     builder = InlineKeyboardBuilder()
     row_buttons = []
-    if current_page > 0:
+    if nav.prev is not None:
         row_buttons.append(
             InlineKeyboardButton(
                 text="⬅️ " + _("prev_page_button", default="Prev"),
-                callback_data=f"{base_callback_data}:{current_page - 1}"))
-    if current_page < total_pages - 1:
+                callback_data=f"{base_callback_data}:{nav.prev}"))
+    if nav.next is not None:
         row_buttons.append(
             InlineKeyboardButton(
                 text=_("next_page_button", default="Next") + " ➡️",
-                callback_data=f"{base_callback_data}:{current_page + 1}"))
+                callback_data=f"{base_callback_data}:{nav.next}"))
 
     if row_buttons: builder.row(*row_buttons)
 
@@ -285,6 +296,45 @@ def get_broadcast_confirmation_keyboard(lang: str,
     return builder.as_markup()
 
 
+def get_broadcast_job_keyboard(job_id: int, status: str, lang: str,
+                               i18n_instance) -> InlineKeyboardMarkup:
+    _ = lambda key, **kwargs: i18n_instance.gettext(lang, key, **kwargs)
+    builder = InlineKeyboardBuilder()
+    if status == "running":
+        builder.button(text=_(key="broadcast_job_pause_button"),
+                       callback_data=f"broadcast_job:pause:{job_id}")
+    elif status == "paused":
+        builder.button(text=_(key="broadcast_job_resume_button"),
+                       callback_data=f"broadcast_job:resume:{job_id}")
+    if status in ("running", "paused"):
+        builder.button(text=_(key="broadcast_job_cancel_button"),
+                       callback_data=f"broadcast_job:cancel:{job_id}")
+        builder.button(text=_(key="broadcast_job_refresh_button"),
+                       callback_data=f"broadcast_job:refresh:{job_id}")
+    builder.button(text=_(key="back_to_admin_panel_button"),
+                   callback_data="admin_action:main")
+    builder.adjust(2, 1, 1)
+    return builder.as_markup()
+
+
+def get_broadcast_jobs_list_keyboard(jobs: List[Any], lang: str,
+                                     i18n_instance) -> InlineKeyboardMarkup:
+    _ = lambda key, **kwargs: i18n_instance.gettext(lang, key, **kwargs)
+    builder = InlineKeyboardBuilder()
+    for job in jobs:
+        builder.button(
+            text=_(key="admin_broadcast_job_list_item",
+                   job_id=job.job_id,
+                   status=_(f"broadcast_job_status_{job.status}"),
+                   sent=job.sent_count,
+                   total=job.total_recipients),
+            callback_data=f"broadcast_job:refresh:{job.job_id}")
+    builder.button(text=_(key="back_to_admin_panel_button"),
+                   callback_data="admin_action:main")
+    builder.adjust(1)
+    return builder.as_markup()
+
+
 def get_back_to_admin_panel_keyboard(lang: str,
                                      i18n_instance) -> InlineKeyboardMarkup:
     _ = lambda key, **kwargs: i18n_instance.gettext(lang, key, **kwargs)
@@ -309,7 +359,7 @@ def get_ads_menu_keyboard(i18n_instance, lang: str) -> InlineKeyboardMarkup:
 
 
 def get_ads_list_keyboard(i18n_instance, lang: str, campaigns: List[Any], 
-                         current_page: int, total_pages: int) -> InlineKeyboardMarkup:
+                         nav: PageNav, total_pages: str) -> InlineKeyboardMarkup:
     """Keyboard for ads list with pagination"""
     _ = lambda key, **kwargs: i18n_instance.gettext(lang, key, **kwargs)
     builder = InlineKeyboardBuilder()
@@ -319,31 +369,31 @@ def get_ads_list_keyboard(i18n_instance, lang: str, campaigns: List[Any],
         button_text = f"🎯 {campaign.source} ({campaign.start_param})"
         builder.button(
             text=button_text,
-            callback_data=f"admin_ads:card:{campaign.ad_campaign_id}:{current_page}"
+            callback_data=f"admin_ads:card:{campaign.ad_campaign_id}:{nav.current}"
         )
     
     # Pagination
     nav_buttons = []
-    if current_page > 0:
+    if nav.prev is not None:
         nav_buttons.append(
             InlineKeyboardButton(
                 text="⬅️ Пред.",
-                callback_data=f"admin_ads:page:{current_page - 1}"
+                callback_data=f"admin_ads:page:{nav.prev}"
             )
         )
     
     nav_buttons.append(
         InlineKeyboardButton(
-            text=f"{current_page + 1}/{total_pages}",
+            text=f"{nav.page + 1}/{total_pages}",
             callback_data="stub"
         )
     )
     
-    if current_page < total_pages - 1:
+    if nav.next is not None:
         nav_buttons.append(
             InlineKeyboardButton(
                 text="След. ➡️",
-                callback_data=f"admin_ads:page:{current_page + 1}"
+                callback_data=f"admin_ads:page:{nav.next}"
             )
         )
     
@@ -361,7 +411,7 @@ def get_ads_list_keyboard(i18n_instance, lang: str, campaigns: List[Any],
 
 
 def get_ad_card_keyboard(i18n_instance, lang: str, campaign_id: int, 
-                        back_page: int = 0) -> InlineKeyboardMarkup:
+                        back_page: str = "0") -> InlineKeyboardMarkup:
     """Keyboard for individual ad campaign card"""
     _ = lambda key, **kwargs: i18n_instance.gettext(lang, key, **kwargs)
     builder = InlineKeyboardBuilder()
@@ -7,7 +7,7 @@ from aiogram.types import (MenuButtonDefault, MenuButtonWebApp, WebAppInfo, BotC
 from sqlalchemy.orm import sessionmaker
 
 from config.settings import Settings
-from db.database_setup import init_db_connection
+from db.database_setup import init_db_connection, init_read_replica
 
 # Новые модули архитектуры
 from bot.app.controllers.dispatcher_controller import build_dispatcher
@@ -16,7 +16,9 @@ from bot.app.web.web_server import build_and_start_web_app, validate_webhook_con
 
 from bot.routers import build_root_router
 from bot.handlers.admin.sync_admin import perform_sync
-from bot.utils.message_queue import init_queue_manager
+from bot.utils.message_queue import init_queue_manager, get_queue_manager
+from bot.utils.shared_queue import init_shared_queue_manager
+from bot.utils.background_tasks import wait_background_tasks
 
 
 async def register_all_routers(dp: Dispatcher, settings: Settings) -> None:
@@ -48,6 +50,14 @@ async def on_startup_configured(dispatcher: Dispatcher) -> None:
         
         # Инициализируем менеджер очередей сообщений
         await _initialize_message_queue(dispatcher, bot)
+
+        # Продолжаем рассылки, прерванные остановкой бота
+        await _resume_broadcast_jobs(dispatcher)
+
+        # Обслуживание партиций журнала сообщений (в фоне)
+        retention_service = dispatcher.get("message_log_retention_service")
+        if retention_service:
+            retention_service.start()
         
         # Автоматическая синхронизация при запуске
         await _run_startup_sync(panel_service, async_session_factory, settings, i18n_instance)
@@ -131,13 +141,36 @@ async def _setup_bot_ui(bot: Bot, settings: Settings, i18n_instance) -> None:
 async def _initialize_message_queue(dispatcher: Dispatcher, bot: Bot) -> None:
     """Инициализирует менеджер очередей сообщений"""
     try:
-        queue_manager = init_queue_manager(bot)
+        settings: Settings = dispatcher["settings"]
+        unreachable_user_service = dispatcher.get("unreachable_user_service")
+        failure_listener = (unreachable_user_service.on_send_failure
+                            if unreachable_user_service else None)
+        backend = settings.MESSAGE_QUEUE_BACKEND.lower()
+        if backend == "postgres":
+            queue_manager = init_shared_queue_manager(
+                bot, dispatcher["async_session_factory"], failure_listener=failure_listener)
+        else:
+            if backend != "memory":
+                logging.warning(f"⚠️ Unknown MESSAGE_QUEUE_BACKEND '{backend}', using memory")
+                backend = "memory"
+            queue_manager = init_queue_manager(bot, failure_listener=failure_listener)
         dispatcher["queue_manager"] = queue_manager
-        logging.info("✅ Message queue manager initialized")
+        logging.info(f"✅ Message queue manager initialized ({backend})")
     except Exception as e:
         logging.error(f"❌ Failed to initialize message queue manager: {e}", exc_info=True)
 
 
+async def _resume_broadcast_jobs(dispatcher: Dispatcher) -> None:
+    """Перезапускает незавершённые задачи рассылки"""
+    broadcast_service = dispatcher.get("broadcast_service")
+    if not broadcast_service:
+        return
+    try:
+        await broadcast_service.resume_unfinished_jobs()
+    except Exception as e:
+        logging.error(f"❌ Failed to resume broadcast jobs: {e}", exc_info=True)
+
+
 async def _run_startup_sync(panel_service, async_session_factory: sessionmaker, 
                            settings: Settings, i18n_instance) -> None:
     """Выполняет автоматическую синхронизацию при запуске"""
@@ -162,11 +195,38 @@ async def _run_startup_sync(panel_service, async_session_factory: sessionmaker,
 
 
 async def on_shutdown_configured(dispatcher: Dispatcher) -> None:
-    """Обработчик события остановки бота"""
+    """
+    Обработчик события остановки бота. Вызывается, когда веб-сервер уже
+    не принимает запросы. Порядок: обработка апдейтов -> очередь сообщений ->
+    рассылки -> сервисы -> сессия бота -> БД.
+    """
     logging.warning("🛑 SHUTDOWN: Starting shutdown sequence...")
+    settings: Settings = dispatcher["settings"]
+
+    # Дожидаемся апдейтов, которые ещё обрабатываются: они могут ставить сообщения в очередь
+    cancelled = await wait_background_tasks(settings.SHUTDOWN_REQUEST_TIMEOUT_SECONDS)
+    if cancelled:
+        logging.warning(f"⚠️ {cancelled} update handler(s) cancelled on shutdown")
+
+    # Отправляем оставшиеся сообщения. Сообщения рассылок не ждём:
+    # получатели остаются в БД и получат их после перезапуска
+    queue_manager = get_queue_manager()
+    if queue_manager:
+        try:
+            unsent = await queue_manager.shutdown(settings.SHUTDOWN_QUEUE_DRAIN_SECONDS)
+            if unsent:
+                logging.warning(f"⚠️ Message queue: {unsent} message(s) left unsent on shutdown")
+            else:
+                logging.info("✅ Message queue drained")
+        except Exception as e:
+            logging.warning(f"⚠️ Failed to drain message queue: {e}")
 
-    # Закрываем все сервисы
+    # Рассылки останавливаем после очереди, чтобы сохранить результаты уже отправленных.
+    # Флаги недоступных пользователей сбрасываем после всех отправок.
+    # Затем внешние API (панель, CryptoPay и т.д.)
     service_keys = [
+        "broadcast_service", "unreachable_user_service", "message_log_retention_service",
+        "message_log_export_service",
         "panel_service", "cryptopay_service", "tribute_service",
         "panel_webhook_service", "yookassa_service", "promo_code_service",
         "stars_service", "subscription_service", "referral_service",
@@ -190,6 +250,10 @@ async def on_shutdown_configured(dispatcher: Dispatcher) -> None:
         if global_async_engine:
             await global_async_engine.dispose()
             logging.info("✅ Database engine disposed")
+        from db.database_setup import replica_engine as global_replica_engine
+        if global_replica_engine:
+            await global_replica_engine.dispose()
+            logging.info("✅ Read replica engine disposed")
     except Exception as e:
         logging.warning(f"⚠️ Failed to dispose database engine: {e}")
 
@@ -252,10 +316,11 @@ async def run_bot(settings_param: Settings) -> None:
         if not async_session_factory:
             logging.critical("❌ Failed to initialize database connection")
             return
+        read_session_router = init_read_replica(settings_param, async_session_factory)
 
         # Создание диспетчера и бота через контроллер
         logging.info("🏗️ Building dispatcher and bot...")
-        dp, bot, extras = build_dispatcher(settings_param, async_session_factory)
+        dp, bot, extras = build_dispatcher(settings_param, async_session_factory, read_session_router)
         i18n_instance = extras["i18n_instance"]
 
         # Получение username бота для YooKassa
@@ -269,6 +334,7 @@ async def run_bot(settings_param: Settings) -> None:
             async_session_factory,
             i18n_instance,
             bot_username,
+            read_session_router,
         )
         
         # Валидация сервисов
@@ -0,0 +1,22 @@
+from typing import Callable, Dict, Any, Awaitable
+import asyncio
+
+from aiogram import BaseMiddleware
+from aiogram.types import Update
+
+from bot.utils.background_tasks import track_task
+
+
+class InFlightUpdatesMiddleware(BaseMiddleware):
+    """
+    Registers the task handling each update, so shutdown waits for updates
+    that are still being processed (webhook updates run in background tasks)
+    """
+
+    async def __call__(self, handler: Callable[[Update, Dict[str, Any]],
+                                               Awaitable[Any]], event: Update,
+                       data: Dict[str, Any]) -> Any:
+        task = asyncio.current_task()
+        if task is not None:
+            track_task(task)
+        return await handler(event, data)
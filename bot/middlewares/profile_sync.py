@@ -23,6 +23,13 @@ class ProfileSyncMiddleware(BaseMiddleware):
             try:
                 db_user = await user_dal.get_user_by_id(session, tg_user.id)
                 if db_user:
+                    # The user reached us, so they can receive messages again
+                    if db_user.unreachable_since is not None:
+                        await user_dal.mark_user_reachable(session, tg_user.id)
+                        logging.info(
+                            f"ProfileSyncMiddleware: User {tg_user.id} is reachable again (was: {db_user.unreachable_reason})"
+                        )
+
                     update_payload: Dict[str, Any] = {}
                     if db_user.username != tg_user.username:
                         update_payload["username"] = tg_user.username
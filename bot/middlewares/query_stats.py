@@ -0,0 +1,47 @@
+from typing import Callable, Dict, Any, Awaitable
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+from config.settings import Settings
+from db.query_metrics import UpdateQueryStats, current_query_stats, finish_update
+
+
+class QueryStatsMiddleware(BaseMiddleware):
+    """
+    Outer update middleware: collects the SQL statements run while an update
+    is handled (including the other middlewares and the final commit)
+    """
+
+    def __init__(self, settings: Settings):
+        super().__init__()
+        self.settings = settings
+
+    async def __call__(self, handler: Callable[[Update, Dict[str, Any]],
+                                               Awaitable[Any]], event: Update,
+                       data: Dict[str, Any]) -> Any:
+        if not self.settings.DB_QUERY_STATS_ENABLED:
+            return await handler(event, data)
+        stats = UpdateQueryStats(event.update_id, event.event_type)
+        token = current_query_stats.set(stats)
+        try:
+            return await handler(event, data)
+        finally:
+            current_query_stats.reset(token)
+            finish_update(stats, self.settings)
+
+
+class QueryStatsTagMiddleware(BaseMiddleware):
+    """Inner middleware: tags the update's statements with router:handler"""
+
+    async def __call__(self, handler: Callable[[TelegramObject, Dict[str, Any]],
+                                               Awaitable[Any]], event: TelegramObject,
+                       data: Dict[str, Any]) -> Any:
+        stats = current_query_stats.get()
+        handler_object = data.get("handler")
+        if stats is not None and handler_object is not None:
+            router = data.get("event_router")
+            router_name = getattr(router, "name", None) or "?"
+            handler_name = getattr(handler_object.callback, "__name__", None) or "?"
+            stats.tag = f"{router_name}:{handler_name}"
+        return await handler(event, data)
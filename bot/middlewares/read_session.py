@@ -0,0 +1,41 @@
+from typing import Callable, Dict, Any, Awaitable
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.flags import get_flag
+from aiogram.types import TelegramObject
+
+from db.read_replica import ReadSessionRouter
+
+READ_REPLICA_FLAG = "read_replica"
+
+
+class ReadSessionMiddleware(BaseMiddleware):
+    """
+    Gives handlers flagged with flags={"read_replica": True} a session from
+    the read router (replica when fresh enough) instead of the primary one.
+    The flag may also be a function (event, data) -> bool for handlers that
+    only read for some of their events. Inner middleware: flags are only
+    known once the handler is chosen.
+    """
+
+    def __init__(self, read_session_router: ReadSessionRouter):
+        super().__init__()
+        self.read_session_router = read_session_router
+
+    async def __call__(self, handler: Callable[[TelegramObject, Dict[str, Any]],
+                                               Awaitable[Any]], event: TelegramObject,
+                       data: Dict[str, Any]) -> Any:
+        flag = get_flag(data, READ_REPLICA_FLAG)
+        if callable(flag):
+            flag = flag(event, data)
+        if not flag or not self.read_session_router.configured:
+            return await handler(event, data)
+
+        primary_session = data.get("session")
+        async with self.read_session_router() as read_session:
+            data["session"] = read_session
+            try:
+                return await handler(event, data)
+            finally:
+                # The outer DBSessionMiddleware commits the primary session
+                data["session"] = primary_session
@@ -0,0 +1,361 @@
+import asyncio
+import logging
+import time
+from datetime import timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.types import InlineKeyboardMarkup
+from sqlalchemy.orm import sessionmaker
+
+from config.settings import Settings
+from bot.middlewares.i18n import JsonI18n
+from bot.keyboards.inline.admin_keyboards import get_broadcast_job_keyboard
+from bot.utils import MessageContent, build_queue_call
+from bot.utils.message_queue import get_queue_manager, PRIORITY_BULK
+from db.dal import broadcast_dal, message_log_dal, user_dal
+from db.dal.broadcast_dal import (
+    JOB_STATUS_RUNNING,
+    JOB_STATUS_PAUSED,
+    JOB_STATUS_CANCELLED,
+    JOB_STATUS_COMPLETED,
+)
+from db.models import BroadcastJob
+
+SNAPSHOT_POLL_SECONDS = 0.5
+
+
+class BroadcastService:
+    """
+    Durable broadcasts: the job, its audience snapshot and per-recipient status
+    live in the database. A worker task queues recipients batch by batch and
+    saves the outcome after each batch, so a restart resumes where it stopped.
+    """
+
+    def __init__(self, bot: Bot, settings: Settings, i18n: JsonI18n,
+                 async_session_factory: sessionmaker):
+        self.bot = bot
+        self.settings = settings
+        self.i18n = i18n
+        self.async_session_factory = async_session_factory
+        self.batch_size = max(1, settings.BROADCAST_BATCH_SIZE)
+        self._workers: Dict[int, asyncio.Task] = {}
+        # job_id -> (monotonic start of the current run, recipients processed in it), for ETA
+        self._run_stats: Dict[int, Tuple[float, int]] = {}
+
+    async def create_job(self, admin_id: int, target: str, content: MessageContent,
+                         progress_chat_id: Optional[int] = None,
+                         progress_message_id: Optional[int] = None,
+                         admin_username: Optional[str] = None,
+                         admin_first_name: Optional[str] = None) -> BroadcastJob:
+        """Store the job and start sending; the audience is copied in the background"""
+        async with self.async_session_factory() as session:
+            # Estimate for the progress card until the snapshot is complete
+            estimated_total = await user_dal.count_broadcast_audience(
+                session, target, self.settings.BROADCAST_UNREACHABLE_RECHECK_DAYS)
+            job = await broadcast_dal.create_job(session, {
+                "admin_id": admin_id,
+                "status": JOB_STATUS_RUNNING,
+                "target": target,
+                "content_type": content.content_type,
+                "file_id": content.file_id,
+                "text": content.text,
+                "total_recipients": estimated_total,
+                "audience_complete": False,
+                "progress_chat_id": progress_chat_id,
+                "progress_message_id": progress_message_id,
+            })
+            await broadcast_dal.set_job_status(session, job.job_id, JOB_STATUS_RUNNING)
+            await self._log_job_event(
+                session, job, "admin_broadcast_started",
+                f"Broadcast #{job.job_id} to '{target}' (~{estimated_total} users): "
+                f"[{content.content_type}] {(content.text or '')[:200]}",
+                admin_username=admin_username, admin_first_name=admin_first_name)
+            await session.commit()
+            job = await broadcast_dal.get_job(session, job.job_id)
+
+        logging.info(
+            f"Admin {admin_id} started broadcast job {job.job_id} "
+            f"(~{estimated_total} recipients, target={target})")
+        self._start_worker(job.job_id)
+        return job
+
+    async def get_job(self, job_id: int) -> Optional[BroadcastJob]:
+        async with self.async_session_factory() as session:
+            return await broadcast_dal.get_job(session, job_id)
+
+    async def get_recent_jobs(self, limit: int = 5) -> List[BroadcastJob]:
+        async with self.async_session_factory() as session:
+            return await broadcast_dal.get_recent_jobs(session, limit)
+
+    async def pause_job(self, job_id: int) -> bool:
+        # The worker notices at the next batch; messages of the current batch are still sent
+        return await self._change_status(job_id, JOB_STATUS_PAUSED, (JOB_STATUS_RUNNING, ))
+
+    async def cancel_job(self, job_id: int) -> bool:
+        cancelled = await self._change_status(
+            job_id, JOB_STATUS_CANCELLED, (JOB_STATUS_RUNNING, JOB_STATUS_PAUSED))
+        if cancelled:
+            async with self.async_session_factory() as session:
+                job = await broadcast_dal.get_job(session, job_id)
+                await self._log_job_event(
+                    session, job, "admin_broadcast_cancelled",
+                    f"Broadcast #{job_id} cancelled: sent {job.sent_count}, "
+                    f"failed {job.failed_count} of {job.total_recipients}")
+                await session.commit()
+        return cancelled
+
+    async def resume_job(self, job_id: int) -> bool:
+        # Also restarts a "running" job whose worker died
+        resumed = await self._change_status(
+            job_id, JOB_STATUS_RUNNING, (JOB_STATUS_PAUSED, JOB_STATUS_RUNNING))
+        if resumed:
+            self._start_worker(job_id)
+        return resumed
+
+    async def resume_unfinished_jobs(self) -> int:
+        """Restart workers for jobs that were running when the bot stopped"""
+        async with self.async_session_factory() as session:
+            job_ids = await broadcast_dal.get_unfinished_job_ids(session)
+        for job_id in job_ids:
+            self._start_worker(job_id)
+        if job_ids:
+            logging.info(f"BroadcastService: resumed {len(job_ids)} unfinished broadcast job(s): {job_ids}")
+        return len(job_ids)
+
+    async def _change_status(self, job_id: int, status: str, from_statuses) -> bool:
+        async with self.async_session_factory() as session:
+            changed = await broadcast_dal.set_job_status(session, job_id, status, from_statuses)
+            await session.commit()
+        if changed:
+            logging.info(f"BroadcastService: job {job_id} -> {status}")
+        return changed
+
+    async def _log_job_event(self, session, job: BroadcastJob, event_type: str, content: str,
+                             admin_username: Optional[str] = None,
+                             admin_first_name: Optional[str] = None) -> None:
+        """One message log record per job event, instead of the message text per recipient"""
+        await message_log_dal.create_message_log_no_commit(session, {
+            "user_id": job.admin_id,
+            "telegram_username": admin_username,
+            "telegram_first_name": admin_first_name,
+            "event_type": event_type,
+            "content": content,
+            "is_admin_event": True,
+        })
+
+    def _start_worker(self, job_id: int) -> None:
+        worker = self._workers.get(job_id)
+        if worker and not worker.done():
+            return
+        task = asyncio.create_task(self._run_job(job_id), name=f"broadcast-job-{job_id}")
+        self._workers[job_id] = task
+        task.add_done_callback(lambda _t, jid=job_id: self._workers.pop(jid, None))
+
+    async def _run_job(self, job_id: int) -> None:
+        queue_manager = get_queue_manager()
+        if not queue_manager:
+            logging.error(f"BroadcastService: message queue is not initialized, job {job_id} not started")
+            return
+
+        self._run_stats[job_id] = (time.monotonic(), 0)
+        last_user_id: Optional[int] = None
+        last_progress_update = 0.0
+        snapshot_task: Optional[asyncio.Task] = None
+        try:
+            while True:
+                async with self.async_session_factory() as session:
+                    # Re-read the job each batch so pause/cancel take effect
+                    job = await broadcast_dal.get_job(session, job_id)
+                    if not job or job.status != JOB_STATUS_RUNNING:
+                        break
+                    batch = await broadcast_dal.get_pending_recipient_ids(
+                        session, job_id, last_user_id, self.batch_size)
+
+                if not job.audience_complete and snapshot_task is None:
+                    # Sending starts with the first stored chunk while the rest is copied
+                    snapshot_task = asyncio.create_task(self._snapshot_audience(job))
+
+                if not batch and not job.audience_complete:
+                    if snapshot_task.done():
+                        # Propagates a snapshot failure; otherwise the flag is re-read next loop
+                        snapshot_task.result()
+                    else:
+                        await asyncio.wait({snapshot_task}, timeout=SNAPSHOT_POLL_SECONDS)
+                    continue
+
+                if not batch:
+                    async with self.async_session_factory() as session:
+                        await broadcast_dal.set_job_status(
+                            session, job_id, JOB_STATUS_COMPLETED, (JOB_STATUS_RUNNING, ))
+                        job = await broadcast_dal.get_job(session, job_id)
+                        await self._log_job_event(
+                            session, job, "admin_broadcast_completed",
+                            f"Broadcast #{job_id} completed: sent {job.sent_count}, "
+                            f"failed {job.failed_count} of {job.total_recipients}")
+                        await session.commit()
+                    logging.info(
+                        f"BroadcastService: job {job_id} completed, "
+                        f"sent={job.sent_count}, failed={job.failed_count}")
+                    await self._update_progress_message(queue_manager, job)
+                    break
+
+                await self._process_batch(queue_manager, job, batch)
+                last_user_id = batch[-1]
+
+                now = time.monotonic()
+                if now - last_progress_update >= self.settings.BROADCAST_PROGRESS_UPDATE_SECONDS:
+                    last_progress_update = now
+                    await self._update_progress_message(queue_manager, await self.get_job(job_id))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # The job stays "running": it is picked up again on restart or via resume
+            logging.error(f"BroadcastService: job {job_id} worker failed: {e}", exc_info=True)
+        finally:
+            self._run_stats.pop(job_id, None)
+            if snapshot_task and not snapshot_task.done():
+                snapshot_task.cancel()
+                await asyncio.gather(snapshot_task, return_exceptions=True)
+
+    async def _snapshot_audience(self, job: BroadcastJob) -> None:
+        """
+        Copy the audience into broadcast_recipients chunk by chunk, committing each
+        chunk so the worker can send it right away. An interrupted snapshot
+        continues after the highest user_id already stored.
+        """
+        async with self.async_session_factory() as session:
+            after_user_id = await broadcast_dal.get_last_recipient_id(session, job.job_id)
+            stored = 0
+            async for chunk in user_dal.iter_broadcast_audience_ids(
+                    session,
+                    job.target,
+                    self.settings.BROADCAST_UNREACHABLE_RECHECK_DAYS,
+                    after_user_id=after_user_id):
+                stored += await broadcast_dal.add_recipients(session, job.job_id, chunk)
+                await session.commit()
+            total = await broadcast_dal.complete_audience(session, job.job_id)
+            await session.commit()
+        logging.info(
+            f"BroadcastService: job {job.job_id} audience stored "
+            f"({stored} added now, {total} total)")
+
+    async def _process_batch(self, queue_manager, job: BroadcastJob, batch: List[int]) -> None:
+        loop = asyncio.get_running_loop()
+        content = MessageContent(content_type=job.content_type, file_id=job.file_id, text=job.text)
+        # One payload dict for the whole batch, referenced by every queued message
+        method_name, call_kwargs = build_queue_call(
+            content, parse_mode="HTML", disable_web_page_preview=True)
+        outcomes: Dict[int, asyncio.Future] = {}
+
+        for user_id in batch:
+            outcome = loop.create_future()
+
+            async def on_result(result: Any, outcome: asyncio.Future = outcome) -> None:
+                if not outcome.done():
+                    outcome.set_result(result)
+
+            try:
+                await queue_manager.enqueue(
+                    user_id, method_name, call_kwargs, callback=on_result, priority=PRIORITY_BULK)
+            except Exception as e:
+                outcome.set_result(e)
+            outcomes[user_id] = outcome
+
+        try:
+            await asyncio.wait(outcomes.values())
+        finally:
+            # Save whatever finished, even if the worker is being cancelled, so that
+            # delivered messages are not sent a second time after a restart
+            sent_ids: List[int] = []
+            failed: Dict[int, str] = {}
+            for user_id, outcome in outcomes.items():
+                if not outcome.done():
+                    continue
+                result = outcome.result()
+                if isinstance(result, Exception):
+                    failed[user_id] = f"{type(result).__name__}: {result}"[:255]
+                else:
+                    sent_ids.append(user_id)
+            if sent_ids or failed:
+                await self._save_batch_results(job, sent_ids, failed)
+
+    async def _save_batch_results(self, job: BroadcastJob, sent_ids: List[int],
+                                  failed: Dict[int, str]) -> None:
+        # Message text is logged once per job (see _log_job_event); per-recipient rows
+        # only reference the job and go in with one multi-row INSERT per batch
+        logs = [{
+            "user_id": job.admin_id,
+            "event_type": "admin_broadcast_sent",
+            "content": f"Broadcast #{job.job_id}",
+            "is_admin_event": True,
+            "target_user_id": user_id,
+        } for user_id in sent_ids]
+        logs.extend({
+            "user_id": job.admin_id,
+            "event_type": "admin_broadcast_failed",
+            "content": f"Broadcast #{job.job_id}: {error[:200]}",
+            "is_admin_event": True,
+            "target_user_id": user_id,
+        } for user_id, error in failed.items())
+        async with self.async_session_factory() as session:
+            await broadcast_dal.record_batch_results(session, job.job_id, sent_ids, failed)
+            await message_log_dal.bulk_create_message_logs(session, logs)
+            await session.commit()
+
+        started, processed = self._run_stats.get(job.job_id, (time.monotonic(), 0))
+        self._run_stats[job.job_id] = (started, processed + len(sent_ids) + len(failed))
+
+    def get_eta_seconds(self, job: BroadcastJob) -> Optional[float]:
+        """Remaining time at the send rate of the current run, None if unknown"""
+        stats = self._run_stats.get(job.job_id)
+        if job.status != JOB_STATUS_RUNNING or not stats or stats[1] == 0:
+            return None
+        started, processed = stats
+        rate = processed / max(time.monotonic() - started, 1e-6)
+        remaining = max(job.total_recipients - job.sent_count - job.failed_count, 0)
+        return remaining / rate
+
+    def render_job_progress(self, job: BroadcastJob,
+                            lang: Optional[str] = None) -> Tuple[str, InlineKeyboardMarkup]:
+        lang = lang or self.settings.DEFAULT_LANGUAGE
+        _ = lambda key, **kwargs: self.i18n.gettext(lang, key, **kwargs)
+
+        processed = job.sent_count + job.failed_count
+        percent = (processed * 100 // job.total_recipients) if job.total_recipients else 100
+        eta_seconds = self.get_eta_seconds(job)
+        eta = str(timedelta(seconds=int(eta_seconds))) if eta_seconds is not None else "—"
+
+        text = _(
+            "admin_broadcast_job_progress",
+            job_id=job.job_id,
+            status=_(f"broadcast_job_status_{job.status}"),
+            sent=job.sent_count,
+            failed=job.failed_count,
+            total=job.total_recipients,
+            percent=percent,
+            eta=eta,
+        )
+        return text, get_broadcast_job_keyboard(job.job_id, job.status, lang, self.i18n)
+
+    async def _update_progress_message(self, queue_manager, job: Optional[BroadcastJob]) -> None:
+        if not job or not job.progress_chat_id or not job.progress_message_id:
+            return
+        text, markup = self.render_job_progress(job)
+        try:
+            await queue_manager.edit_message_text(
+                chat_id=job.progress_chat_id,
+                message_id=job.progress_message_id,
+                text=text,
+                reply_markup=markup,
+            )
+        except Exception as e:
+            logging.warning(f"BroadcastService: failed to queue progress update for job {job.job_id}: {e}")
+
+    async def close(self) -> None:
+        # Jobs stay "running" in the database and are resumed on the next startup
+        workers = list(self._workers.values())
+        for worker in workers:
+            worker.cancel()
+        if workers:
+            await asyncio.gather(*workers, return_exceptions=True)
@@ -16,6 +16,7 @@ from bot.services.referral_service import ReferralService
 from bot.keyboards.inline.user_keyboards import get_connect_and_main_keyboard
 from bot.services.notification_service import NotificationService
 from db.dal import payment_dal, user_dal
+from bot.utils import send_queued_message
 
 
 class CryptoPayService:
@@ -184,7 +185,8 @@ class CryptoPayService:
 
             markup = get_connect_and_main_keyboard(lang, i18n, settings, config_link)
             try:
-                await bot.send_message(
+                await send_queued_message(
+                    bot,
                     user_id,
                     text,
                     reply_markup=markup,
@@ -0,0 +1,257 @@
+import asyncio
+import csv
+import gzip
+import io
+import logging
+import os
+import shutil
+import tempfile
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.types import FSInputFile
+
+from config.settings import Settings
+from bot.middlewares.i18n import JsonI18n
+from db.dal import message_log_dal
+from db.read_replica import ReadSessionRouter
+
+EXPORT_BATCH_SIZE = 1000
+# Compressed output lags behind the rows written (text and zlib buffers);
+# parts are closed this much below the size limit
+PART_SIZE_MARGIN_BYTES = 1024 * 1024
+MB = 1024 * 1024
+
+
+@dataclass(frozen=True)
+class LogExportFilters:
+    since: Optional[datetime] = None
+    until: Optional[datetime] = None
+    user_id: Optional[int] = None
+    event_type: Optional[str] = None
+
+
+class _CsvPartWriter:
+    """
+    Writes CSV rows to files in `directory`: plain CSV until the export grows
+    past `compress_above` bytes, gzip from then on, and a new file (with its
+    own header) whenever the current one reaches `part_size` bytes on disk.
+    """
+
+    def __init__(self, directory: str, base_name: str, header: List[str],
+                 part_size: int, compress_above: int):
+        self.directory = directory
+        self.base_name = base_name
+        self.header = header
+        self.part_size = max(MB, part_size - PART_SIZE_MARGIN_BYTES)
+        self.compress_above = compress_above
+        self.compressed = False
+        self.rows_total = 0
+        self._part_number = 1
+        self._part_rows = 0
+        # Closed parts waiting to be sent: (path, rows)
+        self._finished: List[Tuple[str, int]] = []
+        self._open_part()
+
+    def _path(self, suffix: str) -> str:
+        return os.path.join(self.directory, f"{self.base_name}_{self._part_number}{suffix}")
+
+    def _open_part(self, copy_from: Optional[str] = None) -> None:
+        if self.compressed:
+            self._path_current = self._path(".csv.gz")
+            self._raw = open(self._path_current, "wb")
+            self._gzip = gzip.GzipFile(filename=f"{self.base_name}.csv", mode="wb", fileobj=self._raw)
+            target = self._gzip
+        else:
+            self._path_current = self._path(".csv")
+            self._raw = open(self._path_current, "wb")
+            self._gzip = None
+            target = self._raw
+        if copy_from:
+            with open(copy_from, "rb") as source:
+                shutil.copyfileobj(source, target)
+            os.remove(copy_from)
+            # The BOM is part of the copied content already
+            self._text = io.TextIOWrapper(target, encoding="utf-8", newline="")
+        else:
+            # BOM for Excel
+            self._text = io.TextIOWrapper(target, encoding="utf-8-sig", newline="")
+            csv.writer(self._text).writerow(self.header)
+        self._csv = csv.writer(self._text)
+
+    def _close_part(self) -> str:
+        self._text.flush()
+        self._text.detach()
+        if self._gzip is not None:
+            self._gzip.close()
+        self._raw.close()
+        return self._path_current
+
+    def write_rows(self, rows: List[list]) -> None:
+        for row in rows:
+            self._csv.writerow(row)
+            self._part_rows += 1
+            self.rows_total += 1
+            size = self._raw.tell()
+            if not self.compressed and size >= self.compress_above:
+                plain_path = self._close_part()
+                self.compressed = True
+                self._open_part(copy_from=plain_path)
+            elif size >= self.part_size:
+                self._finished.append((self._close_part(), self._part_rows))
+                self._part_number += 1
+                self._part_rows = 0
+                self._open_part()
+
+    def take_finished(self) -> List[Tuple[str, int]]:
+        finished, self._finished = self._finished, []
+        return finished
+
+    def close(self) -> List[Tuple[str, int]]:
+        """Close the last part; returns the parts not yet taken"""
+        self._finished.append((self._close_part(), self._part_rows))
+        return self.take_finished()
+
+
+def _csv_row(row) -> list:
+    # Newlines inside fields confuse spreadsheet imports
+    content_clean = (row.content or "").replace("\n", " ").replace("\r", " ").strip()
+    raw_update_clean = (row.raw_update_preview or "").replace("\n", " ").replace("\r", " ").strip()
+    return [
+        row.log_id or "",
+        row.timestamp.strftime("%Y-%m-%d %H:%M:%S UTC") if row.timestamp else "",
+        row.user_id or "",
+        row.telegram_username or "",
+        row.telegram_first_name or "",
+        row.event_type or "",
+        content_clean,
+        "Yes" if row.is_admin_event else "No",
+        row.target_user_id or "",
+        raw_update_clean,
+    ]
+
+
+class MessageLogExportService:
+    """
+    Exports message logs to an admin chat without loading them into memory:
+    rows are read in keyset batches into temporary files, which are
+    compressed and split to fit Telegram's upload limit.
+    """
+
+    def __init__(self, bot: Bot, settings: Settings, i18n: JsonI18n,
+                 read_session_factory: ReadSessionRouter):
+        self.bot = bot
+        self.settings = settings
+        self.i18n = i18n
+        # Export reads belong on the replica when there is one
+        self.read_session_factory = read_session_factory
+        # chat_id -> running export, one per chat
+        self._tasks: Dict[int, asyncio.Task] = {}
+
+    def start_export(self, chat_id: int, lang: str, filters: LogExportFilters) -> bool:
+        """Start an export in the background; False if this chat already has one running"""
+        task = self._tasks.get(chat_id)
+        if task and not task.done():
+            return False
+        self._tasks[chat_id] = asyncio.create_task(
+            self._run(chat_id, lang, filters), name=f"log-export-{chat_id}")
+        return True
+
+    async def _run(self, chat_id: int, lang: str, filters: LogExportFilters) -> None:
+        _ = lambda key, **kwargs: self.i18n.gettext(lang, key, **kwargs)
+        try:
+            rows, files = await self.export(chat_id, lang, filters)
+            if rows:
+                await self.bot.send_message(
+                    chat_id, _("admin_logs_export_done", count=rows, files=files))
+            else:
+                await self.bot.send_message(chat_id, _("admin_logs_csv_no_data"))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.error(f"Message log export for chat {chat_id} failed: {e}", exc_info=True)
+            try:
+                await self.bot.send_message(chat_id, _("admin_logs_csv_export_failed", error=str(e)))
+            except Exception:
+                pass
+        finally:
+            if self._tasks.get(chat_id) is asyncio.current_task():
+                self._tasks.pop(chat_id, None)
+
+    async def export(self, chat_id: int, lang: str, filters: LogExportFilters) -> Tuple[int, int]:
+        """Stream the matching logs into files and send them; returns (rows, files sent)"""
+        _ = lambda key, **kwargs: self.i18n.gettext(lang, key, **kwargs)
+        header = [
+            _("admin_csv_header_log_id"),
+            _("admin_csv_header_timestamp"),
+            _("admin_csv_header_user_id"),
+            _("admin_csv_header_telegram_username"),
+            _("admin_csv_header_telegram_first_name"),
+            _("admin_csv_header_event_type"),
+            _("admin_csv_header_content"),
+            _("admin_csv_header_is_admin_event"),
+            _("admin_csv_header_target_user_id"),
+            _("admin_csv_header_raw_update_preview"),
+        ]
+        started_at = datetime.now(timezone.utc)
+        base_name = f"message_logs_{started_at.strftime('%Y%m%d_%H%M%S')}"
+        files_sent = 0
+
+        with tempfile.TemporaryDirectory(prefix="log_export_") as directory:
+            writer = _CsvPartWriter(
+                directory, base_name, header,
+                part_size=self.settings.LOG_EXPORT_PART_SIZE_MB * MB,
+                compress_above=self.settings.LOG_EXPORT_COMPRESS_ABOVE_MB * MB)
+            try:
+                after = None
+                while True:
+                    # A session per batch: no transaction stays open during
+                    # the uploads (replica conflicts, vacuum on the primary)
+                    async with self.read_session_factory() as session:
+                        batch = await message_log_dal.get_message_logs_export_batch(
+                            session, after=after, since=filters.since, until=filters.until,
+                            user_id=filters.user_id, event_type=filters.event_type,
+                            limit=EXPORT_BATCH_SIZE)
+                    if not batch:
+                        break
+                    await asyncio.to_thread(writer.write_rows, [_csv_row(row) for row in batch])
+                    for path, rows in writer.take_finished():
+                        files_sent += 1
+                        await self._send_part(chat_id, path, files_sent, rows, lang)
+                    if len(batch) < EXPORT_BATCH_SIZE:
+                        break
+                    after = (batch[-1].timestamp, batch[-1].log_id)
+            finally:
+                last_parts = await asyncio.to_thread(writer.close)
+            if writer.rows_total:
+                for path, rows in last_parts:
+                    files_sent += 1
+                    await self._send_part(chat_id, path, files_sent, rows, lang,
+                                          single=files_sent == 1)
+        logging.info(
+            f"Exported {writer.rows_total} message logs to chat {chat_id} in {files_sent} file(s) "
+            f"({(datetime.now(timezone.utc) - started_at).total_seconds():.1f}s)")
+        return writer.rows_total, files_sent
+
+    async def _send_part(self, chat_id: int, path: str, number: int, rows: int, lang: str,
+                         single: bool = False) -> None:
+        _ = lambda key, **kwargs: self.i18n.gettext(lang, key, **kwargs)
+        name = os.path.basename(path)
+        if single:
+            # Only one file: no part number in its name
+            stem, _sep, extension = name.partition(".")
+            name = stem.rsplit("_", 1)[0] + "." + extension
+        await self.bot.send_document(
+            chat_id, FSInputFile(path, filename=name),
+            caption=_("admin_logs_export_part_caption", part=number, count=rows))
+        # Free the disk space early, big exports produce many parts
+        os.remove(path)
+
+    async def close(self) -> None:
+        tasks = [task for task in self._tasks.values() if not task.done()]
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
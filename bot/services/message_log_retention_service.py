@@ -0,0 +1,86 @@
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+from config.settings import Settings
+from db.dal import message_log_dal
+
+MAINTENANCE_INTERVAL_SECONDS = 6 * 3600
+# DDL on message_logs waits at most this long for its lock, then retries next run
+PARTITION_LOCK_TIMEOUT = "3s"
+
+
+class MessageLogRetentionService:
+    """
+    Maintains the monthly partitions of message_logs: creates the upcoming
+    months and drops the ones past MESSAGE_LOG_RETENTION_MONTHS, optionally
+    exporting them to MESSAGE_LOG_ARCHIVE_DIR first.
+    """
+
+    def __init__(self, settings: Settings, async_session_factory: sessionmaker,
+                 interval_seconds: float = MAINTENANCE_INTERVAL_SECONDS):
+        self.settings = settings
+        self.async_session_factory = async_session_factory
+        self.interval_seconds = interval_seconds
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="message-log-retention")
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Message log maintenance failed: {e}", exc_info=True)
+            await asyncio.sleep(self.interval_seconds)
+
+    async def run_once(self) -> Dict[str, List[str]]:
+        this_month = datetime.now(timezone.utc).date().replace(day=1)
+        async with self.async_session_factory() as session:
+            if not await message_log_dal.message_logs_partitioned(session):
+                return {"created": [], "dropped": []}
+            await session.execute(text(f"SET LOCAL lock_timeout = '{PARTITION_LOCK_TIMEOUT}'"))
+            created = await message_log_dal.create_month_partitions(
+                session, this_month,
+                message_log_dal.add_months(this_month, self.settings.MESSAGE_LOG_PARTITIONS_AHEAD))
+            await session.commit()
+            partitions = await message_log_dal.list_month_partitions(session)
+
+        dropped = []
+        retention_months = self.settings.MESSAGE_LOG_RETENTION_MONTHS
+        if retention_months > 0:
+            keep_from = message_log_dal.add_months(this_month, -retention_months)
+            for name, month in partitions:
+                if month >= keep_from:
+                    break
+                if await self._expire_partition(name):
+                    dropped.append(name)
+        return {"created": created, "dropped": dropped}
+
+    async def _expire_partition(self, name: str) -> bool:
+        archive_dir = self.settings.MESSAGE_LOG_ARCHIVE_DIR
+        try:
+            async with self.async_session_factory() as session:
+                if archive_dir:
+                    await message_log_dal.archive_partition(session, name, archive_dir)
+                await session.execute(text(f"SET LOCAL lock_timeout = '{PARTITION_LOCK_TIMEOUT}'"))
+                await message_log_dal.drop_partition(session, name)
+                await session.commit()
+            return True
+        except Exception as e:
+            # The partition stays until the next run, so nothing is lost unarchived
+            logging.error(f"Message logs: failed to expire partition {name}: {e}", exc_info=True)
+            return False
+
+    async def close(self) -> None:
+        if self._task and not self._task.done():
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
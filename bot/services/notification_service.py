@@ -4,6 +4,8 @@ from datetime import datetime
 from aiogram import Bot
 from config.settings import Settings
 from bot.middlewares.i18n import JsonI18n
+from bot.utils import send_queued_message
+from bot.utils.message_queue import PRIORITY_INTERACTIVE
 
 
 class NotificationService:
@@ -44,7 +46,8 @@ class NotificationService:
         # Send to all admins
         for admin_id in self.settings.ADMIN_IDS:
             try:
-                await self.bot.send_message(admin_id, notification_text)
+                await send_queued_message(
+                    self.bot, admin_id, notification_text, priority=PRIORITY_INTERACTIVE)
             except Exception as e:
                 logging.error(f"Failed to send new user notification to admin {admin_id}: {e}")
 
@@ -76,7 +79,8 @@ class NotificationService:
         # Send to all admins
         for admin_id in self.settings.ADMIN_IDS:
             try:
-                await self.bot.send_message(admin_id, notification_text)
+                await send_queued_message(
+                    self.bot, admin_id, notification_text, priority=PRIORITY_INTERACTIVE)
             except Exception as e:
                 logging.error(f"Failed to send subscription notification to admin {admin_id}: {e}")
 
@@ -114,7 +118,8 @@ class NotificationService:
         # Send to all admins
         for admin_id in self.settings.ADMIN_IDS:
             try:
-                await self.bot.send_message(admin_id, notification_text)
+                await send_queued_message(
+                    self.bot, admin_id, notification_text, priority=PRIORITY_INTERACTIVE)
             except Exception as e:
                 logging.error(f"Failed to send payment notification to admin {admin_id}: {e}")
 
@@ -146,7 +151,8 @@ class NotificationService:
         # Send to all admins
         for admin_id in self.settings.ADMIN_IDS:
             try:
-                await self.bot.send_message(admin_id, notification_text)
+                await send_queued_message(
+                    self.bot, admin_id, notification_text, priority=PRIORITY_INTERACTIVE)
             except Exception as e:
                 logging.error(f"Failed to send trial activation notification to admin {admin_id}: {e}")
 
@@ -180,6 +186,7 @@ class NotificationService:
         # Send to all admins
         for admin_id in self.settings.ADMIN_IDS:
             try:
-                await self.bot.send_message(admin_id, notification_text)
+                await send_queued_message(
+                    self.bot, admin_id, notification_text, priority=PRIORITY_INTERACTIVE)
             except Exception as e:
                 logging.error(f"Failed to send promo activation notification to admin {admin_id}: {e}")
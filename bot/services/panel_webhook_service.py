@@ -13,6 +13,7 @@ from bot.middlewares.i18n import JsonI18n
 from bot.keyboards.inline.user_keyboards import get_subscribe_only_markup, get_autorenew_cancel_keyboard
 from db.dal import user_dal
 from bot.utils.date_utils import add_months
+from bot.utils import send_queued_message
 
 EVENT_MAP = {
     "user.expires_in_72_hours": (3, "subscription_72h_notification"),
@@ -38,8 +39,8 @@ class PanelWebhookService:
     ):
         _ = lambda k, **kw: self.i18n.gettext(lang, k, **kw)
         try:
-            await self.bot.send_message(
-                user_id, _(message_key, **kwargs), reply_markup=reply_markup
+            await send_queued_message(
+                self.bot, user_id, _(message_key, **kwargs), reply_markup=reply_markup
             )
         except Exception as e:
             logging.error(f"Failed to send notification to {user_id}: {e}")
@@ -11,6 +11,7 @@ from db.models import User
 from db.dal import subscription_dal
 from bot.middlewares.i18n import JsonI18n
 from .subscription_service import SubscriptionService
+from bot.utils import send_queued_message
 
 
 class ReferralService:
@@ -94,7 +95,8 @@ class ReferralService:
                                 inviter_lang = inviter_user_model.language_code or default_lang_for_placeholder
                                 _i = lambda k, **kw: self.i18n.gettext(
                                     inviter_lang, k, **kw)
-                                await self.bot.send_message(
+                                await send_queued_message(
+                                    self.bot,
                                     inviter_user_id,
                                     _i("referral_bonus_inviter_notification_extended",
                                        days=inviter_bonus_days,
@@ -165,7 +167,8 @@ class ReferralService:
                                         inviter_lang = inviter_user_model.language_code or default_lang_for_placeholder
                                         _i = lambda k, **kw: self.i18n.gettext(
                                             inviter_lang, k, **kw)
-                                        await self.bot.send_message(
+                                        await send_queued_message(
+                                            self.bot,
                                             inviter_user_id,
                                             _i("referral_bonus_inviter_notification_new_sub",
                                                days=inviter_bonus_days,
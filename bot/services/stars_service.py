@@ -12,6 +12,7 @@ from .referral_service import ReferralService
 from bot.middlewares.i18n import JsonI18n
 from .notification_service import NotificationService
 from bot.keyboards.inline.user_keyboards import get_connect_and_main_keyboard
+from bot.utils import send_queued_message
 
 
 class StarsService:
@@ -142,7 +143,8 @@ class StarsService:
             current_lang, i18n, self.settings, config_link
         )
         try:
-            await self.bot.send_message(
+            await send_queued_message(
+                self.bot,
                 message.from_user.id,
                 success_msg,
                 reply_markup=markup,
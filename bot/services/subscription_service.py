@@ -5,12 +5,14 @@ from typing import Optional, Dict, Any, List, Tuple
 from aiogram import Bot
 from bot.middlewares.i18n import JsonI18n
 
-from db.dal import user_dal, subscription_dal, promo_code_dal, payment_dal, user_billing_dal
+from db.dal import user_dal, subscription_dal, promo_code_dal, payment_dal, user_billing_dal, ad_dal
 from bot.utils.date_utils import add_months
 from db.models import User, Subscription
 
 from config.settings import Settings
 from .panel_api_service import PanelApiService
+from bot.utils import send_queued_message
+from bot.utils.message_queue import PRIORITY_INTERACTIVE
 
 
 class SubscriptionService:
@@ -62,7 +64,8 @@ class SubscriptionService:
         msg = _adm("admin_panel_user_creation_failed", user_id=user_id)
         for admin_id in self.settings.ADMIN_IDS:
             try:
-                await self.bot.send_message(admin_id, msg)
+                await send_queued_message(
+                    self.bot, admin_id, msg, priority=PRIORITY_INTERACTIVE)
             except Exception as e:
                 logging.error(
                     f"Failed to notify admin {admin_id} about panel user creation failure: {e}"
@@ -358,6 +361,8 @@ class SubscriptionService:
         }
         try:
             await subscription_dal.upsert_subscription(session, trial_sub_data)
+            await user_dal.mark_trial_activated(session, user_id)
+            await ad_dal.mark_trial_activated(session, user_id)
         except Exception as e_upsert:
             logging.error(
                 f"Failed to upsert trial subscription for user {user_id}: {e_upsert}",
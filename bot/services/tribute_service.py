@@ -16,6 +16,7 @@ from bot.services.referral_service import ReferralService
 from .notification_service import NotificationService
 from bot.keyboards.inline.user_keyboards import get_connect_and_main_keyboard
 from db.dal import payment_dal, user_dal, subscription_dal
+from bot.utils import send_queued_message
 
 
 def convert_period_to_months(period: Optional[str]) -> int:
@@ -204,7 +205,8 @@ class TributeService:
                     )
 
                     try:
-                        await bot.send_message(
+                        await send_queued_message(
+                            bot,
                             int(user_id),
                             success_msg,
                             reply_markup=markup,
@@ -267,7 +269,8 @@ class TributeService:
                 )
                 
                 try:
-                    await bot.send_message(
+                    await send_queued_message(
+                        bot,
                         int(user_id),
                         cancellation_msg,
                         reply_markup=markup,
@@ -0,0 +1,88 @@
+import asyncio
+import logging
+from typing import Dict, List, Optional
+
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+from sqlalchemy.orm import sessionmaker
+
+from db.dal import user_dal
+
+FLUSH_INTERVAL_SECONDS = 5.0
+FLUSH_BATCH_SIZE = 500
+
+
+def unreachable_reason_for_error(error: Exception) -> Optional[str]:
+    """Return a reason code if the error means the user can't be messaged at all."""
+    error_text = str(error).lower()
+    if isinstance(error, TelegramForbiddenError):
+        if "blocked" in error_text:
+            return "bot_blocked"
+        if "deactivated" in error_text:
+            return "user_deactivated"
+        return "forbidden"
+    if isinstance(error, TelegramBadRequest) and "chat not found" in error_text:
+        return "chat_not_found"
+    return None
+
+
+class UnreachableUserService:
+    """
+    Collects "bot blocked" / "chat not found" delivery failures from the
+    message queue and writes them to users in batches, so broadcast audience
+    queries can skip these users.
+    """
+
+    def __init__(self,
+                 async_session_factory: sessionmaker,
+                 flush_interval: float = FLUSH_INTERVAL_SECONDS,
+                 batch_size: int = FLUSH_BATCH_SIZE):
+        self.async_session_factory = async_session_factory
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._pending: Dict[int, str] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+
+    def on_send_failure(self, chat_id: int, error: Exception) -> None:
+        """Message queue failure listener (sync, never raises)"""
+        if chat_id <= 0:
+            return
+        reason = unreachable_reason_for_error(error)
+        if not reason:
+            return
+        self._pending[chat_id] = reason
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.flush_interval)
+        await self.flush()
+
+    async def flush(self) -> int:
+        """Write pending flags to the database. Returns the number of users updated."""
+        updated = 0
+        async with self._flush_lock:
+            while self._pending:
+                batch_ids = list(self._pending.keys())[:self.batch_size]
+                by_reason: Dict[str, List[int]] = {}
+                for user_id in batch_ids:
+                    by_reason.setdefault(self._pending.pop(user_id), []).append(user_id)
+                try:
+                    async with self.async_session_factory() as session:
+                        for reason, user_ids in by_reason.items():
+                            updated += await user_dal.mark_users_unreachable(
+                                session, user_ids, reason)
+                        await session.commit()
+                except Exception as e:
+                    logging.error(
+                        f"UnreachableUserService: failed to flag {len(batch_ids)} users: {e}",
+                        exc_info=True)
+        if updated:
+            logging.info(f"UnreachableUserService: flagged {updated} users as unreachable")
+        return updated
+
+    async def close(self) -> None:
+        # Flush first: a timer task that is already writing holds the lock until done
+        await self.flush()
+        if self._flush_task and not self._flush_task.done():
+            self._flush_task.cancel()
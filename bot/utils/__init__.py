@@ -1,9 +1,11 @@
 # Bot utilities package
 
 from dataclasses import dataclass
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 from aiogram import types
 
+from bot.utils.message_queue import get_queue_manager, PRIORITY_INTERACTIVE, PRIORITY_TRANSACTIONAL
+
 
 @dataclass
 class MessageContent:
@@ -149,58 +151,73 @@ async def send_message_by_type(bot, chat_id: int, content: MessageContent, **kwa
             )
 
 
-async def send_message_via_queue(queue_manager, uid: int, content: MessageContent, **kwargs) -> None:
+def build_queue_call(content: MessageContent, **kwargs) -> Tuple[str, Dict[str, Any]]:
     """
-    Отправляет сообщение через очередь в зависимости от типа контента.
-    Использует match/case вместо длинных if-elif цепочек.
-    Автоматически фильтрует неподдерживаемые параметры.
+    Возвращает (метод бота, kwargs) для отправки контента через очередь.
+    Результат не зависит от получателя, поэтому один и тот же словарь можно
+    передать в очередь для многих получателей (рассылка хранит payload один раз).
     """
     # Фильтруем kwargs для данного типа сообщения
     filtered_kwargs = filter_kwargs(content.content_type, kwargs)
 
     match content.content_type:
         case "text":
-            await queue_manager.send_message(
-                chat_id=uid, text=content.text, **filtered_kwargs
-            )
-        case "photo":
-            await queue_manager.send_photo(
-                chat_id=uid, photo=content.file_id, caption=content.text or None, **filtered_kwargs
-            )
-        case "video":
-            await queue_manager.send_video(
-                chat_id=uid, video=content.file_id, caption=content.text or None, **filtered_kwargs
-            )
-        case "animation":
-            await queue_manager.send_animation(
-                chat_id=uid, animation=content.file_id, caption=content.text or None, **filtered_kwargs
-            )
-        case "document":
-            await queue_manager.send_document(
-                chat_id=uid, document=content.file_id, caption=content.text or None, **filtered_kwargs
-            )
-        case "audio":
-            await queue_manager.send_audio(
-                chat_id=uid, audio=content.file_id, caption=content.text or None, **filtered_kwargs
-            )
-        case "voice":
-            await queue_manager.send_voice(
-                chat_id=uid, voice=content.file_id, caption=content.text or None, **filtered_kwargs
-            )
-        case "sticker":
-            await queue_manager.send_sticker(
-                chat_id=uid, sticker=content.file_id, **filtered_kwargs
-            )
-        case "video_note":
-            await queue_manager.send_video_note(
-                chat_id=uid, video_note=content.file_id, **filtered_kwargs
-            )
+            return "send_message", {"text": content.text, **filtered_kwargs}
+        case "photo" | "video" | "animation" | "document" | "audio" | "voice":
+            return f"send_{content.content_type}", {
+                content.content_type: content.file_id,
+                "caption": content.text or None,
+                **filtered_kwargs,
+            }
+        case "sticker" | "video_note":
+            return f"send_{content.content_type}", {
+                content.content_type: content.file_id,
+                **filtered_kwargs,
+            }
         case _:
             # Fallback для неизвестных типов - отправляем как текст
             text_kwargs = filter_kwargs("text", kwargs)
-            await queue_manager.send_message(
-                chat_id=uid, text=content.text or "Unknown content type", **text_kwargs
-            )
+            return "send_message", {"text": content.text or "Unknown content type", **text_kwargs}
+
+
+async def send_message_via_queue(queue_manager, uid: int, content: MessageContent,
+                                 callback=None, priority: int = PRIORITY_INTERACTIVE,
+                                 **kwargs) -> None:
+    """
+    Отправляет сообщение через очередь в зависимости от типа контента.
+    Автоматически фильтрует неподдерживаемые параметры.
+    callback (если задан) получит результат отправки или исключение.
+    """
+    method_name, call_kwargs = build_queue_call(content, **kwargs)
+    await queue_manager.enqueue(uid, method_name, call_kwargs, callback=callback, priority=priority)
+
+
+async def send_queued_message(bot, chat_id: int, text: str,
+                              priority: int = PRIORITY_TRANSACTIONAL, **kwargs) -> None:
+    """
+    Отправляет текст через очередь с заданным приоритетом: сообщение учитывается
+    в общем лимите Telegram и обгоняет массовые рассылки.
+    Если очередь ещё не запущена, отправляет напрямую.
+    """
+    queue_manager = get_queue_manager()
+    if queue_manager is None:
+        await bot.send_message(chat_id, text, **kwargs)
+        return
+    await queue_manager.send_message(chat_id=chat_id, text=text, priority=priority, **kwargs)
+
+
+async def edit_message_via_queue(message: types.Message, text: str, **kwargs) -> None:
+    """
+    Редактирует сообщение через очередь. Ещё не отправленная правка того же
+    сообщения заменяется новой, так что для индикаторов прогресса уходит только
+    последнее состояние. Если очередь ещё не запущена, редактирует напрямую.
+    """
+    queue_manager = get_queue_manager()
+    if queue_manager is None:
+        await message.edit_text(text, **kwargs)
+        return
+    await queue_manager.edit_message_text(
+        chat_id=message.chat.id, message_id=message.message_id, text=text, **kwargs)
 
 
 async def send_direct_message(bot, chat_id: int, content: MessageContent, extra_text: str = "", **kwargs) -> None:
@@ -0,0 +1,32 @@
+import asyncio
+import logging
+
+# Tasks that shutdown waits for, e.g. webhook updates handled in the background
+# (see InFlightUpdatesMiddleware). The set also keeps strong references to them.
+_tasks: set[asyncio.Task] = set()
+
+
+def track_task(task: asyncio.Task) -> asyncio.Task:
+    """Register an already running task so shutdown waits for it"""
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    return task
+
+
+async def wait_background_tasks(timeout: float) -> int:
+    """
+    Wait up to `timeout` seconds for tracked tasks, then cancel the rest.
+    Returns the number of cancelled tasks.
+    """
+    current = asyncio.current_task()
+    tasks = [task for task in _tasks if task is not current]
+    if not tasks:
+        return 0
+    logging.info(f"Waiting for {len(tasks)} background task(s) to finish...")
+    _done, pending = await asyncio.wait(tasks, timeout=timeout)
+    for task in pending:
+        logging.warning(f"Background task {task.get_name()} did not finish in time, cancelling")
+        task.cancel()
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
+    return len(pending)
@@ -1,78 +1,549 @@
 import asyncio
 import logging
-from typing import Dict, Any, Callable, Awaitable, Optional
+import random
+import sys
+import time
+from typing import Dict, Any, Callable, Awaitable, Optional, Tuple, List
 from dataclasses import dataclass
-from datetime import datetime, timedelta
 from collections import deque
 from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramBadRequest,
+    TelegramRetryAfter,
+    TelegramNetworkError,
+    TelegramServerError,
+)
 
+SEND_STATS_WINDOW_SECONDS = 60
+CHAT_LIMITERS_PRUNE_THRESHOLD = 10_000
+DEAD_LETTERS_MAX = 1000
+RETRY_BACKOFF_BASE_SECONDS = 1.0
+RETRY_BACKOFF_MAX_SECONDS = 60.0
+# Bulk producers wait once this many messages are pending (~10 min of sending at 25 msg/s)
+USER_QUEUE_MAX_PENDING = 15_000
+GROUP_QUEUE_MAX_PENDING = 1_000
+GLOBAL_MESSAGES_PER_SECOND = 25
+GLOBAL_BURST_SIZE = 5
+DRAIN_POLL_SECONDS = 0.1
 
-@dataclass
+# Outcomes of a failed send, see MessageQueue._classify_error
+ERROR_RETRY_AFTER = "retry_after"
+ERROR_TRANSIENT = "transient"
+ERROR_PERMANENT = "permanent"
+
+# Receives the send result, or the exception that made the send fail for good
+SendCallback = Callable[[Any], Awaitable[None]]
+
+# Priority classes, served strictly in this order. All of them share the queue's
+# rate budget, so a pending payment message goes out before the next broadcast one.
+PRIORITY_TRANSACTIONAL = 0  # payments, subscription changes
+PRIORITY_INTERACTIVE = 1    # replies, admin notifications, progress messages
+PRIORITY_BULK = 2           # broadcasts
+PRIORITY_NAMES = ("transactional", "interactive", "bulk")
+
+# Methods where a newer pending call for the same message replaces the older one
+COALESCED_METHODS = frozenset({"edit_message_text"})
+
+
+@dataclass(slots=True)
 class QueuedMessage:
     """Represents a queued message with all necessary parameters"""
     chat_id: int
     method_name: str  # 'send_message', 'edit_message_text', etc.
+    # May be shared by many messages (one broadcast payload); never modified by the queue
     kwargs: Dict[str, Any]
-    callback: Optional[Callable[[Any], Awaitable[None]]] = None  # Optional callback for result
+    callback: Optional[SendCallback] = None
+    priority: int = PRIORITY_INTERACTIVE
+    attempts: int = 0
+
+
+@dataclass
+class DeadLetter:
+    """A message that could not be delivered"""
+    chat_id: int
+    method_name: str
+    error: str
+    attempts: int
+    failed_at: float  # unix time
+
+
+class TokenBucket:
+    """
+    Token bucket rate limiter on the monotonic clock.
+
+    Allows up to `capacity` calls at once, then refills at `rate` tokens
+    per second. At most `capacity + rate * T` calls pass in any window of T seconds.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = float(rate)
+        self.capacity = max(1.0, float(capacity))
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self.updated_at
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated_at = now
+
+    def try_acquire(self, tokens: float = 1.0) -> float:
+        """Take tokens if available. Returns 0 on success or the seconds to wait otherwise."""
+        self._refill(time.monotonic())
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return 0.0
+        return (tokens - self.tokens) / self.rate
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        """Wait until tokens are available and take them"""
+        async with self._lock:
+            while True:
+                wait_time = self.try_acquire(tokens)
+                if wait_time <= 0:
+                    return
+                await asyncio.sleep(wait_time)
 
 
 class MessageQueue:
-    """Message queue with rate limiting for Telegram API"""
+    """
+    Message queue with token-bucket rate limiting for Telegram API.
+
+    Messages are kept in one lane per (priority, chat) and lanes of the same
+    priority are served round-robin, so a chat with many pending messages does
+    not delay the others. A lower priority class is only served when no lane of
+    a higher class can send. Each chat has its own token bucket (optional) on
+    top of the queue-wide bucket.
+
+    Up to `max_in_flight` sender tasks send concurrently, so throughput is not
+    capped at 1/RTT. A chat never has more than one send in flight, which keeps
+    per-chat message order.
+
+    Failed sends are retried: a flood-wait pauses the chat lane for the time
+    Telegram asks for, transient errors back off exponentially, and permanent
+    errors (or exhausted retries) go to `dead_letters`.
+
+    A pending edit_message_text for a message is replaced by a newer edit of
+    the same message, so progress displays only send their latest state.
+
+    With `max_pending` set, producers of bulk messages wait in `add_message`
+    while the queue is full. Transactional and interactive messages are always
+    accepted, so a broadcast can't hold up a payment confirmation.
+
+    `drain` closes the queue for shutdown: new messages are refused, pending
+    bulk messages are dropped and the rest are sent until the deadline.
+    """
     
-    def __init__(self, messages_per_second: float, burst_size: int = 5):
+    def __init__(self, messages_per_second: float, burst_size: int = 5,
+                 max_in_flight: int = 1,
+                 per_chat_messages_per_second: Optional[float] = None,
+                 per_chat_burst_size: int = 1,
+                 rate_limiter: Optional[TokenBucket] = None,
+                 max_retries: int = 5,
+                 failure_listener: Optional[Callable[[int, Exception], None]] = None,
+                 max_pending: Optional[int] = None):
         self.messages_per_second = messages_per_second
         self.burst_size = burst_size
-        self.queue: deque[QueuedMessage] = deque()
-        self.last_send_times: deque[datetime] = deque()
-        self.is_processing = False
-        self.delay_between_messages = 1.0 / messages_per_second
+        self.max_in_flight = max(1, max_in_flight)
+        self.per_chat_messages_per_second = per_chat_messages_per_second
+        self.per_chat_burst_size = per_chat_burst_size
+        # A limiter may be shared between queues that draw on the same Telegram budget
+        self.rate_limiter = rate_limiter or TokenBucket(messages_per_second, burst_size)
+        self.max_retries = max_retries
+        # Called with (chat_id, error) for every message that ends up undelivered
+        self.failure_listener = failure_listener
+        self.max_pending = max_pending
+        self.peak_pending = 0
+        self.in_flight = 0
+        self.closed = False
+        self.dead_letters: deque[DeadLetter] = deque(maxlen=DEAD_LETTERS_MAX)
+        self.counters: Dict[str, int] = {
+            "sent": 0,
+            "retry_after": 0,
+            "transient_retries": 0,
+            "dead_lettered": 0,
+            "coalesced": 0,
+            "dropped_on_shutdown": 0,
+        }
+
+        # (priority, chat_id) -> messages of that chat in that class, in order
+        self._lanes: Dict[Tuple[int, int], deque[QueuedMessage]] = {}
+        # Per priority class: chats with pending messages, round-robin order
+        self._ready_chats: List[deque[int]] = [deque() for _ in PRIORITY_NAMES]
+        self._pending_by_priority: List[int] = [0] * len(PRIORITY_NAMES)
+        self._busy_chats: set[int] = set()
+        self._paused_chats: Dict[int, float] = {}  # chat_id -> monotonic resume time
+        self._chat_limiters: Dict[int, TokenBucket] = {}
+        # (chat_id, message_id, inline_message_id) -> the pending edit of that message
+        self._pending_edits: Dict[Tuple[int, Any, Any], QueuedMessage] = {}
+        self._chat_limiters_prune_at = CHAT_LIMITERS_PRUNE_THRESHOLD
+        self._pending = 0
+        self._wakeup = asyncio.Event()
+        self._space_available = asyncio.Event()
+        self._space_available.set()
+        self._workers: set[asyncio.Task] = set()
+        # Sends per wall-clock second for the last minute: (second, count) pairs
+        self._send_counts: deque[list] = deque()
+
+    @property
+    def is_processing(self) -> bool:
+        return bool(self._workers)
+
+    def pending_count(self) -> int:
+        return self._pending
+
+    def pending_by_priority(self) -> Dict[str, int]:
+        return dict(zip(PRIORITY_NAMES, self._pending_by_priority))
+
+    def memory_usage(self) -> Dict[str, int]:
+        """
+        Approximate memory held by pending messages. Payload dicts shared by
+        several messages are counted once; nested objects are not followed.
+        """
+        payload_ids: set[int] = set()
+        message_bytes = payload_bytes = 0
+        for lane in self._lanes.values():
+            message_bytes += sys.getsizeof(lane)
+            for message in lane:
+                message_bytes += sys.getsizeof(message)
+                if id(message.kwargs) in payload_ids:
+                    continue
+                payload_ids.add(id(message.kwargs))
+                payload_bytes += sys.getsizeof(message.kwargs) + sum(
+                    sys.getsizeof(value) for value in message.kwargs.values())
+        return {
+            "messages": self._pending,
+            "payloads": len(payload_ids),
+            "bytes": message_bytes + payload_bytes,
+        }
+
+    def active_chats_count(self) -> int:
+        return len({chat_id for _priority, chat_id in self._lanes})
         
     async def add_message(self, message: QueuedMessage) -> None:
-        """Add message to queue"""
-        self.queue.append(message)
-        if not self.is_processing:
-            asyncio.create_task(self._process_queue())
-    
-    async def _process_queue(self) -> None:
-        """Process messages from queue with rate limiting"""
-        if self.is_processing:
+        """Add message to its (priority, chat) lane"""
+        message.priority = min(max(message.priority, 0), len(PRIORITY_NAMES) - 1)
+        if self.closed:
+            self._drop_on_shutdown(message)
             return
-            
-        self.is_processing = True
-        
+        if self._coalesce(message):
+            return
+        if self.max_pending and message.priority == PRIORITY_BULK:
+            # Backpressure: bulk producers wait until senders make room
+            while self._pending >= self.max_pending and not self.closed:
+                self._space_available.clear()
+                await self._space_available.wait()
+            if self.closed:
+                self._drop_on_shutdown(message)
+                return
+        self._push(message)
+        self._wakeup.set()
+        self._ensure_workers()
+
+    @staticmethod
+    def _edit_key(message: QueuedMessage) -> Optional[Tuple[int, Any, Any]]:
+        if message.method_name not in COALESCED_METHODS:
+            return None
+        return (message.chat_id, message.kwargs.get("message_id"),
+                message.kwargs.get("inline_message_id"))
+
+    def _coalesce(self, message: QueuedMessage) -> bool:
+        """Fold a new edit into a pending edit of the same message. Returns True if folded."""
+        edit_key = self._edit_key(message)
+        pending = self._pending_edits.get(edit_key) if edit_key else None
+        if pending is None:
+            return False
+        # The pending edit keeps its place in the lane but sends the newest content
+        pending.kwargs = message.kwargs
+        if message.callback:
+            if pending.callback:
+                first, second = pending.callback, message.callback
+
+                async def pending_callback(result: Any) -> None:
+                    await first(result)
+                    await second(result)
+
+                pending.callback = pending_callback
+            else:
+                pending.callback = message.callback
+        self.counters["coalesced"] += 1
+        return True
+
+    def _push(self, message: QueuedMessage, to_front: bool = False) -> None:
+        edit_key = self._edit_key(message)
+        if edit_key and edit_key not in self._pending_edits:
+            self._pending_edits[edit_key] = message
+        key = (message.priority, message.chat_id)
+        lane = self._lanes.get(key)
+        if lane is None:
+            lane = self._lanes[key] = deque()
+            self._ready_chats[message.priority].append(message.chat_id)
+        if to_front:
+            lane.appendleft(message)
+        else:
+            lane.append(message)
+        self._pending += 1
+        self._pending_by_priority[message.priority] += 1
+        self.peak_pending = max(self.peak_pending, self._pending)
+
+    async def drain(self, timeout: float) -> int:
+        """
+        Close the queue and send what is left within `timeout` seconds.
+
+        Pending bulk messages are dropped right away: broadcast recipients stay
+        pending in the database and get them when the job resumes. Callbacks of
+        dropped messages are not called. Returns the number of other messages
+        left unsent.
+        """
+        self.closed = True
+        # Wake bulk producers blocked on backpressure so they see the queue is closed
+        self._space_available.set()
+        bulk_dropped = self._drop_lanes(PRIORITY_BULK)
+        if bulk_dropped:
+            logging.info(f"Message queue closed: dropped {bulk_dropped} pending bulk messages")
+        # Idle workers re-check the queue and exit if nothing is left
+        self._wakeup.set()
+
+        lost = 0
+        deadline = time.monotonic() + timeout
+        while self._workers and time.monotonic() < deadline:
+            await asyncio.sleep(DRAIN_POLL_SECONDS)
+
+        if self._workers:
+            lost += self.in_flight + self._drop_lanes()
+            workers = list(self._workers)
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+        return lost
+
+    def _drop_on_shutdown(self, message: QueuedMessage) -> None:
+        self.counters["dropped_on_shutdown"] += 1
+        if message.priority == PRIORITY_BULK:
+            return
+        logging.warning(
+            f"Message queue is closed, dropped {message.method_name} to {message.chat_id}")
+
+    def _drop_lanes(self, priority: Optional[int] = None) -> int:
+        """Remove pending messages of one priority class (or all). Returns how many."""
+        dropped = 0
+        for key in [key for key in self._lanes if priority is None or key[0] == priority]:
+            for message in self._lanes.pop(key):
+                edit_key = self._edit_key(message)
+                if edit_key and self._pending_edits.get(edit_key) is message:
+                    del self._pending_edits[edit_key]
+                self._pending_by_priority[message.priority] -= 1
+                dropped += 1
+        for class_priority, ready_chats in enumerate(self._ready_chats):
+            if priority is None or class_priority == priority:
+                ready_chats.clear()
+        self._pending -= dropped
+        self.counters["dropped_on_shutdown"] += dropped
+        return dropped
+
+    def _ensure_workers(self) -> None:
+        """Start sender tasks for pending messages, up to max_in_flight"""
+        missing = min(self.max_in_flight - len(self._workers), self._pending)
+        for _ in range(max(0, missing)):
+            task = asyncio.create_task(self._sender_worker())
+            self._workers.add(task)
+
+    def _get_chat_limiter(self, chat_id: int) -> Optional[TokenBucket]:
+        if not self.per_chat_messages_per_second:
+            return None
+        limiter = self._chat_limiters.get(chat_id)
+        if limiter is None:
+            if len(self._chat_limiters) >= self._chat_limiters_prune_at:
+                self._prune_chat_limiters()
+            limiter = self._chat_limiters[chat_id] = TokenBucket(
+                self.per_chat_messages_per_second, self.per_chat_burst_size
+            )
+        return limiter
+
+    def _prune_chat_limiters(self) -> None:
+        """Forget limiters of idle chats whose bucket has refilled completely"""
+        queued_chats = {chat_id for _priority, chat_id in self._lanes}
+        for chat_id, limiter in list(self._chat_limiters.items()):
+            if chat_id in queued_chats or chat_id in self._busy_chats:
+                continue
+            if limiter.try_acquire(limiter.capacity) == 0:
+                del self._chat_limiters[chat_id]
+        self._chat_limiters_prune_at = max(
+            CHAT_LIMITERS_PRUNE_THRESHOLD, 2 * len(self._chat_limiters)
+        )
+
+    def _pick_next(self) -> Tuple[Optional[QueuedMessage], float]:
+        """
+        Take the next message: the highest priority class that has a chat able to
+        send, round-robin across chats within the class.
+        Returns (message, 0) or (None, seconds until a rate-limited chat frees up).
+        """
+        min_wait = float("inf")
+        for priority, ready_chats in enumerate(self._ready_chats):
+            for _ in range(len(ready_chats)):
+                chat_id = ready_chats.popleft()
+                if chat_id in self._busy_chats:
+                    ready_chats.append(chat_id)
+                    continue
+                resume_at = self._paused_chats.get(chat_id)
+                if resume_at is not None:
+                    remaining = resume_at - time.monotonic()
+                    if remaining > 0:
+                        min_wait = min(min_wait, remaining)
+                        ready_chats.append(chat_id)
+                        continue
+                    del self._paused_chats[chat_id]
+                limiter = self._get_chat_limiter(chat_id)
+                wait_time = limiter.try_acquire() if limiter else 0.0
+                if wait_time > 0:
+                    min_wait = min(min_wait, wait_time)
+                    ready_chats.append(chat_id)
+                    continue
+
+                key = (priority, chat_id)
+                lane = self._lanes[key]
+                message = lane.popleft()
+                edit_key = self._edit_key(message)
+                if edit_key and self._pending_edits.get(edit_key) is message:
+                    del self._pending_edits[edit_key]
+                self._pending -= 1
+                self._pending_by_priority[priority] -= 1
+                if not self.max_pending or self._pending < self.max_pending:
+                    self._space_available.set()
+                if lane:
+                    ready_chats.append(chat_id)
+                else:
+                    del self._lanes[key]
+                return message, 0.0
+        return None, min_wait
+    
+    async def _sender_worker(self) -> None:
+        """Send messages until no chat has pending messages, respecting the rate limits"""
         try:
-            while self.queue:
-                # Check if we need to wait
-                await self._wait_if_needed()
-                
-                # Get and process next message
-                message = self.queue.popleft()
+            while self._pending:
+                message, wait_time = self._pick_next()
+                if message is None:
+                    # Every pending chat is busy or over its own limit
+                    self._wakeup.clear()
+                    timeout = None if wait_time == float("inf") else wait_time
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+                self._busy_chats.add(message.chat_id)
                 try:
-                    await self._send_message(message)
-                    self.last_send_times.append(datetime.now())
-                    
-                    # Keep only recent send times (last minute)
-                    cutoff_time = datetime.now() - timedelta(seconds=60)
-                    while self.last_send_times and self.last_send_times[0] < cutoff_time:
-                        self.last_send_times.popleft()
-                        
-                except Exception as e:
-                    logging.error(f"Failed to send queued message to {message.chat_id}: {e}")
-                    
+                    await self.rate_limiter.acquire()
+                    self.in_flight += 1
+                    try:
+                        result = await self._send_message(message)
+                        self._record_send()
+                        self.counters["sent"] += 1
+                        is_final = True
+                    except Exception as e:
+                        result = e
+                        is_final = self._handle_send_error(message, e)
+                    finally:
+                        self.in_flight -= 1
+                finally:
+                    self._busy_chats.discard(message.chat_id)
+                    self._wakeup.set()
+
+                if is_final:
+                    await self._run_callback(message, result)
         finally:
-            self.is_processing = False
-    
-    async def _wait_if_needed(self) -> None:
-        """Wait if we need to respect rate limits"""
-        if not self.last_send_times:
+            # No await between the empty-queue check and this removal, so
+            # add_message never sees a finished worker as still running
+            self._workers.discard(asyncio.current_task())
+
+    def _classify_error(self, error: Exception) -> Tuple[str, float]:
+        """Return (error kind, seconds to wait before retrying)"""
+        if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+            return ERROR_TRANSIENT, 0.0
+        return ERROR_PERMANENT, 0.0
+
+    def _handle_send_error(self, message: QueuedMessage, error: Exception) -> bool:
+        """Requeue or dead-letter a failed message. Returns True if the failure is final."""
+        message.attempts += 1
+        kind, retry_after = self._classify_error(error)
+
+        if kind == ERROR_RETRY_AFTER and message.attempts <= self.max_retries:
+            self.counters["retry_after"] += 1
+            logging.warning(
+                f"Flood control for chat {message.chat_id}: pausing its lane for {retry_after}s "
+                f"(attempt {message.attempts}/{self.max_retries})"
+            )
+            self._requeue(message, retry_after)
+            return False
+
+        if kind == ERROR_TRANSIENT and message.attempts <= self.max_retries:
+            self.counters["transient_retries"] += 1
+            backoff = min(
+                RETRY_BACKOFF_MAX_SECONDS,
+                RETRY_BACKOFF_BASE_SECONDS * 2 ** (message.attempts - 1),
+            ) * random.uniform(0.8, 1.2)
+            logging.warning(
+                f"Transient error sending to {message.chat_id}: {error}. "
+                f"Retrying in {backoff:.1f}s (attempt {message.attempts}/{self.max_retries})"
+            )
+            self._requeue(message, backoff)
+            return False
+
+        self._dead_letter(message, error)
+        return True
+
+    def _requeue(self, message: QueuedMessage, delay: float) -> None:
+        """Put a message back at the head of its lane and pause the lane for `delay` seconds"""
+        chat_id = message.chat_id
+        resume_at = time.monotonic() + delay
+        self._paused_chats[chat_id] = max(resume_at, self._paused_chats.get(chat_id, 0.0))
+        self._push(message, to_front=True)
+
+    def _dead_letter(self, message: QueuedMessage, error: Exception) -> None:
+        self.counters["dead_lettered"] += 1
+        self.dead_letters.append(DeadLetter(
+            chat_id=message.chat_id,
+            method_name=message.method_name,
+            error=f"{type(error).__name__}: {error}",
+            attempts=message.attempts,
+            failed_at=time.time(),
+        ))
+        logging.warning(
+            f"Dropped queued {message.method_name} to {message.chat_id} after "
+            f"{message.attempts} attempt(s): {type(error).__name__}: {error}"
+        )
+        if self.failure_listener:
+            try:
+                self.failure_listener(message.chat_id, error)
+            except Exception as e:
+                logging.error(f"Message queue failure listener error: {e}", exc_info=True)
+
+    async def _run_callback(self, message: QueuedMessage, result: Any) -> None:
+        """Pass the send result (or the exception it raised) to the message callback"""
+        if not message.callback:
             return
-            
-        # Calculate time since last message
-        time_since_last = (datetime.now() - self.last_send_times[-1]).total_seconds()
-        
-        if time_since_last < self.delay_between_messages:
-            wait_time = self.delay_between_messages - time_since_last
-            await asyncio.sleep(wait_time)
+        try:
+            await message.callback(result)
+        except Exception as e:
+            logging.error(f"Queued message callback failed for {message.chat_id}: {e}", exc_info=True)
+
+    def _record_send(self) -> None:
+        second = int(time.monotonic())
+        if self._send_counts and self._send_counts[-1][0] == second:
+            self._send_counts[-1][1] += 1
+            return
+        self._send_counts.append([second, 1])
+        while self._send_counts[0][0] <= second - SEND_STATS_WINDOW_SECONDS:
+            self._send_counts.popleft()
+
+    def recent_sends(self) -> int:
+        """Number of messages sent during the last minute"""
+        cutoff = int(time.monotonic()) - SEND_STATS_WINDOW_SECONDS
+        return sum(count for second, count in self._send_counts if second > cutoff)
     
     async def _send_message(self, message: QueuedMessage) -> Any:
         """Send a single message - to be implemented by subclass"""
@@ -82,158 +553,197 @@ class MessageQueue:
 class TelegramMessageQueue(MessageQueue):
     """Telegram-specific message queue"""
     
-    def __init__(self, bot: Bot, messages_per_second: float, burst_size: int = 5):
-        super().__init__(messages_per_second, burst_size)
+    def __init__(self, bot: Bot, messages_per_second: float, burst_size: int = 5,
+                 **queue_options):
+        super().__init__(messages_per_second, burst_size, **queue_options)
         self.bot = bot
     
+    def _classify_error(self, error: Exception) -> Tuple[str, float]:
+        """Map aiogram exceptions to retry decisions"""
+        if isinstance(error, TelegramRetryAfter):
+            return ERROR_RETRY_AFTER, float(error.retry_after)
+        if isinstance(error, (TelegramNetworkError, TelegramServerError)):
+            return ERROR_TRANSIENT, 0.0
+        # Blocked bot, deleted chat, bad request, etc. will not succeed on retry
+        return super()._classify_error(error)
+    
     async def _send_message(self, message: QueuedMessage) -> Any:
         """Send message using bot method"""
         method = getattr(self.bot, message.method_name)
-        result = await method(chat_id=message.chat_id, **message.kwargs)
-        
-        # Call callback if provided
-        if message.callback:
-            await message.callback(result)
-            
-        return result
+        try:
+            return await method(chat_id=message.chat_id, **message.kwargs)
+        except TelegramBadRequest as e:
+            # An edit to the content the message already shows is a no-op, not a failure
+            if message.method_name in COALESCED_METHODS and "message is not modified" in str(e):
+                return None
+            raise
 
 
 class MessageQueueManager:
     """Manager for different types of message queues"""
     
-    def __init__(self, bot: Bot):
+    def __init__(self, bot: Bot,
+                 failure_listener: Optional[Callable[[int, Exception], None]] = None,
+                 rate_limiter: Optional[TokenBucket] = None):
         self.bot = bot
+        # Shared Postgres outbox (see bot.utils.shared_queue), None for the in-memory backend
+        self.outbox = None
         
-        # Different queues for different types of chats
+        # Telegram allows ~30 messages per second per bot across all chats;
+        # 5 + 25/s stays within it. Both queues draw on this one budget.
+        # With several bot processes the budget comes from a shared ledger instead.
+        self.global_rate_limiter = rate_limiter or TokenBucket(
+            rate=GLOBAL_MESSAGES_PER_SECOND, capacity=GLOBAL_BURST_SIZE)
+
+        # Groups: Telegram allows ~20 messages per minute per group, 3 + 15/min stays below it
         self.group_queue = TelegramMessageQueue(
             bot=bot,
-            messages_per_second=15/60,  # 15 messages per minute for groups
-            burst_size=3
+            messages_per_second=25,
+            burst_size=5,
+            max_in_flight=4,
+            per_chat_messages_per_second=15/60,
+            per_chat_burst_size=3,
+            rate_limiter=self.global_rate_limiter,
+            failure_listener=failure_listener,
+            max_pending=GROUP_QUEUE_MAX_PENDING,
         )
         
+        # Users: about one message per second per private chat, short bursts are tolerated
         self.user_queue = TelegramMessageQueue(
             bot=bot, 
-            messages_per_second=25,  # 25 messages per second for users
-            burst_size=10
+            messages_per_second=25,
+            burst_size=5,
+            # Enough concurrent sends to reach 25 msg/s at Telegram RTTs of up to ~400 ms
+            max_in_flight=10,
+            per_chat_messages_per_second=1,
+            per_chat_burst_size=3,
+            rate_limiter=self.global_rate_limiter,
+            failure_listener=failure_listener,
+            max_pending=USER_QUEUE_MAX_PENDING,
         )
     
     def _is_group_chat(self, chat_id: int) -> bool:
-        """Check if chat_id belongs to a group or channel"""
-        return str(chat_id).startswith('-100')
+        """Check if chat_id belongs to a group or channel (basic groups included)"""
+        return chat_id < 0
     
-    async def send_message(self, chat_id: int, **kwargs) -> None:
-        """Queue a send_message call"""
+    async def enqueue(self, chat_id: int, method_name: str, kwargs: Dict[str, Any],
+                      callback: Optional[SendCallback] = None,
+                      priority: int = PRIORITY_INTERACTIVE) -> None:
+        """
+        Queue a bot method call. `kwargs` is stored by reference, so one dict can
+        serve many recipients. Bulk messages may wait here while the queue is full.
+        With the shared outbox, calls that need no callback go through the database
+        and are sent by whichever bot process claims them.
+        """
+        if self.outbox and await self.outbox.add(chat_id, method_name, kwargs, callback, priority):
+            return
+        await self.enqueue_local(chat_id, method_name, kwargs, callback, priority)
+
+    async def enqueue_local(self, chat_id: int, method_name: str, kwargs: Dict[str, Any],
+                            callback: Optional[SendCallback] = None,
+                            priority: int = PRIORITY_INTERACTIVE) -> None:
+        """Queue a bot method call in this process"""
         queue = self.group_queue if self._is_group_chat(chat_id) else self.user_queue
         message = QueuedMessage(
             chat_id=chat_id,
-            method_name='send_message',
-            kwargs=kwargs
+            method_name=method_name,
+            kwargs=kwargs,
+            callback=callback,
+            priority=priority,
         )
         await queue.add_message(message)
-    
-    async def edit_message_text(self, chat_id: int, **kwargs) -> None:
+
+    async def send_message(self, chat_id: int, callback: Optional[SendCallback] = None,
+                           priority: int = PRIORITY_INTERACTIVE, **kwargs) -> None:
+        """Queue a send_message call"""
+        await self.enqueue(chat_id, 'send_message', kwargs, callback, priority)
+
+    async def edit_message_text(self, chat_id: int, callback: Optional[SendCallback] = None,
+                                priority: int = PRIORITY_INTERACTIVE, **kwargs) -> None:
         """Queue an edit_message_text call"""
-        queue = self.group_queue if self._is_group_chat(chat_id) else self.user_queue
-        message = QueuedMessage(
-            chat_id=chat_id,
-            method_name='edit_message_text',
-            kwargs=kwargs
-        )
-        await queue.add_message(message)
-    
-    async def send_document(self, chat_id: int, **kwargs) -> None:
+        await self.enqueue(chat_id, 'edit_message_text', kwargs, callback, priority)
+
+    async def send_document(self, chat_id: int, callback: Optional[SendCallback] = None,
+                            priority: int = PRIORITY_INTERACTIVE, **kwargs) -> None:
         """Queue a send_document call"""
-        queue = self.group_queue if self._is_group_chat(chat_id) else self.user_queue
-        message = QueuedMessage(
-            chat_id=chat_id,
-            method_name='send_document',
-            kwargs=kwargs
-        )
-        await queue.add_message(message)
+        await self.enqueue(chat_id, 'send_document', kwargs, callback, priority)
 
-    async def send_photo(self, chat_id: int, **kwargs) -> None:
+    async def send_photo(self, chat_id: int, callback: Optional[SendCallback] = None,
+                         priority: int = PRIORITY_INTERACTIVE, **kwargs) -> None:
         """Queue a send_photo call"""
-        queue = self.group_queue if self._is_group_chat(chat_id) else self.user_queue
-        message = QueuedMessage(
-            chat_id=chat_id,
-            method_name='send_photo',
-            kwargs=kwargs
-        )
-        await queue.add_message(message)
+        await self.enqueue(chat_id, 'send_photo', kwargs, callback, priority)
 
-    async def send_video(self, chat_id: int, **kwargs) -> None:
+    async def send_video(self, chat_id: int, callback: Optional[SendCallback] = None,
+                         priority: int = PRIORITY_INTERACTIVE, **kwargs) -> None:
         """Queue a send_video call"""
-        queue = self.group_queue if self._is_group_chat(chat_id) else self.user_queue
-        message = QueuedMessage(
-            chat_id=chat_id,
-            method_name='send_video',
-            kwargs=kwargs
-        )
-        await queue.add_message(message)
+        await self.enqueue(chat_id, 'send_video', kwargs, callback, priority)
 
-    async def send_animation(self, chat_id: int, **kwargs) -> None:
+    async def send_animation(self, chat_id: int, callback: Optional[SendCallback] = None,
+                             priority: int = PRIORITY_INTERACTIVE, **kwargs) -> None:
         """Queue a send_animation (GIF) call"""
-        queue = self.group_queue if self._is_group_chat(chat_id) else self.user_queue
-        message = QueuedMessage(
-            chat_id=chat_id,
-            method_name='send_animation',
-            kwargs=kwargs
-        )
-        await queue.add_message(message)
+        await self.enqueue(chat_id, 'send_animation', kwargs, callback, priority)
 
-    async def send_audio(self, chat_id: int, **kwargs) -> None:
+    async def send_audio(self, chat_id: int, callback: Optional[SendCallback] = None,
+                         priority: int = PRIORITY_INTERACTIVE, **kwargs) -> None:
         """Queue a send_audio call"""
-        queue = self.group_queue if self._is_group_chat(chat_id) else self.user_queue
-        message = QueuedMessage(
-            chat_id=chat_id,
-            method_name='send_audio',
-            kwargs=kwargs
-        )
-        await queue.add_message(message)
+        await self.enqueue(chat_id, 'send_audio', kwargs, callback, priority)
 
-    async def send_voice(self, chat_id: int, **kwargs) -> None:
+    async def send_voice(self, chat_id: int, callback: Optional[SendCallback] = None,
+                         priority: int = PRIORITY_INTERACTIVE, **kwargs) -> None:
         """Queue a send_voice call"""
-        queue = self.group_queue if self._is_group_chat(chat_id) else self.user_queue
-        message = QueuedMessage(
-            chat_id=chat_id,
-            method_name='send_voice',
-            kwargs=kwargs
-        )
-        await queue.add_message(message)
+        await self.enqueue(chat_id, 'send_voice', kwargs, callback, priority)
 
-    async def send_sticker(self, chat_id: int, **kwargs) -> None:
+    async def send_sticker(self, chat_id: int, callback: Optional[SendCallback] = None,
+                           priority: int = PRIORITY_INTERACTIVE, **kwargs) -> None:
         """Queue a send_sticker call"""
-        queue = self.group_queue if self._is_group_chat(chat_id) else self.user_queue
-        message = QueuedMessage(
-            chat_id=chat_id,
-            method_name='send_sticker',
-            kwargs=kwargs
-        )
-        await queue.add_message(message)
+        await self.enqueue(chat_id, 'send_sticker', kwargs, callback, priority)
 
-    async def send_video_note(self, chat_id: int, **kwargs) -> None:
+    async def send_video_note(self, chat_id: int, callback: Optional[SendCallback] = None,
+                              priority: int = PRIORITY_INTERACTIVE, **kwargs) -> None:
         """Queue a send_video_note call"""
-        queue = self.group_queue if self._is_group_chat(chat_id) else self.user_queue
-        message = QueuedMessage(
-            chat_id=chat_id,
-            method_name='send_video_note',
-            kwargs=kwargs
-        )
-        await queue.add_message(message)
-    
+        await self.enqueue(chat_id, 'send_video_note', kwargs, callback, priority)
+
     async def answer_callback_query(self, callback_query_id: str, **kwargs) -> None:
         """Send callback query answer immediately (not rate limited)"""
         await self.bot.answer_callback_query(callback_query_id, **kwargs)
     
+    async def shutdown(self, timeout: float) -> int:
+        """Close both queues and drain them within `timeout` seconds. Returns messages left unsent."""
+        if self.outbox:
+            await self.outbox.stop_claiming()
+        lost = sum(await asyncio.gather(
+            self.group_queue.drain(timeout),
+            self.user_queue.drain(timeout),
+        ))
+        if self.outbox:
+            # Unsent outbox messages go back to the database for the other processes
+            lost = max(0, lost - await self.outbox.close())
+        return lost
+
     def get_queue_stats(self) -> Dict[str, Any]:
         """Get statistics about queues"""
         return {
-            "group_queue_size": len(self.group_queue.queue),
-            "user_queue_size": len(self.user_queue.queue),
+            "group_queue_size": self.group_queue.pending_count(),
+            "user_queue_size": self.user_queue.pending_count(),
+            "group_active_chats": self.group_queue.active_chats_count(),
+            "user_active_chats": self.user_queue.active_chats_count(),
             "group_queue_processing": self.group_queue.is_processing,
             "user_queue_processing": self.user_queue.is_processing,
-            "group_recent_sends": len(self.group_queue.last_send_times),
-            "user_recent_sends": len(self.user_queue.last_send_times)
+            "group_in_flight": self.group_queue.in_flight,
+            "user_in_flight": self.user_queue.in_flight,
+            "group_recent_sends": self.group_queue.recent_sends(),
+            "user_recent_sends": self.user_queue.recent_sends(),
+            "group_counters": dict(self.group_queue.counters),
+            "user_counters": dict(self.user_queue.counters),
+            "group_dead_letters": len(self.group_queue.dead_letters),
+            "user_dead_letters": len(self.user_queue.dead_letters),
+            "group_pending_by_priority": self.group_queue.pending_by_priority(),
+            "user_pending_by_priority": self.user_queue.pending_by_priority(),
+            "group_peak_pending": self.group_queue.peak_pending,
+            "user_peak_pending": self.user_queue.peak_pending,
+            "group_memory": self.group_queue.memory_usage(),
+            "user_memory": self.user_queue.memory_usage(),
+            "outbox": self.outbox.get_stats() if self.outbox else None,
         }
 
 
@@ -241,10 +751,15 @@ class MessageQueueManager:
 _queue_manager: Optional[MessageQueueManager] = None
 
 
-def init_queue_manager(bot: Bot) -> MessageQueueManager:
+def init_queue_manager(
+    bot: Bot,
+    failure_listener: Optional[Callable[[int, Exception], None]] = None,
+    rate_limiter: Optional[TokenBucket] = None,
+) -> MessageQueueManager:
     """Initialize global queue manager"""
     global _queue_manager
-    _queue_manager = MessageQueueManager(bot)
+    _queue_manager = MessageQueueManager(
+        bot, failure_listener=failure_listener, rate_limiter=rate_limiter)
     return _queue_manager
 
 
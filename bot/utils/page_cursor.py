@@ -0,0 +1,112 @@
+"""
+Page positions of keyset-paginated admin lists, carried in callback data.
+
+A position is "<page>" for the first page, or "<page>b<key>" / "<page>a<key>"
+for the page of rows before (older than) / after (newer than) the given
+sort key. Key values are base36 integers joined by "."; datetimes are stored
+as microseconds since the epoch. Telegram allows 64 bytes of callback data.
+"""
+import math
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Any, List, NamedTuple, Optional, Sequence, Tuple
+
+_POSITION_RE = re.compile(r"^(\d+)(?:([ab])([0-9a-z]+(?:\.[0-9a-z]+)*))?$")
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_DIGITS = "0123456789abcdefghijklmnopqrstuvwxyz"
+
+
+class PagePosition(NamedTuple):
+    page: int = 0
+    before: Optional[Tuple[int, ...]] = None
+    after: Optional[Tuple[int, ...]] = None
+
+
+class PageNav(NamedTuple):
+    page: int
+    # Positions for the buttons, None when there is nothing that way
+    prev: Optional[str]
+    next: Optional[str]
+    # Reopens the page as shown (e.g. "back to list" from a card)
+    current: str
+
+
+def _key_int(value: Any) -> int:
+    if isinstance(value, datetime):
+        delta = value.astimezone(timezone.utc) - _EPOCH
+        return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+    return int(value)
+
+
+def _base36(number: int) -> str:
+    if number < 0:
+        raise ValueError("page keys must not be negative")
+    digits = ""
+    while True:
+        number, remainder = divmod(number, 36)
+        digits = _DIGITS[remainder] + digits
+        if not number:
+            return digits
+
+
+def encode_position(page: int, before: Optional[Sequence[Any]] = None,
+                    after: Optional[Sequence[Any]] = None) -> str:
+    if page <= 0 or (before is None and after is None):
+        return "0"
+    direction, key = ("a", after) if after is not None else ("b", before)
+    return f"{page}{direction}" + ".".join(_base36(_key_int(v)) for v in key)
+
+
+def parse_position(raw: str) -> PagePosition:
+    """Position from callback data; anything unparsable opens the first page"""
+    match = _POSITION_RE.match(raw or "")
+    if not match or not match.group(2):
+        return PagePosition()
+    key = tuple(int(part, 36) for part in match.group(3).split("."))
+    if match.group(2) == "a":
+        return PagePosition(int(match.group(1)), after=key)
+    return PagePosition(int(match.group(1)), before=key)
+
+
+def timestamp_key(key: Optional[Tuple[int, ...]]) -> Optional[Tuple[Any, ...]]:
+    """Decoded (timestamp, id) key back to (datetime, id)"""
+    if key is None or len(key) < 2:
+        return None
+    return (_EPOCH + timedelta(microseconds=key[0]),) + key[1:]
+
+
+def id_key(key: Optional[Tuple[int, ...]]) -> Optional[int]:
+    """Decoded single-id key back to the id"""
+    return key[0] if key else None
+
+
+def build_nav(position: PagePosition, keys: List[Tuple[Any, ...]], has_more: bool) -> PageNav:
+    """
+    Buttons for a page fetched at `position`: `keys` are the sort keys of its
+    rows (newest first), `has_more` whether rows continue past them.
+    """
+    if position.after is not None:
+        has_newer, has_older = has_more, bool(keys)
+    elif position.before is not None:
+        has_newer, has_older = True, has_more
+    else:
+        has_newer, has_older = False, has_more
+    page = position.page if has_newer else 0
+
+    if not keys:
+        return PageNav(page, "0" if has_newer else None, None, "0")
+    # The last key value is an integer id, so "before first + 1" includes the first row
+    current = encode_position(page, before=keys[0][:-1] + (_key_int(keys[0][-1]) + 1,))
+    return PageNav(
+        page=page,
+        prev=encode_position(page - 1, after=keys[0]) if has_newer else None,
+        next=encode_position(page + 1, before=keys[-1]) if has_older else None,
+        current=current,
+    )
+
+
+def pages_label(total: int, exact: bool, page_size: int, nav: PageNav) -> str:
+    """Total pages for "page X of Y"; approximate totals get a "~" """
+    pages = math.ceil(total / page_size) if page_size > 0 else 1
+    pages = max(1, pages, nav.page + 1 + (1 if nav.next else 0))
+    return str(pages) if exact else f"~{pages}"
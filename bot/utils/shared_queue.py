@@ -0,0 +1,276 @@
+"""
+Postgres backend of the message queue (MESSAGE_QUEUE_BACKEND=postgres) for
+running several bot processes against one bot token.
+
+- SharedRateLimiter takes the place of the queue-wide TokenBucket. The bucket
+  itself is a row of telegram_rate_ledger, so all processes together stay
+  within Telegram's global limit.
+- OutboxRelay stores calls that need no callback in the message_outbox table.
+  Every process claims batches with SKIP LOCKED and feeds them into its local
+  queue. Claimed messages that were not sent at shutdown are released again.
+
+Calls with a callback (broadcast batches) and message edits stay in the
+process that made them: callbacks can't cross processes and edits are only
+worth sending while they are fresh.
+"""
+import asyncio
+import enum
+import json
+import logging
+import os
+import random
+import socket
+import time
+from typing import Any, Dict, List, Optional, Callable
+
+from aiogram import Bot
+from pydantic import BaseModel
+from sqlalchemy.orm import sessionmaker
+
+from db.dal import outbox_dal
+from bot.utils.message_queue import (
+    COALESCED_METHODS,
+    GLOBAL_BURST_SIZE,
+    GLOBAL_MESSAGES_PER_SECOND,
+    MessageQueueManager,
+    SendCallback,
+    TokenBucket,
+    init_queue_manager,
+)
+
+RATE_LEDGER_BUCKET = "telegram_global"
+# Tokens taken from the ledger per round trip, and how long unused ones stay valid.
+# Small leases keep the fleet-wide burst close to the bucket capacity.
+RATE_LEASE_SIZE = 2
+RATE_LEASE_TTL_SECONDS = 0.2
+
+OUTBOX_POLL_SECONDS = 0.5
+OUTBOX_CLAIM_BATCH = 50
+# Claimed messages held in this process at once; the rest stay claimable by others
+OUTBOX_MAX_LOCAL = 200
+
+
+def make_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class SharedRateLimiter:
+    """
+    Drop-in for the queue-wide TokenBucket backed by the telegram_rate_ledger
+    table. If the database is unavailable it falls back to a local bucket.
+    """
+
+    def __init__(self, async_session_factory: sessionmaker,
+                 rate: float = GLOBAL_MESSAGES_PER_SECOND,
+                 capacity: float = GLOBAL_BURST_SIZE,
+                 lease_size: int = RATE_LEASE_SIZE,
+                 bucket: str = RATE_LEDGER_BUCKET):
+        self.async_session_factory = async_session_factory
+        self.rate = float(rate)
+        self.capacity = max(1.0, float(capacity))
+        self.lease_size = max(1, min(lease_size, int(self.capacity)))
+        self.bucket = bucket
+        self._tokens = 0
+        self._tokens_expire_at = 0.0
+        self._ledger_available = True
+        self._fallback = TokenBucket(rate, capacity)
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        """Wait for one send token (the argument is kept for TokenBucket compatibility)"""
+        async with self._lock:
+            while True:
+                if self._tokens > 0 and time.monotonic() < self._tokens_expire_at:
+                    self._tokens -= 1
+                    return
+                try:
+                    granted = await self._lease()
+                except Exception as e:
+                    if self._ledger_available:
+                        logging.error(
+                            f"Rate ledger unavailable, limiting this process locally: {e}")
+                        self._ledger_available = False
+                    await self._fallback.acquire()
+                    return
+                if not self._ledger_available:
+                    logging.info("Rate ledger available again")
+                    self._ledger_available = True
+                if granted:
+                    self._tokens = granted
+                    self._tokens_expire_at = time.monotonic() + RATE_LEASE_TTL_SECONDS
+                    continue
+                # The bucket is empty: wait about one token's time, with jitter so
+                # that the processes don't poll the row in lockstep
+                await asyncio.sleep(random.uniform(1.0, 2.0) / self.rate)
+
+    async def _lease(self) -> int:
+        async with self.async_session_factory() as session:
+            granted = await outbox_dal.lease_rate_tokens(
+                session, self.bucket, self.rate, self.capacity, self.lease_size)
+            await session.commit()
+        return granted
+
+
+def _to_json_value(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json", exclude_none=True)
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, (list, tuple)):
+        return [_to_json_value(item) for item in value]
+    return value
+
+
+def serialize_call_kwargs(kwargs: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """JSON form of bot method kwargs, or None if they can't be stored (e.g. file uploads)"""
+    payload = {key: _to_json_value(value) for key, value in kwargs.items()}
+    try:
+        json.dumps(payload)
+    except (TypeError, ValueError):
+        return None
+    return payload
+
+
+class OutboxRelay:
+    """Moves messages between the message_outbox table and the local queues"""
+
+    def __init__(self, manager: MessageQueueManager, async_session_factory: sessionmaker,
+                 worker_id: Optional[str] = None,
+                 claim_batch: int = OUTBOX_CLAIM_BATCH,
+                 max_local: int = OUTBOX_MAX_LOCAL,
+                 poll_interval: float = OUTBOX_POLL_SECONDS):
+        self.manager = manager
+        self.async_session_factory = async_session_factory
+        self.worker_id = worker_id or make_worker_id()
+        self.claim_batch = claim_batch
+        self.max_local = max_local
+        self.poll_interval = poll_interval
+        self.counters: Dict[str, int] = {"stored": 0, "claimed": 0, "released": 0}
+        self._claimed: set[int] = set()
+        self._finished: List[int] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="message-outbox-relay")
+
+    async def add(self, chat_id: int, method_name: str, kwargs: Dict[str, Any],
+                  callback: Optional[SendCallback], priority: int) -> bool:
+        """Store a call in the outbox. Returns False if it has to be queued locally."""
+        if callback is not None or method_name in COALESCED_METHODS:
+            return False
+        payload = serialize_call_kwargs(kwargs)
+        if payload is None:
+            return False
+        try:
+            async with self.async_session_factory() as session:
+                await outbox_dal.add_messages(session, [{
+                    "chat_id": chat_id,
+                    "method_name": method_name,
+                    "payload": payload,
+                    "priority": priority,
+                }])
+                await session.commit()
+        except Exception as e:
+            logging.error(f"Outbox: failed to store {method_name} to {chat_id}, queueing locally: {e}")
+            return False
+        self.counters["stored"] += 1
+        return True
+
+    async def _run(self) -> None:
+        while True:
+            claimed = 0
+            try:
+                await self._delete_finished()
+                room = min(self.claim_batch, self.max_local - len(self._claimed))
+                if room > 0:
+                    claimed = await self._claim(room)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Outbox relay error: {e}", exc_info=True)
+            if claimed < self.claim_batch:
+                await asyncio.sleep(self.poll_interval)
+
+    async def _claim(self, limit: int) -> int:
+        async with self.async_session_factory() as session:
+            messages = await outbox_dal.claim_messages(session, self.worker_id, limit)
+            await session.commit()
+        for message in messages:
+            self._claimed.add(message.id)
+            await self.manager.enqueue_local(
+                message.chat_id,
+                message.method_name,
+                message.payload,
+                callback=self._on_done_callback(message.id),
+                priority=message.priority,
+            )
+        self.counters["claimed"] += len(messages)
+        return len(messages)
+
+    def _on_done_callback(self, message_id: int) -> Callable[[Any], Any]:
+        async def on_done(_result: Any) -> None:
+            # Sent or failed for good (the local queue dead-letters it): either way it's handled
+            self._claimed.discard(message_id)
+            self._finished.append(message_id)
+        return on_done
+
+    async def _delete_finished(self) -> None:
+        if not self._finished:
+            return
+        finished, self._finished = self._finished, []
+        try:
+            async with self.async_session_factory() as session:
+                await outbox_dal.delete_messages(session, finished)
+                await session.commit()
+        except Exception:
+            self._finished.extend(finished)
+            raise
+
+    async def stop_claiming(self) -> None:
+        if self._task and not self._task.done():
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    async def close(self) -> int:
+        """Delete handled messages and release the unsent ones. Returns how many were released."""
+        await self.stop_claiming()
+        released = 0
+        try:
+            await self._delete_finished()
+            if self._claimed:
+                async with self.async_session_factory() as session:
+                    released = await outbox_dal.release_messages(
+                        session, self.worker_id, list(self._claimed))
+                    await session.commit()
+                self._claimed.clear()
+        except Exception as e:
+            logging.error(f"Outbox: failed to release claimed messages: {e}", exc_info=True)
+        self.counters["released"] += released
+        if released:
+            logging.info(f"Outbox: released {released} unsent messages to other bot processes")
+        return released
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "worker_id": self.worker_id,
+            "claimed_locally": len(self._claimed),
+            **self.counters,
+        }
+
+
+def init_shared_queue_manager(
+    bot: Bot,
+    async_session_factory: sessionmaker,
+    failure_listener: Optional[Callable[[int, Exception], None]] = None,
+) -> MessageQueueManager:
+    """Initialize the global queue manager with the Postgres rate ledger and outbox"""
+    manager = init_queue_manager(
+        bot,
+        failure_listener=failure_listener,
+        rate_limiter=SharedRateLimiter(async_session_factory),
+    )
+    manager.outbox = OutboxRelay(manager, async_session_factory)
+    manager.outbox.start()
+    logging.info(f"Message queue: shared Postgres backend, worker {manager.outbox.worker_id}")
+    return manager
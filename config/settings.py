@@ -17,6 +17,44 @@ class Settings(BaseSettings):
     POSTGRES_PORT: int = Field(default=5432)
     POSTGRES_DB: str = Field(default="vpn_shop_db")
 
+    # Sized for one bot process; all processes together must stay below max_connections
+    DB_POOL_SIZE: int = Field(default=10, description="Connections kept open in the pool")
+    DB_POOL_MAX_OVERFLOW: int = Field(
+        default=10, description="Extra connections opened when the pool is exhausted")
+    DB_POOL_TIMEOUT_SECONDS: float = Field(
+        default=30, description="How long a session waits for a free connection before failing")
+    DB_POOL_RECYCLE_SECONDS: int = Field(
+        default=1800, description="Reconnect connections older than this (-1 = never)")
+    DB_POOL_PRE_PING: bool = Field(
+        default=True,
+        description="Check every connection with a round trip on checkout; "
+                    "with DB_POOL_RECYCLE_SECONDS set this can usually be disabled")
+    DB_STATEMENT_CACHE_SIZE: int = Field(
+        default=100, description="Prepared statements cached per connection (0 for PgBouncer)")
+
+    # Optional streaming replica for admin reads (statistics, logs, exports);
+    # same user, password and database as the primary
+    POSTGRES_REPLICA_HOST: Optional[str] = Field(
+        default=None, description="Read replica host; unset sends all queries to the primary")
+    POSTGRES_REPLICA_PORT: Optional[int] = Field(
+        default=None, description="Read replica port (POSTGRES_PORT if unset)")
+    DB_REPLICA_POOL_SIZE: int = Field(default=5, description="Connections kept open in the replica pool")
+    DB_REPLICA_MAX_OVERFLOW: int = Field(
+        default=5, description="Extra replica connections opened when its pool is exhausted")
+    DB_REPLICA_MAX_LAG_SECONDS: float = Field(
+        default=30, description="Reads go back to the primary while the replica lags more than this")
+    DB_REPLICA_LAG_CHECK_SECONDS: float = Field(
+        default=10, description="How often the replica lag is re-checked")
+
+    DB_QUERY_STATS_ENABLED: bool = Field(
+        default=True, description="Count and time SQL statements per update")
+    DB_SLOW_QUERY_MS: int = Field(
+        default=500, description="Statements slower than this are logged (0 = off)")
+    DB_QUERIES_PER_UPDATE_WARN: int = Field(
+        default=30, description="Warn when one update runs more queries than this (0 = off)")
+    DB_REPEATED_QUERY_WARN: int = Field(
+        default=10, description="Warn when one update runs the same statement this many times (0 = off)")
+
     DEFAULT_LANGUAGE: str = Field(default="ru")
     DEFAULT_CURRENCY_SYMBOL: str = Field(default="RUB")
 
@@ -108,7 +146,42 @@ class Settings(BaseSettings):
 
     WEB_SERVER_HOST: str = Field(default="0.0.0.0")
     WEB_SERVER_PORT: int = Field(default=8080)
+    MESSAGE_QUEUE_BACKEND: str = Field(
+        default="memory",
+        description="memory (single bot process) or postgres (several processes share the "
+                    "Telegram rate budget and an outbox table)")
+    SHUTDOWN_REQUEST_TIMEOUT_SECONDS: float = Field(
+        default=5,
+        description="On shutdown, wait this long for webhook requests and updates in progress")
+    SHUTDOWN_QUEUE_DRAIN_SECONDS: float = Field(
+        default=15,
+        description="On shutdown, keep sending queued messages for this long before dropping them")
     LOGS_PAGE_SIZE: int = Field(default=10)
+    MESSAGE_LOG_RETENTION_MONTHS: int = Field(
+        default=0,
+        description="Drop message log partitions (one per month) older than this many full months "
+                    "(0 = keep forever)")
+    MESSAGE_LOG_ARCHIVE_DIR: Optional[str] = Field(
+        default=None,
+        description="Export expired message log partitions to <dir>/<partition>.csv.gz before dropping")
+    MESSAGE_LOG_PARTITIONS_AHEAD: int = Field(
+        default=2, description="Months of message log partitions created in advance")
+    LOG_EXPORT_PART_SIZE_MB: int = Field(
+        default=45,
+        description="Split message log exports into files of at most this size "
+                    "(Telegram accepts bot uploads up to 50 MB)")
+    LOG_EXPORT_COMPRESS_ABOVE_MB: int = Field(
+        default=5, description="Gzip message log exports larger than this (uncompressed)")
+
+    BROADCAST_UNREACHABLE_RECHECK_DAYS: int = Field(
+        default=30,
+        description="Include users who blocked the bot in broadcasts again after this many days (0 = never)")
+    BROADCAST_BATCH_SIZE: int = Field(
+        default=200,
+        description="Recipients a broadcast job queues at once; progress is saved after each batch")
+    BROADCAST_PROGRESS_UPDATE_SECONDS: int = Field(
+        default=10,
+        description="How often the broadcast progress message is refreshed")
 
     SUBSCRIPTION_MINI_APP_URL: Optional[str] = Field(default=None)
 
@@ -126,6 +199,14 @@ class Settings(BaseSettings):
     def DATABASE_URL(self) -> str:
         return f"postgresql+asyncpg://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@{self.POSTGRES_HOST}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
 
+    @computed_field
+    @property
+    def DATABASE_REPLICA_URL(self) -> Optional[str]:
+        if not self.POSTGRES_REPLICA_HOST:
+            return None
+        port = self.POSTGRES_REPLICA_PORT or self.POSTGRES_PORT
+        return f"postgresql+asyncpg://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@{self.POSTGRES_REPLICA_HOST}:{port}/{self.POSTGRES_DB}"
+
     @computed_field
     @property
     def ADMIN_IDS(self) -> List[int]:
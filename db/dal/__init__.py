@@ -6,6 +6,9 @@ from . import panel_sync_dal
 from . import message_log_dal
 from . import user_billing_dal
 from . import ad_dal
+from . import broadcast_dal
+from . import outbox_dal
+from . import rollup_dal
 
 __all__ = (
     "user_dal",
@@ -16,4 +19,7 @@ __all__ = (
     "message_log_dal",
     "user_billing_dal",
     "ad_dal",
+    "broadcast_dal",
+    "outbox_dal",
+    "rollup_dal",
 )
\ No newline at end of file
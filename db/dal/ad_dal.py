@@ -5,7 +5,9 @@ from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
 from sqlalchemy import update, delete, func, and_
 
-from ..models import AdCampaign, AdAttribution, Payment
+from ..models import AdCampaign, AdAttribution
+from . import rollup_dal
+from .pagination import fetch_keyset_page, count_estimated
 
 
 async def create_campaign(
@@ -64,6 +66,7 @@ async def ensure_attribution(session: AsyncSession, *, user_id: int, campaign_id
     session.add(attrib)
     await session.flush()
     await session.refresh(attrib)
+    await rollup_dal.record_campaign_start(session, user_id)
     logging.info(f"AdAttribution created for user {user_id} -> campaign {campaign_id}")
     return attrib
 
@@ -79,52 +82,18 @@ async def mark_trial_activated(session: AsyncSession, user_id: int) -> bool:
         update(AdAttribution)
         .where(and_(AdAttribution.user_id == user_id, AdAttribution.trial_activated_at.is_(None)))
         .values(trial_activated_at=func.now())
+        .returning(AdAttribution.ad_campaign_id)
     )
-    result = await session.execute(stmt)
-    return result.rowcount > 0
+    campaign_id = (await session.execute(stmt)).scalar_one_or_none()
+    if campaign_id is None:
+        return False
+    await rollup_dal.record_campaign_trial(session, campaign_id, user_id)
+    return True
 
 
 async def get_campaign_stats(session: AsyncSession, campaign_id: int) -> Dict[str, Any]:
-    # Starts (attributed users)
-    starts_stmt = select(func.count(AdAttribution.user_id)).where(
-        AdAttribution.ad_campaign_id == campaign_id
-    )
-    starts = (await session.execute(starts_stmt)).scalar() or 0
-
-    # Trials
-    trials_stmt = select(func.count(AdAttribution.user_id)).where(
-        and_(AdAttribution.ad_campaign_id == campaign_id, AdAttribution.trial_activated_at.is_not(None))
-    )
-    trials = (await session.execute(trials_stmt)).scalar() or 0
-
-    # Payers (unique users with succeeded payments)
-    payers_stmt = select(func.count(func.distinct(Payment.user_id))).select_from(Payment).where(
-        and_(
-            Payment.status == "succeeded",
-            Payment.user_id.in_(
-                select(AdAttribution.user_id).where(AdAttribution.ad_campaign_id == campaign_id)
-            ),
-        )
-    )
-    payers = (await session.execute(payers_stmt)).scalar() or 0
-
-    # Revenue sum
-    revenue_stmt = select(func.coalesce(func.sum(Payment.amount), 0.0)).select_from(Payment).where(
-        and_(
-            Payment.status == "succeeded",
-            Payment.user_id.in_(
-                select(AdAttribution.user_id).where(AdAttribution.ad_campaign_id == campaign_id)
-            ),
-        )
-    )
-    revenue = float((await session.execute(revenue_stmt)).scalar() or 0.0)
-
-    return {
-        "starts": int(starts),
-        "trials": int(trials),
-        "payers": int(payers),
-        "revenue": revenue,
-    }
+    # Starts, trials, payers (unique users with succeeded payments) and revenue from the daily rollup
+    return await rollup_dal.get_campaign_totals(session, campaign_id)
 
 
 async def count_campaigns(session: AsyncSession, *, only_active: bool = False) -> int:
@@ -134,15 +103,22 @@ async def count_campaigns(session: AsyncSession, *, only_active: bool = False) -
     return int((await session.execute(stmt)).scalar() or 0)
 
 
+async def estimate_campaigns(session: AsyncSession) -> Tuple[int, bool]:
+    return await count_estimated(session, AdCampaign)
+
+
 async def list_campaigns_paged(
-    session: AsyncSession, *, page: int, page_size: int, only_active: bool = False
-) -> List[AdCampaign]:
-    offset = max(0, page) * max(1, page_size)
-    stmt = select(AdCampaign).order_by(AdCampaign.created_at.desc()).offset(offset).limit(page_size)
+    session: AsyncSession, *, page_size: int, before: Optional[int] = None,
+    after: Optional[int] = None, only_active: bool = False
+) -> Tuple[List[AdCampaign], bool]:
+    """Newest campaigns first, keyset-paged by id (see pagination.fetch_keyset_page)"""
+    stmt = select(AdCampaign)
     if only_active:
         stmt = stmt.where(AdCampaign.is_active == True)
-    result = await session.execute(stmt)
-    return result.scalars().all()
+    return await fetch_keyset_page(
+        session, stmt, (AdCampaign.ad_campaign_id,), max(1, page_size),
+        before=(before,) if before is not None else None,
+        after=(after,) if after is not None else None)
 
 
 async def get_totals(session: AsyncSession) -> Dict[str, float]:
@@ -150,16 +126,10 @@ async def get_totals(session: AsyncSession) -> Dict[str, float]:
     total_cost_stmt = select(func.coalesce(func.sum(AdCampaign.cost), 0.0))
     total_cost = float((await session.execute(total_cost_stmt)).scalar() or 0.0)
 
-    # Total revenue from all attributed users (unique users counted across all campaigns)
-    revenue_stmt = select(func.coalesce(func.sum(Payment.amount), 0.0)).select_from(Payment).where(
-        and_(
-            Payment.status == "succeeded",
-            Payment.user_id.in_(select(AdAttribution.user_id)),
-        )
-    )
-    total_revenue = float((await session.execute(revenue_stmt)).scalar() or 0.0)
+    # Total revenue from all attributed users (each user belongs to one campaign)
+    totals = await rollup_dal.get_campaign_totals(session)
 
-    return {"cost": total_cost, "revenue": total_revenue}
+    return {"cost": total_cost, "revenue": totals["revenue"]}
 
 
 async def delete_campaign(session: AsyncSession, campaign_id: int) -> bool:
@@ -172,6 +142,7 @@ async def delete_campaign(session: AsyncSession, campaign_id: int) -> bool:
         if not campaign:
             return False
         await session.delete(campaign)
+        await rollup_dal.delete_campaign_rollups(session, campaign_id)
         await session.flush()
         logging.info(f"AdCampaign deleted id={campaign_id}")
         return True
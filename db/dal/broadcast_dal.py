@@ -0,0 +1,156 @@
+import logging
+from typing import Optional, List, Dict, Any, Sequence
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy import update, func, and_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from ..models import BroadcastJob, BroadcastRecipient
+
+JOB_STATUS_RUNNING = "running"
+JOB_STATUS_PAUSED = "paused"
+JOB_STATUS_CANCELLED = "cancelled"
+JOB_STATUS_COMPLETED = "completed"
+
+# Jobs a worker should pick up again after a restart
+UNFINISHED_JOB_STATUSES = (JOB_STATUS_RUNNING, )
+
+RECIPIENT_STATUS_PENDING = "pending"
+RECIPIENT_STATUS_SENT = "sent"
+RECIPIENT_STATUS_FAILED = "failed"
+
+
+async def create_job(session: AsyncSession, job_data: Dict[str, Any]) -> BroadcastJob:
+    job = BroadcastJob(**job_data)
+    session.add(job)
+    await session.flush()
+    await session.refresh(job)
+    logging.info(f"BroadcastJob created id={job.job_id}, target={job.target}")
+    return job
+
+
+async def add_recipients(session: AsyncSession, job_id: int, user_ids: List[int]) -> int:
+    """Multi-row INSERT of one audience chunk; already stored recipients are skipped"""
+    if not user_ids:
+        return 0
+    stmt = (
+        pg_insert(BroadcastRecipient)
+        .values([
+            {"job_id": job_id, "user_id": user_id, "status": RECIPIENT_STATUS_PENDING}
+            for user_id in user_ids
+        ])
+        .on_conflict_do_nothing(index_elements=["job_id", "user_id"])
+    )
+    result = await session.execute(stmt)
+    return result.rowcount or 0
+
+
+async def get_last_recipient_id(session: AsyncSession, job_id: int) -> Optional[int]:
+    """Highest user_id already in the snapshot, to continue an interrupted snapshot"""
+    stmt = select(func.max(BroadcastRecipient.user_id)).where(BroadcastRecipient.job_id == job_id)
+    result = await session.execute(stmt)
+    return result.scalar_one_or_none()
+
+
+async def complete_audience(session: AsyncSession, job_id: int) -> int:
+    """Mark the snapshot as complete and store the exact recipient count"""
+    count_stmt = select(func.count()).select_from(BroadcastRecipient).where(
+        BroadcastRecipient.job_id == job_id)
+    total = (await session.execute(count_stmt)).scalar_one()
+    await session.execute(
+        update(BroadcastJob)
+        .where(BroadcastJob.job_id == job_id)
+        .values(total_recipients=total, audience_complete=True)
+    )
+    return total
+
+
+async def get_job(session: AsyncSession, job_id: int) -> Optional[BroadcastJob]:
+    stmt = select(BroadcastJob).where(BroadcastJob.job_id == job_id)
+    result = await session.execute(stmt)
+    return result.scalar_one_or_none()
+
+
+async def get_recent_jobs(session: AsyncSession, limit: int = 5) -> List[BroadcastJob]:
+    stmt = select(BroadcastJob).order_by(BroadcastJob.job_id.desc()).limit(limit)
+    result = await session.execute(stmt)
+    return result.scalars().all()
+
+
+async def get_unfinished_job_ids(session: AsyncSession) -> List[int]:
+    stmt = (
+        select(BroadcastJob.job_id)
+        .where(BroadcastJob.status.in_(UNFINISHED_JOB_STATUSES))
+        .order_by(BroadcastJob.job_id)
+    )
+    result = await session.execute(stmt)
+    return result.scalars().all()
+
+
+async def update_job(session: AsyncSession, job_id: int, update_data: Dict[str, Any]) -> bool:
+    stmt = update(BroadcastJob).where(BroadcastJob.job_id == job_id).values(**update_data)
+    result = await session.execute(stmt)
+    return result.rowcount > 0
+
+
+async def set_job_status(session: AsyncSession, job_id: int, status: str,
+                         from_statuses: Optional[Sequence[str]] = None) -> bool:
+    """Change the job status, optionally only if it is currently one of from_statuses"""
+    values: Dict[str, Any] = {"status": status}
+    if status == JOB_STATUS_RUNNING:
+        values["started_at"] = func.coalesce(BroadcastJob.started_at, func.now())
+    elif status in (JOB_STATUS_COMPLETED, JOB_STATUS_CANCELLED):
+        values["finished_at"] = func.now()
+    stmt = update(BroadcastJob).where(BroadcastJob.job_id == job_id)
+    if from_statuses:
+        stmt = stmt.where(BroadcastJob.status.in_(from_statuses))
+    result = await session.execute(stmt.values(**values))
+    return result.rowcount > 0
+
+
+async def get_pending_recipient_ids(session: AsyncSession, job_id: int,
+                                    after_user_id: Optional[int], limit: int) -> List[int]:
+    """Next batch of unsent recipients in user_id order (keyset, no OFFSET)"""
+    conditions = [
+        BroadcastRecipient.job_id == job_id,
+        BroadcastRecipient.status == RECIPIENT_STATUS_PENDING,
+    ]
+    if after_user_id is not None:
+        conditions.append(BroadcastRecipient.user_id > after_user_id)
+    stmt = (
+        select(BroadcastRecipient.user_id)
+        .where(and_(*conditions))
+        .order_by(BroadcastRecipient.user_id)
+        .limit(limit)
+    )
+    result = await session.execute(stmt)
+    return result.scalars().all()
+
+
+async def record_batch_results(session: AsyncSession, job_id: int,
+                               sent_ids: List[int], failed: Dict[int, str]) -> None:
+    """Store the outcome of one batch and bump the job counters"""
+    if sent_ids:
+        await session.execute(
+            update(BroadcastRecipient)
+            .where(and_(BroadcastRecipient.job_id == job_id,
+                        BroadcastRecipient.user_id.in_(sent_ids)))
+            .values(status=RECIPIENT_STATUS_SENT, processed_at=func.now())
+        )
+    # Group failures by error text so a batch costs a handful of UPDATEs, not one per user
+    failed_by_error: Dict[str, List[int]] = {}
+    for user_id, error in failed.items():
+        failed_by_error.setdefault(error, []).append(user_id)
+    for error, user_ids in failed_by_error.items():
+        await session.execute(
+            update(BroadcastRecipient)
+            .where(and_(BroadcastRecipient.job_id == job_id,
+                        BroadcastRecipient.user_id.in_(user_ids)))
+            .values(status=RECIPIENT_STATUS_FAILED, error=error, processed_at=func.now())
+        )
+    await session.execute(
+        update(BroadcastJob)
+        .where(BroadcastJob.job_id == job_id)
+        .values(sent_count=BroadcastJob.sent_count + len(sent_ids),
+                failed_count=BroadcastJob.failed_count + len(failed))
+    )
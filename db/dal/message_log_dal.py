@@ -1,10 +1,24 @@
+import asyncio
+import gzip
 import logging
-from typing import Optional, List
+import os
+import re
+from datetime import date, datetime
+from typing import Optional, List, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import func, or_
+from sqlalchemy import Row, func, or_, insert, text, tuple_
 
 from ..models import MessageLog, User
+from .pagination import fetch_keyset_page, count_estimated, count_capped
+
+# 8 columns per row keeps a chunk well below asyncpg's 32767 bind parameters
+BULK_INSERT_CHUNK_SIZE = 2000
+
+# message_logs is partitioned by month of `timestamp` (UTC). Rows outside of
+# the existing months go to the default partition, which should stay empty.
+DEFAULT_PARTITION = "message_logs_default"
+_PARTITION_NAME_RE = re.compile(r"^message_logs_y(\d{4})m(\d{2})$")
 
 
 async def create_message_log(session: AsyncSession,
@@ -22,39 +36,84 @@ async def create_message_log(session: AsyncSession,
         return None
 
 
-async def get_all_message_logs(session: AsyncSession, limit: int,
-                               offset: int) -> List[MessageLog]:
-    stmt = select(MessageLog).order_by(
-        MessageLog.timestamp.desc()).limit(limit).offset(offset)
-    result = await session.execute(stmt)
-    return result.scalars().all()
+async def get_message_logs_page(
+        session: AsyncSession, limit: int, *, user_id: Optional[int] = None,
+        before: Optional[Tuple[datetime, int]] = None,
+        after: Optional[Tuple[datetime, int]] = None) -> Tuple[List[MessageLog], bool]:
+    """
+    Logs newest first, keyset-paged by (timestamp, log_id); with `user_id`
+    only the ones by or about that user. See pagination.fetch_keyset_page.
+    """
+    stmt = select(MessageLog)
+    if user_id is not None:
+        stmt = stmt.where(_user_logs_filter(user_id))
+    return await fetch_keyset_page(session, stmt, (MessageLog.timestamp, MessageLog.log_id),
+                                   limit, before=before, after=after)
 
 
-async def count_all_message_logs(session: AsyncSession) -> int:
-    stmt = select(func.count()).select_from(MessageLog)
-    result = await session.execute(stmt)
-    return result.scalar_one()
+async def estimate_all_message_logs(session: AsyncSession) -> Tuple[int, bool]:
+    return await count_estimated(session, MessageLog)
+
+
+def _user_logs_filter(user_id_to_search: int):
+    return or_(MessageLog.user_id == user_id_to_search,
+               MessageLog.target_user_id == user_id_to_search)
 
 
 async def get_user_message_logs(session: AsyncSession, user_id_to_search: int,
-                                limit: int, offset: int) -> List[MessageLog]:
-    stmt = (select(MessageLog).where(
-        or_(MessageLog.user_id == user_id_to_search,
-            MessageLog.target_user_id == user_id_to_search)).order_by(
-                MessageLog.timestamp.desc()).limit(limit).offset(offset))
-    result = await session.execute(stmt)
-    return result.scalars().all()
+                                limit: int) -> List[MessageLog]:
+    logs, _ = await get_message_logs_page(session, limit, user_id=user_id_to_search)
+    return logs
 
 
 async def count_user_message_logs(session: AsyncSession,
                                   user_id_to_search: int) -> int:
     stmt = (select(func.count()).select_from(MessageLog).where(
-        or_(MessageLog.user_id == user_id_to_search,
-            MessageLog.target_user_id == user_id_to_search)))
+        _user_logs_filter(user_id_to_search)))
     result = await session.execute(stmt)
     return result.scalar_one()
 
 
+async def estimate_user_message_logs(session: AsyncSession,
+                                     user_id_to_search: int) -> Tuple[int, bool]:
+    return await count_capped(
+        session, select(MessageLog.log_id).where(_user_logs_filter(user_id_to_search)))
+
+
+EXPORT_COLUMNS = (MessageLog.log_id, MessageLog.timestamp, MessageLog.user_id,
+                  MessageLog.telegram_username, MessageLog.telegram_first_name,
+                  MessageLog.event_type, MessageLog.content, MessageLog.is_admin_event,
+                  MessageLog.target_user_id, MessageLog.raw_update_preview)
+
+
+async def get_message_logs_export_batch(session: AsyncSession, *,
+                                       after: Optional[Tuple[datetime, int]] = None,
+                                       since: Optional[datetime] = None,
+                                       until: Optional[datetime] = None,
+                                       user_id: Optional[int] = None,
+                                       event_type: Optional[str] = None,
+                                       limit: int = 1000) -> List[Row]:
+    """
+    Up to `limit` logs oldest first as EXPORT_COLUMNS rows, continuing past
+    the (timestamp, log_id) key `after`. Each batch is a short query of its
+    own, so exports don't hold a snapshot open. The time range (since
+    inclusive, until exclusive) prunes partitions.
+    """
+    stmt = select(*EXPORT_COLUMNS)
+    if since is not None:
+        stmt = stmt.where(MessageLog.timestamp >= since)
+    if until is not None:
+        stmt = stmt.where(MessageLog.timestamp < until)
+    if user_id is not None:
+        stmt = stmt.where(_user_logs_filter(user_id))
+    if event_type:
+        stmt = stmt.where(MessageLog.event_type == event_type)
+    if after is not None:
+        stmt = stmt.where(tuple_(MessageLog.timestamp, MessageLog.log_id) > tuple_(*after))
+    stmt = stmt.order_by(MessageLog.timestamp, MessageLog.log_id).limit(limit)
+    return list((await session.execute(stmt)).all())
+
+
 async def create_message_log_no_commit(session: AsyncSession,
                                        log_data: dict) -> MessageLog:
 
@@ -74,3 +133,124 @@ async def create_message_log_no_commit(session: AsyncSession,
         f"Message log added to session: user {log_data.get('user_id')}, event {log_data.get('event_type')}"
     )
     return new_log
+
+
+async def bulk_create_message_logs(session: AsyncSession,
+                                   logs_data: List[dict]) -> int:
+    """
+    Multi-row INSERT of many log entries (no commit). Unknown target users are
+    set to NULL with one lookup for the whole list instead of one per entry.
+    """
+    if not logs_data:
+        return 0
+
+    target_ids = {d["target_user_id"] for d in logs_data if d.get("target_user_id")}
+    if target_ids:
+        result = await session.execute(
+            select(User.user_id).where(User.user_id.in_(target_ids)))
+        missing_ids = target_ids - set(result.scalars().all())
+        if missing_ids:
+            logging.warning(
+                f"{len(missing_ids)} target users not found for message logs. Setting to NULL."
+            )
+            for log_data in logs_data:
+                if log_data.get("target_user_id") in missing_ids:
+                    log_data["target_user_id"] = None
+
+    columns = ("user_id", "telegram_username", "telegram_first_name", "event_type",
+               "content", "raw_update_preview", "target_user_id")
+    rows = [
+        {**{column: log_data.get(column) for column in columns},
+         "is_admin_event": bool(log_data.get("is_admin_event"))}
+        for log_data in logs_data
+    ]
+    for start in range(0, len(rows), BULK_INSERT_CHUNK_SIZE):
+        await session.execute(
+            insert(MessageLog).values(rows[start:start + BULK_INSERT_CHUNK_SIZE]))
+    logging.debug(f"Bulk-inserted {len(rows)} message logs")
+    return len(rows)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"message_logs_y{month.year:04d}m{month.month:02d}"
+
+
+async def message_logs_partitioned(session: AsyncSession) -> bool:
+    result = await session.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table p "
+        "JOIN pg_class c ON c.oid = p.partrelid "
+        "WHERE c.relname = 'message_logs' AND c.relnamespace = current_schema()::regnamespace)"))
+    return bool(result.scalar())
+
+
+async def create_month_partitions(session: AsyncSession, first_month: date,
+                                  last_month: date) -> List[str]:
+    """Create the monthly partitions first_month..last_month and the default one if missing"""
+    await session.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF message_logs DEFAULT"))
+    existing = {name for name, _month in await list_month_partitions(session)}
+    created = []
+    month = date(first_month.year, first_month.month, 1)
+    while month <= last_month:
+        name = partition_name(month)
+        if name not in existing:
+            # Bounds in UTC, the same days as the rollups and archives use
+            await session.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF message_logs "
+                f"FOR VALUES FROM ('{month.isoformat()} 00:00:00+00') "
+                f"TO ('{add_months(month, 1).isoformat()} 00:00:00+00')"))
+            created.append(name)
+        month = add_months(month, 1)
+    if created:
+        logging.info(f"Message logs: created partitions {', '.join(created)}")
+    return created
+
+
+async def list_month_partitions(session: AsyncSession) -> List[Tuple[str, date]]:
+    """Monthly partitions of message_logs as (name, first day of the month), oldest first"""
+    result = await session.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = 'message_logs'::regclass"))
+    partitions = []
+    for name in result.scalars():
+        match = _PARTITION_NAME_RE.match(name)
+        if match:
+            partitions.append((name, date(int(match.group(1)), int(match.group(2)), 1)))
+    return sorted(partitions, key=lambda item: item[1])
+
+
+async def archive_partition(session: AsyncSession, name: str, directory: str) -> str:
+    """
+    Export a partition to <directory>/<name>.csv.gz with COPY. The file is
+    written under a temporary name and renamed when complete.
+    """
+    if not _PARTITION_NAME_RE.match(name):
+        raise ValueError(f"Not a message_logs partition: {name}")
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{name}.csv.gz")
+    tmp_path = f"{path}.part"
+    connection = await session.connection()
+    raw_connection = await connection.get_raw_connection()
+    with gzip.open(tmp_path, "wb") as archive:
+        async def write_chunk(chunk: bytes) -> None:
+            await asyncio.to_thread(archive.write, chunk)
+
+        await raw_connection.driver_connection.copy_from_table(
+            name, output=write_chunk, format="csv", header=True)
+    os.replace(tmp_path, path)
+    logging.info(f"Message logs: archived partition {name} to {path}")
+    return path
+
+
+async def drop_partition(session: AsyncSession, name: str) -> None:
+    if not _PARTITION_NAME_RE.match(name):
+        raise ValueError(f"Not a message_logs partition: {name}")
+    # Only a short catalog lock on message_logs, no row deletes and no bloat
+    await session.execute(text(f"DROP TABLE IF EXISTS {name}"))
+    logging.info(f"Message logs: dropped partition {name}")
@@ -0,0 +1,118 @@
+import logging
+from typing import List, Dict, Any, Sequence
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy import update, delete, func, and_, or_, exists
+from sqlalchemy.orm import aliased
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from ..models import OutboxMessage, RateLedgerBucket
+
+OUTBOX_STATUS_PENDING = "pending"
+OUTBOX_STATUS_SENDING = "sending"
+
+# A claim older than this is considered abandoned by a crashed process
+CLAIM_TIMEOUT_SECONDS = 300
+
+
+async def add_messages(session: AsyncSession, messages: List[Dict[str, Any]]) -> None:
+    if not messages:
+        return
+    await session.execute(pg_insert(OutboxMessage).values(messages))
+
+
+async def claim_messages(session: AsyncSession, worker_id: str, limit: int) -> List[OutboxMessage]:
+    """
+    Claim up to `limit` pending messages for this worker, highest priority first.
+
+    Rows are locked with SKIP LOCKED, so concurrent workers never claim the same
+    message. Chats that have a message claimed by another worker are skipped to
+    keep per-chat order; two workers that claim the first messages of a chat at
+    the same moment can still both get one.
+    """
+    claim_expired_before = func.now() - func.make_interval(
+        0, 0, 0, 0, 0, 0, CLAIM_TIMEOUT_SECONDS)
+    other = aliased(OutboxMessage)
+    chat_busy_elsewhere = exists().where(and_(
+        other.chat_id == OutboxMessage.chat_id,
+        other.status == OUTBOX_STATUS_SENDING,
+        other.locked_by != worker_id,
+        other.locked_at >= claim_expired_before,
+    ))
+    claimable = or_(
+        OutboxMessage.status == OUTBOX_STATUS_PENDING,
+        and_(
+            OutboxMessage.status == OUTBOX_STATUS_SENDING,
+            OutboxMessage.locked_at < claim_expired_before,
+        ),
+    )
+    ids_subquery = (
+        select(OutboxMessage.id)
+        .where(and_(claimable, ~chat_busy_elsewhere))
+        .order_by(OutboxMessage.priority, OutboxMessage.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    stmt = (
+        update(OutboxMessage)
+        .where(OutboxMessage.id.in_(ids_subquery))
+        .values(status=OUTBOX_STATUS_SENDING, locked_by=worker_id, locked_at=func.now())
+        .returning(OutboxMessage)
+    )
+    result = await session.execute(stmt)
+    messages = sorted(result.scalars().all(), key=lambda message: message.id)
+    if messages:
+        logging.debug(f"Outbox: worker {worker_id} claimed {len(messages)} messages")
+    return messages
+
+
+async def delete_messages(session: AsyncSession, message_ids: Sequence[int]) -> int:
+    if not message_ids:
+        return 0
+    result = await session.execute(
+        delete(OutboxMessage).where(OutboxMessage.id.in_(message_ids)))
+    return result.rowcount or 0
+
+
+async def release_messages(session: AsyncSession, worker_id: str,
+                           message_ids: Sequence[int]) -> int:
+    """Give claimed but unsent messages back to the other workers"""
+    if not message_ids:
+        return 0
+    result = await session.execute(
+        update(OutboxMessage)
+        .where(and_(OutboxMessage.id.in_(message_ids),
+                    OutboxMessage.locked_by == worker_id))
+        .values(status=OUTBOX_STATUS_PENDING, locked_by=None, locked_at=None))
+    return result.rowcount or 0
+
+
+async def lease_rate_tokens(session: AsyncSession, bucket: str, rate: float,
+                            capacity: float, requested: int) -> int:
+    """
+    Take up to `requested` tokens from the shared bucket, which refills at `rate`
+    per second up to `capacity` (database clock). Returns how many were granted.
+    """
+    ledger = RateLedgerBucket.__table__
+    elapsed = func.extract("epoch", func.clock_timestamp() - ledger.c.updated_at)
+    available = func.least(capacity, ledger.c.tokens + rate * elapsed)
+    granted = func.greatest(0, func.least(requested, func.floor(available)))
+    first_grant = min(requested, int(capacity))
+    stmt = (
+        pg_insert(RateLedgerBucket)
+        .values(bucket=bucket, tokens=capacity - first_grant,
+                updated_at=func.clock_timestamp(), granted=first_grant)
+        .on_conflict_do_update(
+            index_elements=["bucket"],
+            # All expressions see the row as it was before the update
+            set_={
+                "tokens": available - granted,
+                "granted": granted,
+                "updated_at": func.clock_timestamp(),
+            },
+        )
+        .returning(RateLedgerBucket.granted)
+    )
+    result = await session.execute(stmt)
+    return result.scalar_one()
@@ -0,0 +1,77 @@
+"""
+Keyset pagination helpers for the admin listings.
+
+Pages are addressed by the sort key of a boundary row instead of an OFFSET,
+so every page costs the same index range scan however deep it is. Totals
+for the page counters are approximate: the planner's row estimate for big
+tables, a capped COUNT for filtered lists.
+"""
+from typing import Any, List, Optional, Sequence, Tuple
+
+from sqlalchemy import func, select, text, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
+
+# Below this many rows an exact COUNT(*) is cheap enough
+EXACT_COUNT_THRESHOLD = 10000
+
+
+async def fetch_keyset_page(session: AsyncSession, stmt: Select, key_columns: Sequence,
+                            limit: int, before: Optional[Tuple] = None,
+                            after: Optional[Tuple] = None) -> Tuple[List[Any], bool]:
+    """
+    One page of `stmt` in descending order of `key_columns` (newest first).
+    `before` continues to the older rows past that key, `after` goes back to
+    the newer ones. Rows come back newest first either way, together with
+    whether more rows exist beyond them in the direction of travel.
+    """
+    key = tuple_(*key_columns) if len(key_columns) > 1 else key_columns[0]
+
+    def key_value(values: Tuple):
+        return tuple_(*values) if len(key_columns) > 1 else values[0]
+
+    if after is not None:
+        stmt = stmt.where(key > key_value(after)).order_by(*[c.asc() for c in key_columns])
+    else:
+        if before is not None:
+            stmt = stmt.where(key < key_value(before))
+        stmt = stmt.order_by(*[c.desc() for c in key_columns])
+
+    rows = list((await session.execute(stmt.limit(limit + 1))).scalars().all())
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if after is not None:
+        rows.reverse()
+    return rows, has_more
+
+
+async def estimate_table_rows(session: AsyncSession, table_name: str) -> int:
+    """Planner estimate of the row count (summed over partitions); no table scan"""
+    result = await session.execute(text(
+        "SELECT COALESCE(SUM(GREATEST(c.reltuples, 0)), 0)::bigint FROM pg_class c "
+        "WHERE c.oid = to_regclass(:name) "
+        "OR c.oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = to_regclass(:name))"
+    ), {"name": table_name})
+    return int(result.scalar() or 0)
+
+
+async def count_estimated(session: AsyncSession, model) -> Tuple[int, bool]:
+    """
+    Row count of a whole table as (count, exact): the planner estimate for
+    big tables, an exact COUNT(*) for small or not yet analyzed ones
+    """
+    estimate = await estimate_table_rows(session, model.__tablename__)
+    if estimate >= EXACT_COUNT_THRESHOLD:
+        return estimate, False
+    count = (await session.execute(select(func.count()).select_from(model))).scalar_one()
+    return int(count), True
+
+
+async def count_capped(session: AsyncSession, stmt: Select,
+                       cap: int = EXACT_COUNT_THRESHOLD) -> Tuple[int, bool]:
+    """Rows of `stmt` as (count, exact), counting no further than `cap`"""
+    limited = stmt.limit(cap + 1).subquery()
+    count = int((await session.execute(select(func.count()).select_from(limited))).scalar_one())
+    if count > cap:
+        return cap, False
+    return count, True
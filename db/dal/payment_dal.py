@@ -6,6 +6,7 @@ from sqlalchemy import update, func, and_
 from sqlalchemy.orm import selectinload
 
 from db.models import Payment, User
+from . import rollup_dal
 
 
 async def create_payment_record(session: AsyncSession,
@@ -32,6 +33,8 @@ async def create_payment_record(session: AsyncSession,
     session.add(new_payment)
     await session.flush()
     await session.refresh(new_payment)
+    if new_payment.status == "succeeded":
+        await rollup_dal.record_payment_succeeded(session, new_payment.payment_id)
     logging.info(
         f"Payment record {new_payment.payment_id} created for user {new_payment.user_id}"
     )
@@ -80,10 +83,14 @@ async def ensure_payment_with_provider_id(
 
 
 async def get_payment_by_db_id(session: AsyncSession,
-                               payment_db_id: int) -> Optional[Payment]:
+                               payment_db_id: int,
+                               for_update: bool = False) -> Optional[Payment]:
 
     stmt = select(Payment).where(Payment.payment_id == payment_db_id).options(
         selectinload(Payment.user), selectinload(Payment.promo_code_used))
+    if for_update:
+        # populate_existing: re-read the status even if the payment is already in the session
+        stmt = stmt.with_for_update(of=Payment).execution_options(populate_existing=True)
     result = await session.execute(stmt)
     return result.scalar_one_or_none()
 
@@ -93,14 +100,21 @@ async def update_payment_status_by_db_id(
         payment_db_id: int,
         new_status: str,
         yk_payment_id: Optional[str] = None) -> Optional[Payment]:
-    payment = await get_payment_by_db_id(session, payment_db_id)
+    # Lock the row so two concurrent webhooks can't both count (or take back) its revenue
+    payment = await get_payment_by_db_id(session, payment_db_id, for_update=True)
     if payment:
+        became_succeeded = payment.status != "succeeded" and new_status == "succeeded"
+        left_succeeded = payment.status == "succeeded" and new_status != "succeeded"
         payment.status = new_status
         payment.updated_at = func.now()
         if yk_payment_id and payment.yookassa_payment_id is None:
             payment.yookassa_payment_id = yk_payment_id
         await session.flush()
         await session.refresh(payment)
+        if became_succeeded:
+            await rollup_dal.record_payment_succeeded(session, payment.payment_id)
+        elif left_succeeded:
+            await rollup_dal.record_payment_reversed(session, payment.payment_id)
         logging.info(
             f"Payment record {payment.payment_id} status updated to {new_status}."
         )
@@ -158,13 +172,20 @@ async def count_user_succeeded_payments(
 async def update_provider_payment_and_status(
         session: AsyncSession, payment_db_id: int,
         provider_payment_id: str, new_status: str) -> Optional[Payment]:
-    payment = await get_payment_by_db_id(session, payment_db_id)
+    # Lock the row so two concurrent webhooks can't both count (or take back) its revenue
+    payment = await get_payment_by_db_id(session, payment_db_id, for_update=True)
     if payment:
+        became_succeeded = payment.status != "succeeded" and new_status == "succeeded"
+        left_succeeded = payment.status == "succeeded" and new_status != "succeeded"
         payment.status = new_status
         payment.provider_payment_id = provider_payment_id
         payment.updated_at = func.now()
         await session.flush()
         await session.refresh(payment)
+        if became_succeeded:
+            await rollup_dal.record_payment_succeeded(session, payment.payment_id)
+        elif left_succeeded:
+            await rollup_dal.record_payment_reversed(session, payment.payment_id)
         logging.info(
             f"Payment record {payment.payment_id} updated with provider id {provider_payment_id} and status {new_status}."
         )
@@ -177,65 +198,23 @@ async def update_provider_payment_and_status(
 
 async def get_financial_statistics(session: AsyncSession) -> Dict[str, Any]:
     """Get comprehensive financial statistics."""
-    from datetime import datetime, timedelta
-    from sqlalchemy import and_, text
-    
-    now = datetime.utcnow()
-    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-    week_start = today_start - timedelta(days=7)
-    month_start = today_start - timedelta(days=30)
-    
-    # Today's revenue
-    stmt_today = select(func.sum(Payment.amount)).where(
-        and_(
-            Payment.status == 'succeeded',
-            Payment.created_at >= today_start
-        )
-    )
-    today_revenue = await session.execute(stmt_today)
-    today_amount = today_revenue.scalar() or 0
-    
-    # Week revenue
-    stmt_week = select(func.sum(Payment.amount)).where(
-        and_(
-            Payment.status == 'succeeded',
-            Payment.created_at >= week_start
-        )
+    from datetime import datetime, timedelta, timezone
+
+    # Rollup days are UTC dates
+    today = datetime.now(timezone.utc).date()
+    totals = await rollup_dal.get_revenue_totals(
+        session,
+        today=today,
+        week_start=today - timedelta(days=7),
+        month_start=today - timedelta(days=30),
     )
-    week_revenue = await session.execute(stmt_week)
-    week_amount = week_revenue.scalar() or 0
-    
-    # Month revenue
-    stmt_month = select(func.sum(Payment.amount)).where(
-        and_(
-            Payment.status == 'succeeded',
-            Payment.created_at >= month_start
-        )
-    )
-    month_revenue = await session.execute(stmt_month)
-    month_amount = month_revenue.scalar() or 0
-    
-    # All time revenue
-    stmt_all = select(func.sum(Payment.amount)).where(Payment.status == 'succeeded')
-    all_revenue = await session.execute(stmt_all)
-    all_amount = all_revenue.scalar() or 0
-    
-    # Count of successful payments today
-    stmt_count_today = select(func.count(Payment.payment_id)).where(
-        and_(
-            Payment.status == 'succeeded',
-            Payment.created_at >= today_start
-        )
-    )
-    today_count = await session.execute(stmt_count_today)
-    today_payments_count = today_count.scalar() or 0
-    
+
     return {
-        "today_revenue": float(today_amount),
-        "week_revenue": float(week_amount),
-        "month_revenue": float(month_amount),
-        "all_time_revenue": float(all_amount),
-        "today_payments_count": today_payments_count
+        "today_revenue": float(totals["today"]),
+        "week_revenue": float(totals["week"]),
+        "month_revenue": float(totals["month"]),
+        "all_time_revenue": float(totals["all_time"]),
+        "today_payments_count": int(totals["today_count"])
     }
 
 
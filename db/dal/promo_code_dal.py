@@ -1,11 +1,12 @@
 import logging
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy import update, func, and_, or_
 from datetime import datetime, timezone
 
 from db.models import PromoCode, PromoCodeActivation, User, Payment
+from .pagination import fetch_keyset_page, count_estimated
 
 
 async def create_promo_code(session: AsyncSession,
@@ -56,39 +57,38 @@ async def get_all_active_promo_codes(session: AsyncSession,
 
 
 async def get_all_promo_codes_with_details(session: AsyncSession, limit: int = 50,
-                                         offset: int = 0) -> List[PromoCode]:
-    """Get all promo codes (active and inactive) with pagination for management"""
-    stmt = (select(PromoCode).order_by(
-        PromoCode.created_at.desc()).limit(limit).offset(offset))
-    result = await session.execute(stmt)
-    return result.scalars().all()
+                                           before: Optional[int] = None,
+                                           after: Optional[int] = None) -> Tuple[List[PromoCode], bool]:
+    """Get all promo codes (active and inactive), newest first, keyset-paged by id for management"""
+    return await fetch_keyset_page(
+        session, select(PromoCode), (PromoCode.promo_code_id,), limit,
+        before=(before,) if before is not None else None,
+        after=(after,) if after is not None else None)
 
 
-async def get_promo_codes_count(session: AsyncSession) -> int:
-    """Get total count of all promo codes"""
-    from sqlalchemy import func
-    stmt = select(func.count(PromoCode.promo_code_id))
-    result = await session.execute(stmt)
-    return result.scalar_one()
+async def estimate_promo_codes_count(session: AsyncSession) -> Tuple[int, bool]:
+    """Approximate count of all promo codes as (count, exact)"""
+    return await count_estimated(session, PromoCode)
 
 
-async def get_promo_activations_by_code_id(session: AsyncSession, promo_code_id: int, limit: Optional[int] = None, offset: int = 0) -> List[PromoCodeActivation]:
-    """Get activation history for a specific promo code with optional pagination."""
+async def get_promo_activations_by_code_id(session: AsyncSession, promo_code_id: int) -> List[PromoCodeActivation]:
+    """Get the whole activation history for a specific promo code."""
     stmt = (select(PromoCodeActivation)
             .where(PromoCodeActivation.promo_code_id == promo_code_id)
-            .order_by(PromoCodeActivation.activated_at.desc())
-            .offset(offset))
-    if limit is not None:
-        stmt = stmt.limit(limit)
+            .order_by(PromoCodeActivation.activation_id.desc()))
     result = await session.execute(stmt)
     return result.scalars().all()
 
 
-async def count_promo_activations_by_code_id(session: AsyncSession, promo_code_id: int) -> int:
-    """Count total activations for a specific promo code."""
-    stmt = select(func.count()).select_from(PromoCodeActivation).where(PromoCodeActivation.promo_code_id == promo_code_id)
-    result = await session.execute(stmt)
-    return result.scalar_one()
+async def get_promo_activations_page(session: AsyncSession, promo_code_id: int, limit: int,
+                                     before: Optional[int] = None,
+                                     after: Optional[int] = None) -> Tuple[List[PromoCodeActivation], bool]:
+    """Activations of a promo code, newest first, keyset-paged by activation id."""
+    stmt = select(PromoCodeActivation).where(PromoCodeActivation.promo_code_id == promo_code_id)
+    return await fetch_keyset_page(
+        session, stmt, (PromoCodeActivation.activation_id,), limit,
+        before=(before,) if before is not None else None,
+        after=(after,) if after is not None else None)
 
 
 async def update_promo_code(session: AsyncSession, promo_id: int,
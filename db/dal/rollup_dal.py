@@ -0,0 +1,338 @@
+import logging
+from datetime import date
+from typing import Optional, Dict, Any, List
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy import delete, func, and_, literal, exists, case, true
+from sqlalchemy.orm import aliased
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from ..models import (
+    User,
+    Payment,
+    AdAttribution,
+    DailyRevenueRollup,
+    DailyUserRollup,
+    DailyCampaignRollup,
+)
+
+# Rows per day (and provider / campaign) that concurrent transactions spread
+# their increments over, so a busy day doesn't serialize on one row lock
+ROLLUP_SHARDS = 8
+
+ROLLUP_MODELS = (DailyRevenueRollup, DailyUserRollup, DailyCampaignRollup)
+
+
+def utc_day(column):
+    return func.date(func.timezone("UTC", column))
+
+
+def _shard(user_id_column):
+    return user_id_column % ROLLUP_SHARDS
+
+
+async def _add_counts(session: AsyncSession, model, key_columns: List[str],
+                      source) -> None:
+    """
+    INSERT the rows of `source` (columns labelled like the rollup columns:
+    the key first, then counters) adding the counters to existing rows
+    """
+    columns = [c.name for c in source.selected_columns]
+    stmt = pg_insert(model).from_select(columns, source)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=key_columns,
+        set_={
+            name: getattr(model, name) + getattr(stmt.excluded, name)
+            for name in columns if name not in key_columns
+        },
+    )
+    await session.execute(stmt)
+
+
+def _first_success_flag():
+    """1 for the user's first succeeded payment (by creation time), else 0"""
+    return case(
+        (func.row_number().over(
+            partition_by=Payment.user_id,
+            order_by=(Payment.created_at, Payment.payment_id)) == 1, 1),
+        else_=0,
+    )
+
+
+def _campaign_payments_source(user_id: Optional[int] = None):
+    """Succeeded payments of attributed users (or of one user) grouped into campaign rollup rows"""
+    ranked = select(
+        Payment.user_id,
+        Payment.amount,
+        Payment.created_at,
+        _first_success_flag().label("is_first"),
+    ).where(Payment.status == "succeeded")
+    if user_id is not None:
+        ranked = ranked.where(Payment.user_id == user_id)
+    ranked = ranked.subquery()
+    day = utc_day(ranked.c.created_at)
+    return (
+        select(
+            day.label("day"),
+            AdAttribution.ad_campaign_id.label("ad_campaign_id"),
+            literal(0).label("shard"),
+            func.sum(ranked.c.is_first).label("payers"),
+            func.count().label("payments_count"),
+            func.sum(ranked.c.amount).label("revenue"),
+        )
+        .select_from(ranked.join(AdAttribution, AdAttribution.user_id == ranked.c.user_id))
+        .group_by(day, AdAttribution.ad_campaign_id)
+    )
+
+
+# --- Incremental updates, called by the DAL in the transaction of the event ---
+
+async def record_payment_succeeded(session: AsyncSession, payment_id: int) -> None:
+    """Count a payment that has just become succeeded (call once per payment)"""
+    await _record_payment(session, payment_id, 1)
+
+
+async def record_payment_reversed(session: AsyncSession, payment_id: int) -> None:
+    """Take back a counted payment that is no longer succeeded (refund, status rewrite)"""
+    await _record_payment(session, payment_id, -1)
+
+
+async def _record_payment(session: AsyncSession, payment_id: int, sign: int) -> None:
+    """
+    Add (sign=1) or subtract (sign=-1) a payment. Campaign payers change only
+    while the user has no other succeeded payment; a reversed first payment
+    doesn't move the payer to the day of a later one (/rebuild_rollups does).
+    """
+    revenue_source = select(
+        utc_day(Payment.created_at).label("day"),
+        Payment.provider.label("provider"),
+        Payment.currency.label("currency"),
+        _shard(Payment.user_id).label("shard"),
+        (Payment.amount * sign).label("amount"),
+        literal(sign).label("payments_count"),
+    ).where(Payment.payment_id == payment_id)
+    await _add_counts(session, DailyRevenueRollup,
+                      ["day", "provider", "currency", "shard"], revenue_source)
+
+    other = aliased(Payment)
+    paid_before = exists().where(and_(
+        other.user_id == Payment.user_id,
+        other.status == "succeeded",
+        other.payment_id != Payment.payment_id,
+    ))
+    campaign_source = (
+        select(
+            utc_day(Payment.created_at).label("day"),
+            AdAttribution.ad_campaign_id.label("ad_campaign_id"),
+            _shard(Payment.user_id).label("shard"),
+            case((paid_before, 0), else_=sign).label("payers"),
+            literal(sign).label("payments_count"),
+            (Payment.amount * sign).label("revenue"),
+        )
+        .select_from(Payment)
+        .join(AdAttribution, AdAttribution.user_id == Payment.user_id)
+        .where(Payment.payment_id == payment_id)
+    )
+    await _add_counts(session, DailyCampaignRollup,
+                      ["day", "ad_campaign_id", "shard"], campaign_source)
+
+
+async def record_user_registered(session: AsyncSession, user_id: int) -> None:
+    source = select(
+        utc_day(User.registration_date).label("day"),
+        _shard(User.user_id).label("shard"),
+        literal(1).label("new_users"),
+    ).where(User.user_id == user_id)
+    await _add_counts(session, DailyUserRollup, ["day", "shard"], source)
+
+
+async def record_trial_activated(session: AsyncSession, user_id: int) -> None:
+    source = select(
+        utc_day(func.now()).label("day"),
+        literal(user_id % ROLLUP_SHARDS).label("shard"),
+        literal(1).label("trials"),
+    )
+    await _add_counts(session, DailyUserRollup, ["day", "shard"], source)
+
+
+async def record_campaign_trial(session: AsyncSession, campaign_id: int, user_id: int) -> None:
+    source = select(
+        utc_day(func.now()).label("day"),
+        literal(campaign_id).label("ad_campaign_id"),
+        literal(user_id % ROLLUP_SHARDS).label("shard"),
+        literal(1).label("trials"),
+    )
+    await _add_counts(session, DailyCampaignRollup,
+                      ["day", "ad_campaign_id", "shard"], source)
+
+
+async def record_campaign_start(session: AsyncSession, user_id: int) -> None:
+    """Count a new attribution, including payments the user made before it"""
+    source = select(
+        utc_day(AdAttribution.first_start_at).label("day"),
+        AdAttribution.ad_campaign_id.label("ad_campaign_id"),
+        _shard(AdAttribution.user_id).label("shard"),
+        literal(1).label("starts"),
+    ).where(AdAttribution.user_id == user_id)
+    await _add_counts(session, DailyCampaignRollup,
+                      ["day", "ad_campaign_id", "shard"], source)
+    await _add_counts(session, DailyCampaignRollup,
+                      ["day", "ad_campaign_id", "shard"],
+                      _campaign_payments_source(user_id))
+
+
+async def delete_campaign_rollups(session: AsyncSession, campaign_id: int) -> None:
+    await session.execute(
+        delete(DailyCampaignRollup).where(DailyCampaignRollup.ad_campaign_id == campaign_id))
+
+
+# --- Reads ---
+
+async def get_revenue_totals(session: AsyncSession, today: date, week_start: date,
+                             month_start: date) -> Dict[str, Any]:
+    rollup = DailyRevenueRollup
+    stmt = select(
+        func.sum(rollup.amount).filter(rollup.day >= today).label("today"),
+        func.sum(rollup.amount).filter(rollup.day >= week_start).label("week"),
+        func.sum(rollup.amount).filter(rollup.day >= month_start).label("month"),
+        func.sum(rollup.amount).label("all_time"),
+        func.sum(rollup.payments_count).filter(rollup.day >= today).label("today_count"),
+    )
+    row = (await session.execute(stmt)).one()
+    return {key: value or 0 for key, value in row._mapping.items()}
+
+
+async def get_user_totals(session: AsyncSession, today: date) -> Dict[str, int]:
+    rollup = DailyUserRollup
+    stmt = select(
+        func.coalesce(func.sum(rollup.new_users), 0).label("total"),
+        func.coalesce(func.sum(rollup.new_users).filter(rollup.day >= today), 0).label("today"),
+        func.coalesce(func.sum(rollup.trials).filter(rollup.day >= today), 0).label("trials_today"),
+    )
+    row = (await session.execute(stmt)).one()
+    return {key: int(value) for key, value in row._mapping.items()}
+
+
+async def get_campaign_totals(session: AsyncSession,
+                              campaign_id: Optional[int] = None) -> Dict[str, Any]:
+    rollup = DailyCampaignRollup
+    stmt = select(
+        func.coalesce(func.sum(rollup.starts), 0).label("starts"),
+        func.coalesce(func.sum(rollup.trials), 0).label("trials"),
+        func.coalesce(func.sum(rollup.payers), 0).label("payers"),
+        func.coalesce(func.sum(rollup.revenue), 0.0).label("revenue"),
+    )
+    if campaign_id is not None:
+        stmt = stmt.where(rollup.ad_campaign_id == campaign_id)
+    row = (await session.execute(stmt)).one()
+    return {
+        "starts": int(row.starts),
+        "trials": int(row.trials),
+        "payers": int(row.payers),
+        "revenue": float(row.revenue),
+    }
+
+
+# --- Backfill ---
+
+async def rebuild_rollups(session: AsyncSession, since: Optional[date] = None) -> Dict[str, int]:
+    """
+    Recompute the rollups from the raw tables, for all days or from `since`.
+    Run it in its own transaction; returns the number of rows written per table.
+
+    Campaign payers are tied to the day of the user's first payment, so with
+    `since` the first payment is still looked up over the whole history.
+    """
+    def from_since(column):
+        return utc_day(column) >= since if since else true()
+
+    for model in ROLLUP_MODELS:
+        stmt = delete(model)
+        if since:
+            stmt = stmt.where(model.day >= since)
+        await session.execute(stmt)
+
+    revenue_day = utc_day(Payment.created_at)
+    revenue_source = (
+        select(
+            revenue_day.label("day"),
+            Payment.provider.label("provider"),
+            Payment.currency.label("currency"),
+            literal(0).label("shard"),
+            func.sum(Payment.amount).label("amount"),
+            func.count().label("payments_count"),
+        )
+        .where(and_(Payment.status == "succeeded", from_since(Payment.created_at)))
+        .group_by(revenue_day, Payment.provider, Payment.currency)
+    )
+
+    registration_day = utc_day(User.registration_date)
+    trial_day = utc_day(User.trial_activated_at)
+    new_users_source = (
+        select(
+            registration_day.label("day"),
+            literal(0).label("shard"),
+            func.count().label("new_users"),
+        )
+        .where(and_(User.registration_date.is_not(None), from_since(User.registration_date)))
+        .group_by(registration_day)
+    )
+    trials_source = (
+        select(
+            trial_day.label("day"),
+            literal(0).label("shard"),
+            func.count().label("trials"),
+        )
+        .where(and_(User.trial_activated_at.is_not(None), from_since(User.trial_activated_at)))
+        .group_by(trial_day)
+    )
+
+    start_day = utc_day(AdAttribution.first_start_at)
+    starts_source = (
+        select(
+            start_day.label("day"),
+            AdAttribution.ad_campaign_id.label("ad_campaign_id"),
+            literal(0).label("shard"),
+            func.count().label("starts"),
+        )
+        .where(and_(AdAttribution.first_start_at.is_not(None),
+                    from_since(AdAttribution.first_start_at)))
+        .group_by(start_day, AdAttribution.ad_campaign_id)
+    )
+    campaign_trial_day = utc_day(AdAttribution.trial_activated_at)
+    campaign_trials_source = (
+        select(
+            campaign_trial_day.label("day"),
+            AdAttribution.ad_campaign_id.label("ad_campaign_id"),
+            literal(0).label("shard"),
+            func.count().label("trials"),
+        )
+        .where(and_(AdAttribution.trial_activated_at.is_not(None),
+                    from_since(AdAttribution.trial_activated_at)))
+        .group_by(campaign_trial_day, AdAttribution.ad_campaign_id)
+    )
+    campaign_payments_source = _campaign_payments_source()
+    if since:
+        campaign_payments_source = campaign_payments_source.having(
+            campaign_payments_source.selected_columns.day >= since)
+
+    steps = (
+        (DailyRevenueRollup, ["day", "provider", "currency", "shard"], revenue_source),
+        (DailyUserRollup, ["day", "shard"], new_users_source),
+        (DailyUserRollup, ["day", "shard"], trials_source),
+        (DailyCampaignRollup, ["day", "ad_campaign_id", "shard"], starts_source),
+        (DailyCampaignRollup, ["day", "ad_campaign_id", "shard"], campaign_trials_source),
+        (DailyCampaignRollup, ["day", "ad_campaign_id", "shard"], campaign_payments_source),
+    )
+    for model, key_columns, source in steps:
+        await _add_counts(session, model, key_columns, source)
+
+    counts = {}
+    for model in ROLLUP_MODELS:
+        stmt = select(func.count()).select_from(model)
+        if since:
+            stmt = stmt.where(model.day >= since)
+        counts[model.__tablename__] = int((await session.execute(stmt)).scalar() or 0)
+    logging.info(f"Rollups rebuilt since {since or 'the beginning'}: {counts}")
+    return counts
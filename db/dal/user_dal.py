@@ -1,13 +1,14 @@
 import logging
-from typing import Optional, List, Dict, Any, Tuple
+from typing import Optional, List, Dict, Any, Tuple, AsyncIterator
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
-from sqlalchemy import update, delete, func, and_
-from datetime import datetime, timezone
+from sqlalchemy import update, delete, func, and_, or_, true
+from datetime import datetime, timezone, timedelta
 from sqlalchemy.dialects.postgresql import insert as pg_insert
 
 from ..models import User, Subscription
+from . import rollup_dal
 
 
 async def get_user_by_id(session: AsyncSession, user_id: int) -> Optional[User]:
@@ -58,6 +59,9 @@ async def create_user(session: AsyncSession, user_data: Dict[str, Any]) -> Tuple
     user_id: int = user_data["user_id"]
     user = await get_user_by_id(session, user_id)
 
+    if created:
+        await rollup_dal.record_user_registered(session, user_id)
+
     if created and user is not None:
         logging.info(
             f"New user {user.user_id} created in DAL. Referred by: {user.referred_by_id or 'N/A'}."
@@ -90,6 +94,20 @@ async def update_user_language(
     return result.rowcount > 0
 
 
+async def mark_trial_activated(session: AsyncSession, user_id: int) -> bool:
+    """Remember the first trial activation of a user and count it in the daily rollup"""
+    stmt = (
+        update(User)
+        .where(and_(User.user_id == user_id, User.trial_activated_at.is_(None)))
+        .values(trial_activated_at=func.now())
+    )
+    result = await session.execute(stmt)
+    if result.rowcount > 0:
+        await rollup_dal.record_trial_activated(session, user_id)
+        return True
+    return False
+
+
 async def get_banned_users(session: AsyncSession) -> List[User]:
     """Get all banned users"""
     stmt = (
@@ -101,131 +119,180 @@ async def get_banned_users(session: AsyncSession) -> List[User]:
     return result.scalars().all()
 
 
-async def get_all_active_user_ids_for_broadcast(session: AsyncSession) -> List[int]:
-    stmt = select(User.user_id).where(User.is_banned == False)
-    result = await session.execute(stmt)
-    return result.scalars().all()
+def _reachable_condition(recheck_after_days: int = 0):
+    """Users not flagged unreachable, plus flagged ones due for a re-check (if enabled)."""
+    condition = User.unreachable_since.is_(None)
+    if recheck_after_days and recheck_after_days > 0:
+        recheck_before = datetime.now(timezone.utc) - timedelta(days=recheck_after_days)
+        condition = or_(condition, User.unreachable_since < recheck_before)
+    return condition
 
 
-async def get_all_users_with_panel_uuid(session: AsyncSession) -> List[User]:
-    stmt = select(User).where(User.panel_user_uuid.is_not(None))
-    result = await session.execute(stmt)
-    return result.scalars().all()
+BROADCAST_AUDIENCE_CHUNK_SIZE = 5000
 
 
-async def get_enhanced_user_statistics(session: AsyncSession) -> Dict[str, Any]:
-    """Get comprehensive user statistics including active users, trial users, etc."""
-    from datetime import datetime, timezone
-    
-    # Use timezone-aware UTC to avoid naive/aware comparison issues in SQL queries
+def _broadcast_audience_condition(target: str = "all", recheck_after_days: int = 0):
+    """
+    Filter for a broadcast audience: "all", "active" (has an active subscription,
+    paid or trial) or "inactive". Banned and unreachable users are excluded.
+    """
+    condition = and_(User.is_banned == False, _reachable_condition(recheck_after_days))
+    if target not in ("active", "inactive"):
+        return condition
+
     now = datetime.now(timezone.utc)
-    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-    
-    # Total users
-    total_users_stmt = select(func.count(User.user_id))
-    total_users = (await session.execute(total_users_stmt)).scalar() or 0
-    
-    # Banned users
-    banned_users_stmt = select(func.count(User.user_id)).where(User.is_banned == True)
-    banned_users = (await session.execute(banned_users_stmt)).scalar() or 0
-    
-    # Active users today (proxy: registered today)
-    active_today_stmt = select(func.count(User.user_id)).where(User.registration_date >= today_start)
-    active_today = (await session.execute(active_today_stmt)).scalar() or 0
-    
-    # Users with active paid subscriptions (non-trial providers only)
-    paid_subs_stmt = (
-        select(func.count(func.distinct(Subscription.user_id)))
-        .join(User, Subscription.user_id == User.user_id)
+    has_active_subscription = (
+        select(Subscription.subscription_id)
         .where(
             and_(
+                Subscription.user_id == User.user_id,
                 Subscription.is_active == True,
                 Subscription.end_date > now,
-                Subscription.provider.is_not(None)  # Not trial
             )
         )
+        .exists()
     )
-    paid_subs_users = (await session.execute(paid_subs_stmt)).scalar() or 0
-    
-    # Users on trial period
-    trial_subs_stmt = (
-        select(func.count(func.distinct(Subscription.user_id)))
-        .join(User, Subscription.user_id == User.user_id)
-        .where(
-            and_(
-                Subscription.is_active == True,
-                Subscription.end_date > now,
-                Subscription.provider.is_(None)  # Trial subscriptions
-            )
-        )
+    if target == "active":
+        return and_(condition, has_active_subscription)
+    return and_(condition, ~has_active_subscription)
+
+
+def broadcast_audience_stmt(target: str = "all", recheck_after_days: int = 0,
+                            after_user_id: Optional[int] = None):
+    """SELECT of audience user IDs in user_id order, starting after after_user_id"""
+    stmt = select(User.user_id).where(
+        _broadcast_audience_condition(target, recheck_after_days))
+    if after_user_id is not None:
+        stmt = stmt.where(User.user_id > after_user_id)
+    return stmt.order_by(User.user_id)
+
+
+async def iter_broadcast_audience_ids(
+    session: AsyncSession,
+    target: str = "all",
+    recheck_after_days: int = 0,
+    after_user_id: Optional[int] = None,
+    chunk_size: int = BROADCAST_AUDIENCE_CHUNK_SIZE,
+) -> AsyncIterator[List[int]]:
+    """
+    Yield the audience in user_id-ordered chunks (keyset pagination on the users
+    primary key). Each chunk is a short query, so no transaction or cursor stays
+    open between chunks and memory is bounded by chunk_size.
+    """
+    while True:
+        stmt = broadcast_audience_stmt(
+            target, recheck_after_days, after_user_id).limit(chunk_size)
+        result = await session.execute(stmt)
+        chunk = result.scalars().all()
+        if not chunk:
+            return
+        yield chunk
+        if len(chunk) < chunk_size:
+            return
+        after_user_id = chunk[-1]
+
+
+async def count_broadcast_audience(
+    session: AsyncSession, target: str = "all", recheck_after_days: int = 0
+) -> int:
+    stmt = select(func.count(User.user_id)).where(
+        _broadcast_audience_condition(target, recheck_after_days))
+    result = await session.execute(stmt)
+    return result.scalar_one()
+
+
+async def mark_users_unreachable(
+    session: AsyncSession, user_ids: List[int], reason: str
+) -> int:
+    """Flag users the bot can no longer message (blocked, deleted account, etc.)"""
+    if not user_ids:
+        return 0
+    stmt = (
+        update(User)
+        .where(User.user_id.in_(user_ids))
+        .values(unreachable_reason=reason, unreachable_since=func.now())
     )
-    trial_users = (await session.execute(trial_subs_stmt)).scalar() or 0
-    
-    # Inactive users (no active subscription)
-    inactive_users = total_users - paid_subs_users - trial_users - banned_users
-    
-    # Users attracted via referral
-    referral_users_stmt = select(func.count(User.user_id)).where(User.referred_by_id.is_not(None))
-    referral_users = (await session.execute(referral_users_stmt)).scalar() or 0
-    
-    return {
-        "total_users": total_users,
-        "banned_users": banned_users,
-        "active_today": active_today,
-        "paid_subscriptions": paid_subs_users,
-        "trial_users": trial_users,
-        "inactive_users": max(0, inactive_users),
-        "referral_users": referral_users
-    }
+    result = await session.execute(stmt)
+    return result.rowcount or 0
 
 
-async def get_user_ids_with_active_subscription(session: AsyncSession) -> List[int]:
-    """Return non-banned user IDs who have an active subscription (paid or trial)."""
-    from datetime import datetime, timezone
-    now = datetime.now(timezone.utc)
+async def mark_user_reachable(session: AsyncSession, user_id: int) -> bool:
+    stmt = (
+        update(User)
+        .where(and_(User.user_id == user_id, User.unreachable_since.is_not(None)))
+        .values(unreachable_reason=None, unreachable_since=None)
+    )
+    result = await session.execute(stmt)
+    return result.rowcount > 0
+
 
+async def reset_unreachable_users(session: AsyncSession) -> int:
+    """Clear all unreachable flags so the next broadcast re-checks these users"""
     stmt = (
-        select(func.distinct(Subscription.user_id))
-        .join(User, Subscription.user_id == User.user_id)
-        .where(
-            and_(
-                User.is_banned == False,
-                Subscription.is_active == True,
-                Subscription.end_date > now,
-            )
-        )
+        update(User)
+        .where(User.unreachable_since.is_not(None))
+        .values(unreachable_reason=None, unreachable_since=None)
     )
     result = await session.execute(stmt)
+    return result.rowcount or 0
+
+
+async def count_unreachable_users(session: AsyncSession) -> int:
+    stmt = select(func.count(User.user_id)).where(User.unreachable_since.is_not(None))
+    return (await session.execute(stmt)).scalar() or 0
+
+
+async def get_all_users_with_panel_uuid(session: AsyncSession) -> List[User]:
+    stmt = select(User).where(User.panel_user_uuid.is_not(None))
+    result = await session.execute(stmt)
     return result.scalars().all()
 
 
-async def get_user_ids_without_active_subscription(session: AsyncSession) -> List[int]:
-    """Return non-banned user IDs who do NOT have any active subscription."""
-    from datetime import datetime, timezone
+async def get_enhanced_user_statistics(session: AsyncSession) -> Dict[str, Any]:
+    """Get comprehensive user statistics including active users, trial users, etc."""
+    # Use timezone-aware UTC to avoid naive/aware comparison issues in SQL queries
     now = datetime.now(timezone.utc)
+    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
 
-    # Subquery for users with active subscription
-    active_subs_subq = (
-        select(Subscription.user_id)
-        .where(
-            and_(
-                Subscription.is_active == True,
-                Subscription.end_date > now,
-            )
-        )
-    ).scalar_subquery()
-
-    stmt = (
-        select(User.user_id)
-        .where(
-            and_(
-                User.is_banned == False,
-                ~User.user_id.in_(active_subs_subq),
-            )
+    # One pass over subscriptions for both counts; provider IS NULL marks a trial
+    subs_counts = (
+        select(
+            func.count(func.distinct(Subscription.user_id))
+            .filter(Subscription.provider.is_not(None)).label("paid"),
+            func.count(func.distinct(Subscription.user_id))
+            .filter(Subscription.provider.is_(None)).label("trial"),
         )
+        .where(and_(Subscription.is_active == True, Subscription.end_date > now))
+        .subquery()
     )
-    result = await session.execute(stmt)
-    return result.scalars().all()
+    # Banned and referred users are counted over their partial indexes
+    user_counts = select(
+        func.count(User.user_id).filter(User.is_banned == True).label("banned"),
+        func.count(User.user_id).filter(User.referred_by_id.is_not(None)).label("referral"),
+    ).where(or_(User.is_banned == True, User.referred_by_id.is_not(None))).subquery()
+    # Both are single-row aggregates: joining them on TRUE gives one row
+    stmt = select(user_counts, subs_counts).select_from(user_counts.join(subs_counts, true()))
+    row = (await session.execute(stmt)).one()
+    # Registrations come from the daily rollup
+    registrations = await rollup_dal.get_user_totals(session, today_start.date())
+
+    total_users = registrations["total"]
+    banned_users = row.banned or 0
+    paid_subs_users = row.paid or 0
+    trial_users = row.trial or 0
+    # Inactive users (no active subscription)
+    inactive_users = total_users - paid_subs_users - trial_users - banned_users
+
+    return {
+        "total_users": total_users,
+        "banned_users": banned_users,
+        # Active users today (proxy: registered today)
+        "active_today": registrations["today"],
+        "paid_subscriptions": paid_subs_users,
+        "trial_users": trial_users,
+        "inactive_users": max(0, inactive_users),
+        "referral_users": row.referral or 0
+    }
 
 
 async def get_recent_users(session: AsyncSession, limit: int = 10) -> List[User]:
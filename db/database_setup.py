@@ -1,12 +1,19 @@
 import logging
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
 
 from config.settings import Settings
-from .models import Base
-from .migrator import run_simple_migrations
+from .migrator import run_migrations
+from .migrations import MIGRATIONS
+from .pool_metrics import InstrumentedQueuePool, instrument_engine, get_pool_stats
+from .read_replica import ReadSessionRouter
+from .query_metrics import instrument_queries
 
 async_engine = None
+replica_engine = None
+read_session_router: Optional[ReadSessionRouter] = None
 
 
 def init_db_connection(settings: Settings) -> sessionmaker:
@@ -19,8 +26,25 @@ def init_db_connection(settings: Settings) -> sessionmaker:
         async_engine = create_async_engine(
             settings.DATABASE_URL,
             echo=False,
-            pool_pre_ping=True,
+            poolclass=InstrumentedQueuePool,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_POOL_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+            pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+            pool_pre_ping=settings.DB_POOL_PRE_PING,
+            connect_args={
+                # asyncpg's own cache and SQLAlchemy's prepared statement cache;
+                # 0 disables both (needed behind PgBouncer in transaction mode)
+                "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+                "prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+            },
         )
+        instrument_engine(async_engine)
+        instrument_queries(async_engine, settings, "primary")
+        logging.info(
+            f"DB pool: size={settings.DB_POOL_SIZE}, max_overflow={settings.DB_POOL_MAX_OVERFLOW}, "
+            f"timeout={settings.DB_POOL_TIMEOUT_SECONDS}s, recycle={settings.DB_POOL_RECYCLE_SECONDS}s, "
+            f"pre_ping={settings.DB_POOL_PRE_PING}, statement_cache={settings.DB_STATEMENT_CACHE_SIZE}")
 
     local_async_session_factory = async_sessionmaker(
         bind=async_engine,
@@ -35,6 +59,65 @@ def init_db_connection(settings: Settings) -> sessionmaker:
     return local_async_session_factory
 
 
+def get_db_pool_stats() -> Optional[Dict[str, Any]]:
+    """Connection pool state and counters of the global engine (None before init)"""
+    return get_pool_stats(async_engine)
+
+
+def init_read_replica(settings: Settings, session_factory: sessionmaker) -> ReadSessionRouter:
+    """
+    Session factory for read-only work: the replica from POSTGRES_REPLICA_HOST
+    when it's fresh enough, `session_factory` (the primary) otherwise
+    """
+    global replica_engine, read_session_router
+
+    if read_session_router is not None:
+        return read_session_router
+
+    replica_factory = None
+    if settings.DATABASE_REPLICA_URL:
+        replica_engine = create_async_engine(
+            settings.DATABASE_REPLICA_URL,
+            echo=False,
+            poolclass=InstrumentedQueuePool,
+            pool_size=settings.DB_REPLICA_POOL_SIZE,
+            max_overflow=settings.DB_REPLICA_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+            pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+            pool_pre_ping=settings.DB_POOL_PRE_PING,
+            connect_args={
+                "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+                "prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+            },
+        )
+        instrument_engine(replica_engine)
+        instrument_queries(replica_engine, settings, "replica")
+        replica_factory = async_sessionmaker(
+            bind=replica_engine,
+            class_=AsyncSession,
+            expire_on_commit=False,
+            autocommit=False,
+            autoflush=False,
+        )
+        logging.info(
+            f"Read replica configured: {settings.POSTGRES_REPLICA_HOST}, "
+            f"pool size={settings.DB_REPLICA_POOL_SIZE}, max_overflow={settings.DB_REPLICA_MAX_OVERFLOW}, "
+            f"max lag={settings.DB_REPLICA_MAX_LAG_SECONDS}s")
+
+    read_session_router = ReadSessionRouter(
+        session_factory, replica_factory,
+        max_lag_seconds=settings.DB_REPLICA_MAX_LAG_SECONDS,
+        check_interval_seconds=settings.DB_REPLICA_LAG_CHECK_SECONDS)
+    return read_session_router
+
+
+def get_replica_stats() -> Optional[Dict[str, Any]]:
+    """Replica routing state and pool counters (None without a replica)"""
+    if read_session_router is None or not read_session_router.configured:
+        return None
+    return {**(get_pool_stats(replica_engine) or {}), **read_session_router.stats()}
+
+
 async def get_async_session(session_factory: sessionmaker) -> AsyncSession:
 
     if session_factory is None:
@@ -61,10 +144,7 @@ async def init_db(settings: Settings, session_factory: sessionmaker):
             "async_engine is not initialized. Call init_db_connection and get session_factory first."
         )
 
-    async with async_engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-        # Run lightweight, idempotent migrations to add any missing columns
-        await conn.run_sync(run_simple_migrations)
+    await run_migrations(async_engine, MIGRATIONS)
     logging.info(
         "PostgreSQL database initialized/checked successfully using SQLAlchemy."
     )
@@ -85,4 +165,20 @@ async def init_db(settings: Settings, session_factory: sessionmaker):
             await session.rollback()
             logging.error(
                 f"Failed to initialize PanelSyncStatus: {e_sync_init}",
-                exc_info=True)
\ No newline at end of file
+                exc_info=True)
+
+    async with session_factory() as session:
+        from .dal import message_log_dal
+        try:
+            # Partitions for this month must exist before the first update is logged
+            if await message_log_dal.message_logs_partitioned(session):
+                this_month = datetime.now(timezone.utc).date().replace(day=1)
+                await message_log_dal.create_month_partitions(
+                    session, this_month,
+                    message_log_dal.add_months(this_month, settings.MESSAGE_LOG_PARTITIONS_AHEAD))
+                await session.commit()
+        except Exception as e_partitions:
+            await session.rollback()
+            logging.error(
+                f"Failed to create message log partitions: {e_partitions}",
+                exc_info=True)
@@ -0,0 +1,228 @@
+"""
+Schema migration steps, applied in version order by db/migrator.py.
+
+Rules for new steps:
+- Append with the next version; never renumber or edit an applied step.
+- Update the models too: a fresh database is created from them and every
+  step is only marked as applied.
+- Steps may be re-run after a crash between the change and its record, so
+  use IF [NOT] EXISTS or check the current state first.
+- Keep locks short: transactional steps run with a lock_timeout and are
+  retried; backfills go through backfill_in_batches in a non-transactional
+  step; indexes on existing tables are built CONCURRENTLY (sync_indexes),
+  in a required=False step so a failed build is retried on the next start.
+"""
+import logging
+from datetime import datetime, timezone
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from .models import Base, MessageLog
+from .migrator import Migration, add_missing_columns, backfill_in_batches, sync_indexes
+from .dal import message_log_dal, rollup_dal
+
+
+async def _create_missing_tables_and_columns(conn: AsyncConnection) -> None:
+    # Databases created before versioned migrations: bring them to the models once
+    await conn.run_sync(Base.metadata.create_all)
+    await conn.run_sync(add_missing_columns)
+
+
+async def _create_missing_indexes(conn: AsyncConnection) -> None:
+    await conn.run_sync(sync_indexes)
+
+
+# payments.amount: double precision -> numeric, without rewriting the table
+# under an exclusive lock. A trigger keeps a new column in sync while existing
+# rows are copied in batches, then the columns are swapped.
+
+async def _payments_amount_is_numeric(conn: AsyncConnection) -> bool:
+    data_type = (await conn.execute(text(
+        "SELECT data_type FROM information_schema.columns "
+        "WHERE table_schema = current_schema() AND table_name = 'payments' "
+        "AND column_name = 'amount'"
+    ))).scalar_one_or_none()
+    return data_type == "numeric"
+
+
+async def _payments_amount_add_numeric_column(conn: AsyncConnection) -> None:
+    if await _payments_amount_is_numeric(conn):
+        return
+    for statement in (
+        "ALTER TABLE payments ADD COLUMN IF NOT EXISTS amount_numeric NUMERIC(18, 8)",
+        """
+        CREATE OR REPLACE FUNCTION payments_amount_numeric_sync() RETURNS trigger AS $$
+        BEGIN
+            NEW.amount_numeric := NEW.amount;
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+        """,
+        "DROP TRIGGER IF EXISTS payments_amount_numeric_sync ON payments",
+        "CREATE TRIGGER payments_amount_numeric_sync BEFORE INSERT OR UPDATE ON payments "
+        "FOR EACH ROW EXECUTE FUNCTION payments_amount_numeric_sync()",
+        # Checked for new rows right away, validated after the backfill;
+        # lets SET NOT NULL in the swap skip the table scan
+        "ALTER TABLE payments DROP CONSTRAINT IF EXISTS payments_amount_numeric_not_null",
+        "ALTER TABLE payments ADD CONSTRAINT payments_amount_numeric_not_null "
+        "CHECK (amount_numeric IS NOT NULL) NOT VALID",
+    ):
+        await conn.execute(text(statement))
+
+
+async def _payments_amount_backfill(conn: AsyncConnection) -> None:
+    if await _payments_amount_is_numeric(conn):
+        return
+    await backfill_in_batches(conn, """
+        WITH batch AS (
+            SELECT payment_id FROM payments
+            WHERE payment_id > :after
+            ORDER BY payment_id
+            LIMIT :batch_size
+        )
+        UPDATE payments p SET amount_numeric = p.amount
+        FROM batch WHERE p.payment_id = batch.payment_id
+        RETURNING p.payment_id
+    """)
+    # Doesn't block reads or writes
+    await conn.execute(text(
+        "ALTER TABLE payments VALIDATE CONSTRAINT payments_amount_numeric_not_null"))
+
+
+async def _payments_amount_swap_columns(conn: AsyncConnection) -> None:
+    if await _payments_amount_is_numeric(conn):
+        return
+    for statement in (
+        "DROP TRIGGER IF EXISTS payments_amount_numeric_sync ON payments",
+        "DROP FUNCTION IF EXISTS payments_amount_numeric_sync()",
+        "ALTER TABLE payments DROP COLUMN amount",
+        "ALTER TABLE payments RENAME COLUMN amount_numeric TO amount",
+        "ALTER TABLE payments ALTER COLUMN amount SET NOT NULL",
+        "ALTER TABLE payments DROP CONSTRAINT payments_amount_numeric_not_null",
+    ):
+        await conn.execute(text(statement))
+
+
+# message_logs -> monthly partitions. The old table is renamed and the
+# partitioned one takes its place at once, so new logs keep being written;
+# old rows are copied over in batches and the old table is dropped.
+
+MESSAGE_LOGS_LEGACY = "message_logs_legacy"
+MESSAGE_LOG_COLUMNS = ("log_id, user_id, telegram_username, telegram_first_name, event_type, "
+                       "content, raw_update_preview, timestamp, is_admin_event, target_user_id")
+
+
+async def _table_exists(conn: AsyncConnection, name: str) -> bool:
+    return bool((await conn.execute(
+        text("SELECT to_regclass(:name) IS NOT NULL"), {"name": name})).scalar())
+
+
+async def _message_logs_partition(conn: AsyncConnection) -> None:
+    async with AsyncSession(bind=conn) as session:
+        if await message_log_dal.message_logs_partitioned(session):
+            return
+        index_names = [index.name for index in MessageLog.__table__.indexes] + ["message_logs_pkey"]
+        for statement in [
+            f"ALTER TABLE message_logs RENAME TO {MESSAGE_LOGS_LEGACY}",
+            f"ALTER SEQUENCE IF EXISTS message_logs_log_id_seq RENAME TO {MESSAGE_LOGS_LEGACY}_log_id_seq",
+        ] + [
+            f"ALTER INDEX IF EXISTS {name} RENAME TO {name.replace('message_logs', MESSAGE_LOGS_LEGACY, 1)}"
+            for name in index_names
+        ]:
+            await conn.execute(text(statement))
+
+        await conn.run_sync(lambda sync_conn: MessageLog.__table__.create(sync_conn))
+        await conn.execute(text(
+            f"SELECT setval('message_logs_log_id_seq', "
+            f"(SELECT COALESCE(MAX(log_id), 0) + 1 FROM {MESSAGE_LOGS_LEGACY}), false)"))
+
+        oldest = (await conn.execute(text(
+            f"SELECT MIN(timestamp) FROM {MESSAGE_LOGS_LEGACY}"))).scalar()
+        this_month = datetime.now(timezone.utc).date().replace(day=1)
+        first_month = oldest.astimezone(timezone.utc).date().replace(day=1) if oldest else this_month
+        await message_log_dal.create_month_partitions(
+            session, min(first_month, this_month), message_log_dal.add_months(this_month, 2))
+
+
+async def _message_logs_copy_legacy(conn: AsyncConnection) -> None:
+    if not await _table_exists(conn, MESSAGE_LOGS_LEGACY):
+        return
+    legacy_max = (await conn.execute(text(
+        f"SELECT COALESCE(MAX(log_id), 0) FROM {MESSAGE_LOGS_LEGACY}"))).scalar()
+    # Batches commit in log_id order and new logs get ids above legacy_max,
+    # so after a crash the copy resumes past the highest legacy id copied
+    resume_after = (await conn.execute(text(
+        "SELECT COALESCE(MAX(log_id), 0) FROM message_logs WHERE log_id <= :legacy_max"
+    ), {"legacy_max": legacy_max})).scalar()
+    if resume_after:
+        logging.info(f"Migrator: resuming the message log copy after log_id {resume_after}")
+    copied = await backfill_in_batches(conn, f"""
+        INSERT INTO message_logs ({MESSAGE_LOG_COLUMNS})
+        SELECT log_id, user_id, telegram_username, telegram_first_name, event_type,
+               content, raw_update_preview, COALESCE(timestamp, now()), is_admin_event,
+               target_user_id
+        FROM {MESSAGE_LOGS_LEGACY}
+        WHERE log_id > :after
+        ORDER BY log_id
+        LIMIT :batch_size
+        RETURNING log_id
+    """, start_after=resume_after)
+
+    legacy_count = (await conn.execute(text(
+        f"SELECT COUNT(*) FROM {MESSAGE_LOGS_LEGACY}"))).scalar()
+    copied_count = (await conn.execute(text(
+        "SELECT COUNT(*) FROM message_logs WHERE log_id <= :legacy_max"
+    ), {"legacy_max": legacy_max})).scalar()
+    if copied_count != legacy_count:
+        # Keep the old table: the step stays pending and is looked at again
+        raise RuntimeError(
+            f"message log copy incomplete: {copied_count} of {legacy_count} rows "
+            f"in message_logs, {MESSAGE_LOGS_LEGACY} kept")
+    await conn.execute(text(f"DROP TABLE {MESSAGE_LOGS_LEGACY}"))
+    logging.info(f"Migrator: moved {copied_count} message logs into partitions ({copied} in this run)")
+
+
+# Daily rollups were backfilled by every bot process that found them empty
+# at startup, outside the migration lock; processes starting together added
+# the history more than once. Recompute them once, under the lock.
+
+async def _rollups_rebuild(conn: AsyncConnection) -> None:
+    async with AsyncSession(bind=conn) as session:
+        await rollup_dal.rebuild_rollups(session)
+
+
+# Rollup money columns: double precision -> numeric like payments.amount, so
+# the increments add up exactly. The tables hold a few rows per day, a
+# rewrite under the lock is short.
+ROLLUP_MONEY_COLUMNS = (("rollup_daily_revenue", "amount"), ("rollup_daily_campaigns", "revenue"))
+
+
+async def _rollups_money_numeric(conn: AsyncConnection) -> None:
+    for table, column in ROLLUP_MONEY_COLUMNS:
+        data_type = (await conn.execute(text(
+            "SELECT data_type FROM information_schema.columns "
+            "WHERE table_schema = current_schema() AND table_name = :table "
+            "AND column_name = :column"
+        ), {"table": table, "column": column})).scalar_one_or_none()
+        if data_type == "numeric":
+            continue
+        await conn.execute(text(
+            f"ALTER TABLE {table} ALTER COLUMN {column} TYPE NUMERIC(18, 8) "
+            f"USING round({column}::numeric, 8)"))
+
+
+MIGRATIONS = [
+    Migration(1, "create_missing_tables_and_columns", _create_missing_tables_and_columns),
+    Migration(2, "create_missing_indexes", _create_missing_indexes, transactional=False,
+              required=False),
+    Migration(3, "payments_amount_add_numeric_column", _payments_amount_add_numeric_column),
+    Migration(4, "payments_amount_backfill", _payments_amount_backfill, transactional=False),
+    Migration(5, "payments_amount_swap_columns", _payments_amount_swap_columns),
+    Migration(6, "message_logs_partition", _message_logs_partition),
+    Migration(7, "message_logs_copy_legacy", _message_logs_copy_legacy, transactional=False),
+    Migration(8, "create_keyset_pagination_indexes", _create_missing_indexes, transactional=False,
+              required=False),
+    Migration(9, "rollups_rebuild", _rollups_rebuild),
+    Migration(10, "rollups_money_numeric", _rollups_money_numeric),
+]
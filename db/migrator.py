@@ -1,13 +1,54 @@
+"""
+Versioned schema migrations.
+
+Applied versions are recorded in schema_migrations. On startup the runner
+reads that table and, if every step in db/migrations.py is applied, touches
+nothing else: no create_all, no schema inspection. Pending steps run once,
+in order, while the other bot processes wait on an advisory lock.
+
+A fresh database is created from the models and all steps are marked as
+applied, so the models must always describe the latest schema. Every schema
+change to the models needs a step as well (see db/migrations.py).
+"""
+import asyncio
 import logging
-from typing import Set
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, List, Sequence, Set
 
-from sqlalchemy import inspect, text
+from sqlalchemy import Index, inspect, insert, select, text
 from sqlalchemy.engine import Connection
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from .models import Base, SchemaMigration
+
+# pg_advisory_lock key held while migrations run
+MIGRATION_LOCK_KEY = 7_310_044
+
+LOCK_NOT_AVAILABLE_SQLSTATE = "55P03"
 
-from .models import Base
 
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    upgrade: Callable[[AsyncConnection], Awaitable[None]]
+    # False for steps that can't run in a transaction (CREATE INDEX CONCURRENTLY)
+    # or commit in batches themselves; they get an AUTOCOMMIT connection.
+    transactional: bool = True
+    # Transactional steps give up waiting for a table lock after this long and
+    # are retried, instead of queueing every query behind their ALTER TABLE
+    lock_timeout_ms: int = 3000
+    attempts: int = 5
+    # False: a failure is logged and the step stays pending until the next
+    # start, while the later steps still run (index builds that need the
+    # data fixed first shouldn't keep the bot from starting)
+    required: bool = True
 
-def _add_missing_columns(connection: Connection) -> None:
+
+def add_missing_columns(connection: Connection) -> None:
     inspector = inspect(connection)
     metadata = Base.metadata
 
@@ -52,15 +93,181 @@ def _add_missing_columns(connection: Connection) -> None:
             connection.execute(text(ddl))
 
 
-def run_simple_migrations(connection: Connection) -> None:
+def _invalid_indexes(connection: Connection) -> Set[str]:
+    """Indexes left INVALID by an interrupted CREATE INDEX CONCURRENTLY"""
+    rows = connection.execute(text(
+        "SELECT c.relname FROM pg_index i "
+        "JOIN pg_class c ON c.oid = i.indexrelid "
+        "JOIN pg_namespace n ON n.oid = c.relnamespace "
+        "WHERE NOT i.indisvalid AND n.nspname = current_schema()"
+    ))
+    return {row[0] for row in rows}
+
+
+def _create_index_ddl(index: Index, connection: Connection, concurrently: bool) -> str:
+    options = index.dialect_options["postgresql"]
+    previous = options.get("concurrently", False)
+    options["concurrently"] = concurrently
+    try:
+        return str(CreateIndex(index, if_not_exists=True).compile(dialect=connection.dialect))
+    finally:
+        options["concurrently"] = previous
+
+
+def sync_indexes(connection: Connection) -> None:
     """
-    Run lightweight, idempotent migrations:
-    - Ensure missing columns are added to existing tables to match models in db/models.py
-    Note: Table creation is handled separately via Base.metadata.create_all.
+    Create the indexes declared on the models (Index / index=True) that the
+    database lacks, and rebuild invalid ones. On PostgreSQL indexes are built
+    with CREATE INDEX CONCURRENTLY so tables stay writable; that can't run in
+    a transaction, so pass an AUTOCOMMIT connection. Every index is tried;
+    raises afterwards if any failed or is still invalid.
     """
-    try:
-        _add_missing_columns(connection)
-        logging.info("Migrator: schema synchronized (columns added as needed).")
-    except Exception as e:
-        logging.error(f"Migrator: failed to run simple migrations: {e}", exc_info=True)
-        raise
\ No newline at end of file
+    postgres = connection.dialect.name == "postgresql"
+    inspector = inspect(connection)
+    existing_tables: Set[str] = set(inspector.get_table_names())
+    invalid = _invalid_indexes(connection) if postgres else set()
+    preparer = connection.dialect.identifier_preparer
+    attempted: Set[str] = set()
+    failed: List[str] = []
+
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            # New tables get their indexes from create_all
+            continue
+        if table.dialect_options["postgresql"].get("partition_by"):
+            # No CONCURRENTLY on partitioned tables; give such indexes their own step
+            continue
+        existing_indexes = {ix["name"] for ix in inspector.get_indexes(table.name)}
+
+        for index in sorted(table.indexes, key=lambda ix: ix.name):
+            if index.name in existing_indexes and index.name not in invalid:
+                continue
+            if index.name in invalid:
+                logging.warning(f"Migrator: rebuilding invalid index {index.name}")
+                connection.execute(text(
+                    f"DROP INDEX {'CONCURRENTLY ' if postgres else ''}IF EXISTS {preparer.quote(index.name)}"))
+
+            started = time.monotonic()
+            attempted.add(index.name)
+            logging.info(f"Migrator: creating missing index {index.name} on {table.name}")
+            try:
+                connection.execute(text(_create_index_ddl(index, connection, concurrently=postgres)))
+            except Exception as e:
+                # E.g. duplicates for a unique index: go on with the others
+                logging.error(f"Migrator: failed to create index {index.name}: {e}")
+                failed.append(index.name)
+                continue
+            logging.info(
+                f"Migrator: index {index.name} created in {time.monotonic() - started:.1f}s")
+
+    # A cancelled concurrent build leaves the index behind, INVALID
+    still_invalid = (_invalid_indexes(connection) & attempted) if postgres else set()
+    not_built = sorted(set(failed) | still_invalid)
+    if not_built:
+        raise RuntimeError(f"indexes not built: {', '.join(not_built)}")
+
+
+async def backfill_in_batches(connection: AsyncConnection, sql: str,
+                              batch_size: int = 5000, pause_seconds: float = 0.05,
+                              start_after: int = 0) -> int:
+    """
+    Walk a table by key: `sql` updates at most :batch_size rows with a key
+    above :after and RETURNs their keys. With an AUTOCOMMIT connection every
+    batch commits on its own, so row locks stay short; `start_after` resumes
+    an interrupted walk. Returns the row count.
+    """
+    total = 0
+    batches = 0
+    after = start_after
+    while True:
+        result = await connection.execute(text(sql), {"after": after, "batch_size": batch_size})
+        keys = result.scalars().all()
+        if not keys:
+            return total
+        after = max(keys)
+        total += len(keys)
+        batches += 1
+        if batches % 20 == 0:
+            logging.info(f"Migrator: backfilled {total} rows so far")
+        # Leave room for the bot's own queries between batches
+        await asyncio.sleep(pause_seconds)
+
+
+def _is_lock_timeout(error: DBAPIError) -> bool:
+    orig = error.orig
+    code = getattr(orig, "sqlstate", None) or getattr(orig, "pgcode", None)
+    return code == LOCK_NOT_AVAILABLE_SQLSTATE
+
+
+async def _record(connection: AsyncConnection, migration: Migration) -> None:
+    await connection.execute(insert(SchemaMigration).values(
+        version=migration.version, name=migration.name))
+
+
+async def _apply(engine: AsyncEngine, autocommit_conn: AsyncConnection,
+                 migration: Migration) -> None:
+    label = f"{migration.version} ({migration.name})"
+    started = time.monotonic()
+    logging.info(f"Migrator: applying {label}")
+    if not migration.transactional:
+        await migration.upgrade(autocommit_conn)
+        await _record(autocommit_conn, migration)
+    else:
+        for attempt in range(1, migration.attempts + 1):
+            try:
+                async with engine.begin() as conn:
+                    if conn.dialect.name == "postgresql":
+                        await conn.execute(text(
+                            f"SET LOCAL lock_timeout = '{int(migration.lock_timeout_ms)}ms'"))
+                    await migration.upgrade(conn)
+                    await _record(conn, migration)
+                break
+            except DBAPIError as e:
+                if not _is_lock_timeout(e) or attempt == migration.attempts:
+                    raise
+                delay = min(30.0, 2.0 ** attempt)
+                logging.warning(
+                    f"Migrator: {label} could not get a lock (attempt {attempt}), retrying in {delay:.0f}s")
+                await asyncio.sleep(delay)
+    logging.info(f"Migrator: applied {label} in {time.monotonic() - started:.1f}s")
+
+
+async def run_migrations(engine: AsyncEngine, migrations: Sequence[Migration]) -> None:
+    migrations = sorted(migrations, key=lambda m: m.version)
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        postgres = conn.dialect.name == "postgresql"
+        if postgres:
+            await conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+        try:
+            await conn.execute(CreateTable(SchemaMigration.__table__, if_not_exists=True))
+            applied = set((await conn.execute(select(SchemaMigration.version))).scalars())
+            pending: List[Migration] = [m for m in migrations if m.version not in applied]
+            if not pending:
+                logging.info(f"Migrator: schema is current (version {max(applied, default=0)})")
+                return
+
+            fresh_database = not applied and not await conn.run_sync(
+                lambda sync_conn: inspect(sync_conn).has_table("users"))
+            if fresh_database:
+                async with engine.begin() as tx:
+                    await tx.run_sync(Base.metadata.create_all)
+                    for migration in migrations:
+                        await _record(tx, migration)
+                logging.info(
+                    f"Migrator: created a new schema at version {migrations[-1].version}")
+                return
+
+            for migration in pending:
+                try:
+                    await _apply(engine, conn, migration)
+                except Exception as e:
+                    if migration.required:
+                        raise
+                    logging.error(
+                        f"Migrator: {migration.version} ({migration.name}) failed, "
+                        f"will retry on the next start: {e}")
+        finally:
+            if postgres:
+                await conn.execute(
+                    text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY})
@@ -1,8 +1,9 @@
-from sqlalchemy import create_engine, Column, Integer, String, Boolean, DateTime, Float, ForeignKey, UniqueConstraint, Text, BigInteger
+from sqlalchemy import create_engine, Column, Integer, SmallInteger, String, Boolean, Date, DateTime, Float, Numeric, ForeignKey, UniqueConstraint, Text, BigInteger, Index
 from sqlalchemy.orm import relationship, DeclarativeBase
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.asyncio import AsyncAttrs
-from sqlalchemy.sql import func
-from datetime import datetime
+from sqlalchemy.sql import func, true
+from datetime import datetime, timezone
 
 
 class Base(AsyncAttrs, DeclarativeBase):
@@ -20,10 +21,14 @@ class User(Base):
     registration_date = Column(DateTime(timezone=True),
                                server_default=func.now())
     is_banned = Column(Boolean, default=False)
+    # Set when Telegram reports the bot blocked / chat not found; broadcasts skip these users
+    unreachable_reason = Column(String, nullable=True)
+    unreachable_since = Column(DateTime(timezone=True), nullable=True)
     panel_user_uuid = Column(String, nullable=True, unique=True, index=True)
     referred_by_id = Column(BigInteger,
                             ForeignKey("users.user_id"),
                             nullable=True)
+    trial_activated_at = Column(DateTime(timezone=True), nullable=True)
 
     referrer = relationship("User", remote_side=[user_id], backref="referrals")
     subscriptions = relationship("Subscription",
@@ -45,6 +50,16 @@ class User(Base):
         back_populates="target_user",
         cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # Partial: only banned users, for the statistics counter
+        Index('ix_users_banned', 'user_id', postgresql_where=(is_banned == True)),
+        # Referral lookups by referrer; most users have no referrer
+        Index('ix_users_referred_by_id', 'referred_by_id',
+              postgresql_where=referred_by_id.is_not(None)),
+        # Case-insensitive username search (get_user_by_username)
+        Index('ix_users_username_lower', func.lower(username)),
+    )
+
     def __repr__(self):
         return f"<User(user_id={self.user_id}, username='{self.username}')>"
 
@@ -76,6 +91,9 @@ class Subscription(Base):
 
     user = relationship("User", back_populates="subscriptions")
 
+    # Active subscription of a user
+    __table_args__ = (Index('ix_subscriptions_user_active_end', 'user_id', 'is_active', 'end_date'), )
+
     def __repr__(self):
         return f"<Subscription(id={self.subscription_id}, user_id={self.user_id}, panel_uuid='{self.panel_user_uuid}', ends='{self.end_date}')>"
 
@@ -95,7 +113,8 @@ class Payment(Base):
     provider_payment_id = Column(String, unique=True, nullable=True)
     provider = Column(String, nullable=False, default="yookassa", index=True)
     idempotence_key = Column(String, unique=True, nullable=True)
-    amount = Column(Float, nullable=False)
+    # Exact in the database, float in Python like before (migration 3-5)
+    amount = Column(Numeric(18, 8, asdecimal=False), nullable=False)
     currency = Column(String, nullable=False)
     status = Column(String, nullable=False, index=True)
     description = Column(String, nullable=True)
@@ -109,6 +128,9 @@ class Payment(Base):
                         nullable=True)
 
     user = relationship("User", back_populates="payments")
+
+    # Succeeded payments by period (statistics, rollup rebuilds)
+    __table_args__ = (Index('ix_payments_status_created_at', 'status', 'created_at'), )
     promo_code_used = relationship("PromoCode",
                                    back_populates="payments_where_used")
 
@@ -181,15 +203,17 @@ class PromoCodeActivation(Base):
     user = relationship("User", back_populates="promo_code_activations")
     payment = relationship("Payment")
 
-    __table_args__ = (UniqueConstraint('promo_code_id',
-                                       'user_id',
-                                       name='uq_promo_user_activation'), )
+    __table_args__ = (
+        UniqueConstraint('promo_code_id', 'user_id', name='uq_promo_user_activation'),
+        # Keyset pages of one promo code's activations, newest first
+        Index("ix_promo_code_activations_code_activation", "promo_code_id", "activation_id"),
+    )
 
 
 class MessageLog(Base):
     __tablename__ = "message_logs"
 
-    log_id = Column(Integer, primary_key=True, autoincrement=True)
+    log_id = Column(BigInteger, primary_key=True, autoincrement=True)
     user_id = Column(BigInteger,
                      ForeignKey("users.user_id"),
                      nullable=True,
@@ -199,7 +223,10 @@ class MessageLog(Base):
     event_type = Column(String, nullable=False, index=True)
     content = Column(Text, nullable=True)
     raw_update_preview = Column(Text, nullable=True)
+    # Partition key, so it is part of the primary key
     timestamp = Column(DateTime(timezone=True),
+                       primary_key=True,
+                       default=lambda: datetime.now(timezone.utc),
                        server_default=func.now(),
                        index=True)
     is_admin_event = Column(Boolean, default=False)
@@ -215,6 +242,9 @@ class MessageLog(Base):
                                foreign_keys=[target_user_id],
                                back_populates="message_logs_targeted")
 
+    # Monthly partitions (message_logs_y2025m01, ...), see message_log_dal
+    __table_args__ = {"postgresql_partition_by": "RANGE (timestamp)"}
+
 
 class PanelSyncStatus(Base):
     __tablename__ = "panel_sync_status"
@@ -258,4 +288,121 @@ class AdAttribution(Base):
     trial_activated_at = Column(DateTime(timezone=True), nullable=True)
 
     user = relationship("User")
-    campaign = relationship("AdCampaign", back_populates="attributions")
\ No newline at end of file
+    campaign = relationship("AdCampaign", back_populates="attributions")
+
+class BroadcastJob(Base):
+    __tablename__ = "broadcast_jobs"
+
+    job_id = Column(Integer, primary_key=True, autoincrement=True)
+    admin_id = Column(BigInteger, nullable=True, index=True)
+    # running <-> paused -> completed / cancelled
+    status = Column(String, nullable=False, default="running", index=True)
+    target = Column(String, nullable=False, default="all")
+    content_type = Column(String, nullable=False, default="text")
+    file_id = Column(String, nullable=True)
+    text = Column(Text, nullable=True)
+    total_recipients = Column(Integer, nullable=False, default=0)
+    # False while the audience is still being copied into broadcast_recipients
+    audience_complete = Column(Boolean, nullable=False, default=False, server_default=true())
+    sent_count = Column(Integer, nullable=False, default=0)
+    failed_count = Column(Integer, nullable=False, default=0)
+    # Admin message that shows the job progress
+    progress_chat_id = Column(BigInteger, nullable=True)
+    progress_message_id = Column(Integer, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    def __repr__(self):
+        return f"<BroadcastJob(id={self.job_id}, status='{self.status}', sent={self.sent_count}/{self.total_recipients})>"
+
+
+class BroadcastRecipient(Base):
+    __tablename__ = "broadcast_recipients"
+
+    job_id = Column(Integer, ForeignKey("broadcast_jobs.job_id", ondelete="CASCADE"), primary_key=True)
+    user_id = Column(BigInteger, primary_key=True)
+    # pending / sent / failed
+    status = Column(String, nullable=False, default="pending")
+    error = Column(String, nullable=True)
+    processed_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (Index('ix_broadcast_recipients_job_status', 'job_id', 'status'), )
+
+
+class OutboxMessage(Base):
+    """Queued bot call shared by all bot processes (MESSAGE_QUEUE_BACKEND=postgres)"""
+    __tablename__ = "message_outbox"
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    chat_id = Column(BigInteger, nullable=False)
+    method_name = Column(String, nullable=False)
+    payload = Column(JSONB, nullable=False)
+    priority = Column(Integer, nullable=False, default=1)
+    # pending -> sending (claimed by locked_by); the row is deleted once handled
+    status = Column(String, nullable=False, default="pending")
+    locked_by = Column(String, nullable=True)
+    locked_at = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index('ix_message_outbox_claim', 'status', 'priority', 'id'),
+        Index('ix_message_outbox_chat_status', 'chat_id', 'status'),
+    )
+
+
+class RateLedgerBucket(Base):
+    """Token bucket for Telegram sends, shared by all bot processes"""
+    __tablename__ = "telegram_rate_ledger"
+
+    bucket = Column(String, primary_key=True)
+    tokens = Column(Float, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    # Tokens handed out by the last lease
+    granted = Column(Integer, nullable=False, default=0)
+
+
+# Daily rollups for the admin dashboards, see db/dal/rollup_dal.py.
+# Days are UTC dates; `shard` spreads concurrent increments of the same day
+# over several rows, readers sum over it.
+class DailyRevenueRollup(Base):
+    __tablename__ = "rollup_daily_revenue"
+
+    day = Column(Date, primary_key=True)
+    provider = Column(String, primary_key=True)
+    currency = Column(String, primary_key=True)
+    shard = Column(SmallInteger, primary_key=True, default=0)
+    amount = Column(Numeric(18, 8, asdecimal=False), nullable=False, server_default="0")
+    payments_count = Column(Integer, nullable=False, server_default="0")
+
+
+class DailyUserRollup(Base):
+    __tablename__ = "rollup_daily_users"
+
+    day = Column(Date, primary_key=True)
+    shard = Column(SmallInteger, primary_key=True, default=0)
+    new_users = Column(Integer, nullable=False, server_default="0")
+    trials = Column(Integer, nullable=False, server_default="0")
+
+
+class DailyCampaignRollup(Base):
+    __tablename__ = "rollup_daily_campaigns"
+
+    day = Column(Date, primary_key=True)
+    ad_campaign_id = Column(Integer, primary_key=True, index=True)
+    shard = Column(SmallInteger, primary_key=True, default=0)
+    starts = Column(Integer, nullable=False, server_default="0")
+    trials = Column(Integer, nullable=False, server_default="0")
+    # Users whose first succeeded payment was on this day
+    payers = Column(Integer, nullable=False, server_default="0")
+    payments_count = Column(Integer, nullable=False, server_default="0")
+    revenue = Column(Numeric(18, 8, asdecimal=False), nullable=False, server_default="0")
+
+
+class SchemaMigration(Base):
+    """Applied versions of db/migrations.py"""
+    __tablename__ = "schema_migrations"
+
+    version = Column(Integer, primary_key=True, autoincrement=False)
+    name = Column(String, nullable=False)
+    applied_at = Column(DateTime(timezone=True), server_default=func.now())
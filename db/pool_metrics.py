@@ -0,0 +1,116 @@
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+# Checkouts that waited longer than this are logged (at most once per interval)
+SLOW_CHECKOUT_SECONDS = 1.0
+SLOW_CHECKOUT_LOG_INTERVAL_SECONDS = 60.0
+
+
+class PoolMetrics:
+    """Counters shared by InstrumentedQueuePool and the pool event listeners"""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.connects = 0
+        self.connect_errors = 0
+        self.timeouts = 0
+        self.invalidations = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.slow_checkouts = 0
+        self._slow_logged_at = 0.0
+
+    def record_wait(self, seconds: float, pool: "InstrumentedQueuePool") -> None:
+        self.checkouts += 1
+        self.wait_seconds_total += seconds
+        self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+        if seconds < SLOW_CHECKOUT_SECONDS:
+            return
+        self.slow_checkouts += 1
+        now = time.monotonic()
+        if now - self._slow_logged_at >= SLOW_CHECKOUT_LOG_INTERVAL_SECONDS:
+            self._slow_logged_at = now
+            logging.warning(
+                f"DB pool starvation: waited {seconds:.2f}s for a connection "
+                f"({pool.status()}, {self.slow_checkouts} slow checkouts so far)")
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "checkouts": self.checkouts,
+            "connects": self.connects,
+            "connect_errors": self.connect_errors,
+            "timeouts": self.timeouts,
+            "invalidations": self.invalidations,
+            "slow_checkouts": self.slow_checkouts,
+            "wait_ms_avg": round(self.wait_seconds_total / self.checkouts * 1000, 2)
+            if self.checkouts else 0.0,
+            "wait_ms_max": round(self.wait_seconds_max * 1000, 2),
+        }
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """
+    AsyncAdaptedQueuePool that times how long each checkout waits for a
+    connection (including opening a new one) and counts timeouts and failures
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.metrics.timeouts += 1
+            raise
+        except Exception:
+            self.metrics.connect_errors += 1
+            raise
+        self.metrics.record_wait(time.perf_counter() - started, self)
+        return connection
+
+    def recreate(self):
+        # Keep the counters when the engine recreates its pool (e.g. after dispose)
+        new_pool = super().recreate()
+        new_pool.metrics = self.metrics
+        return new_pool
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """Count new and invalidated connections of an engine using InstrumentedQueuePool"""
+    pool = engine.sync_engine.pool
+    if not isinstance(pool, InstrumentedQueuePool):
+        return
+    metrics = pool.metrics
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        metrics.connects += 1
+
+    @event.listens_for(engine.sync_engine, "invalidate")
+    def _on_invalidate(dbapi_connection, connection_record, exception):
+        metrics.invalidations += 1
+
+
+def get_pool_stats(engine: Optional[AsyncEngine]) -> Optional[Dict[str, Any]]:
+    """Live pool state plus the counters collected since startup"""
+    if engine is None:
+        return None
+    pool = engine.sync_engine.pool
+    if not isinstance(pool, InstrumentedQueuePool):
+        return None
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": max(0, pool.overflow()),
+        **pool.metrics.as_dict(),
+    }
@@ -0,0 +1,168 @@
+"""
+SQL statement counting and timing.
+
+Engine event listeners time every statement. Inside an update (see
+bot/middlewares/query_stats.py) the statements are also collected on the
+update's UpdateQueryStats, held in a context variable: SQLAlchemy runs
+asyncpg calls in a greenlet that shares the task's context, so queries are
+attributed to the update whose handler issued them. Tasks the handler
+starts (broadcasts, exports) inherit the variable; their statements stop
+counting once the update is finished. Parameter values are never logged,
+only their types.
+"""
+import logging
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from config.settings import Settings
+
+STATEMENT_LOG_CHARS = 300
+# Handlers kept in the per-handler totals (the rest is folded into "other")
+MAX_TRACKED_HANDLERS = 200
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+class UpdateQueryStats:
+    """Statements run while handling one update"""
+
+    def __init__(self, update_id: Optional[int], event_type: str):
+        self.update_id = update_id
+        # router:handler once the handler is known
+        self.tag = event_type
+        self.queries = 0
+        self.seconds = 0.0
+        self.statements: Counter = Counter()
+        # Set once the update is handled; tasks started by the handler inherit
+        # the context variable and must not add to it afterwards
+        self.finished = False
+
+    def record(self, statement: str, seconds: float) -> None:
+        self.queries += 1
+        self.seconds += seconds
+        self.statements[statement] += 1
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int]]:
+        return [(statement, count) for statement, count in self.statements.most_common(3)
+                if count >= threshold]
+
+
+class HandlerQueryTotals:
+    def __init__(self):
+        self.updates = 0
+        self.queries = 0
+        self.seconds = 0.0
+        self.max_queries = 0
+
+    def add(self, stats: UpdateQueryStats) -> None:
+        self.updates += 1
+        self.queries += stats.queries
+        self.seconds += stats.seconds
+        self.max_queries = max(self.max_queries, stats.queries)
+
+
+current_query_stats: ContextVar[Optional[UpdateQueryStats]] = ContextVar(
+    "current_query_stats", default=None)
+_handler_totals: Dict[str, HandlerQueryTotals] = {}
+
+
+def _short_statement(statement: str) -> str:
+    statement = _WHITESPACE_RE.sub(" ", statement).strip()
+    if len(statement) > STATEMENT_LOG_CHARS:
+        return statement[:STATEMENT_LOG_CHARS] + "..."
+    return statement
+
+
+def redact_parameters(parameters: Any, executemany: bool = False) -> str:
+    """Parameter types instead of values, e.g. (int, str)"""
+    if executemany:
+        rows = list(parameters or [])
+        return f"{len(rows)} rows of {redact_parameters(rows[0]) if rows else '()'}"
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{key}: {type(value).__name__}"
+                               for key, value in parameters.items()) + "}"
+    if isinstance(parameters, (list, tuple)):
+        return "(" + ", ".join(type(value).__name__ for value in parameters) + ")"
+    return "()"
+
+
+def instrument_queries(engine: AsyncEngine, settings: Settings, name: str) -> None:
+    """Time the statements of `engine` and log the slow ones (`name` tags the log lines)"""
+    if not settings.DB_QUERY_STATS_ENABLED:
+        return
+    slow_seconds = settings.DB_SLOW_QUERY_MS / 1000
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get("query_started")
+        if not started:
+            return
+        seconds = time.perf_counter() - started.pop()
+        stats = current_query_stats.get()
+        if stats is not None and stats.finished:
+            stats = None
+        if stats is not None:
+            stats.record(statement, seconds)
+        if slow_seconds > 0 and seconds >= slow_seconds:
+            logging.warning(
+                f"Slow query ({name}, {seconds * 1000:.0f} ms, "
+                f"{stats.tag if stats else 'background'}): {_short_statement(statement)} "
+                f"params={redact_parameters(parameters, executemany)}")
+
+    @event.listens_for(engine.sync_engine, "handle_error")
+    def _handle_error(exception_context):
+        # Failed statements never reach after_cursor_execute
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_started"):
+            conn.info["query_started"].pop()
+
+
+def finish_update(stats: UpdateQueryStats, settings: Settings) -> None:
+    """Add an update to its handler's totals and warn about query-heavy ones"""
+    stats.finished = True
+    totals = _handler_totals.get(stats.tag)
+    if totals is None:
+        tag = stats.tag if len(_handler_totals) < MAX_TRACKED_HANDLERS else "other"
+        totals = _handler_totals.setdefault(tag, HandlerQueryTotals())
+    totals.add(stats)
+
+    if not stats.queries:
+        return
+    if settings.DB_QUERIES_PER_UPDATE_WARN and stats.queries > settings.DB_QUERIES_PER_UPDATE_WARN:
+        logging.warning(
+            f"Update {stats.update_id} ({stats.tag}) ran {stats.queries} queries "
+            f"in {stats.seconds * 1000:.0f} ms")
+    if settings.DB_REPEATED_QUERY_WARN:
+        for statement, count in stats.repeated(settings.DB_REPEATED_QUERY_WARN):
+            logging.warning(
+                f"Update {stats.update_id} ({stats.tag}) ran the same query {count} times, "
+                f"likely N+1: {_short_statement(statement)}")
+    logging.debug(
+        f"Update {stats.update_id} ({stats.tag}): {stats.queries} queries, "
+        f"{stats.seconds * 1000:.1f} ms")
+
+
+def get_handler_query_stats(limit: int = 5) -> List[Dict[str, Any]]:
+    """Handlers with the most queries per update since startup"""
+    rows = [
+        {
+            "handler": tag,
+            "updates": totals.updates,
+            "avg_queries": round(totals.queries / totals.updates, 1),
+            "max_queries": totals.max_queries,
+            "avg_ms": round(totals.seconds / totals.updates * 1000, 1),
+        }
+        for tag, totals in _handler_totals.items() if totals.updates
+    ]
+    rows.sort(key=lambda row: row["avg_queries"], reverse=True)
+    return rows[:limit]
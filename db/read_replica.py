@@ -0,0 +1,133 @@
+"""
+Routing of read-only work to an optional streaming replica.
+
+ReadSessionRouter is used like a session factory (`async with router() as
+session`). It hands out replica sessions while the replica answers and its
+replay lag stays within the limit, and primary sessions otherwise, so admin
+reads keep working when the replica is down or behind. Only code that never
+writes may use it: a replica session can't commit changes.
+"""
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+# Seconds the replica may take to answer the lag query
+LAG_QUERY_TIMEOUT_SECONDS = 2.0
+
+# Zero on a primary and on an idle replica that streams from it and has
+# replayed everything it received. A replica that isn't streaming (receiver
+# disconnected) has received nothing new either, so its lag is the age of
+# the last replayed transaction; NULL if it never replayed one. The
+# receiver status is only visible with pg_read_all_stats; without it an idle
+# replica counts as lagging and reads go to the primary.
+REPLICA_LAG_SQL = text(
+    "SELECT CASE "
+    "WHEN NOT pg_is_in_recovery() THEN 0 "
+    "WHEN EXISTS (SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming') "
+    "AND pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) "
+    "END"
+)
+
+
+class ReadSessionRouter:
+
+    def __init__(self, primary_factory: sessionmaker,
+                 replica_factory: Optional[sessionmaker] = None,
+                 max_lag_seconds: float = 30, check_interval_seconds: float = 10):
+        self.primary_factory = primary_factory
+        self.replica_factory = replica_factory
+        self.max_lag_seconds = max_lag_seconds
+        self.check_interval_seconds = check_interval_seconds
+        # None until the first check
+        self.replica_usable: Optional[bool] = None
+        self.last_lag_seconds: Optional[float] = None
+        self.replica_sessions = 0
+        self.primary_sessions = 0
+        self._checked_at: Optional[float] = None
+        self._check_lock = asyncio.Lock()
+
+    @property
+    def configured(self) -> bool:
+        return self.replica_factory is not None
+
+    def __call__(self):
+        return self._session()
+
+    @asynccontextmanager
+    async def _session(self) -> AsyncIterator[AsyncSession]:
+        if not await self._replica_ok():
+            self.primary_sessions += 1
+            async with self.primary_factory() as session:
+                yield session
+            return
+
+        self.replica_sessions += 1
+        async with self.replica_factory() as session:
+            try:
+                yield session
+            except DBAPIError as e:
+                if e.connection_invalidated:
+                    # Lost the replica mid-query: next reads go to the primary
+                    self._mark(False, f"connection lost: {e.orig}")
+                raise
+
+    async def _replica_ok(self) -> bool:
+        if self.replica_factory is None:
+            return False
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.check_interval_seconds:
+            return bool(self.replica_usable)
+        async with self._check_lock:
+            # Another session may have checked while this one waited for the lock
+            if self._checked_at is not None and time.monotonic() - self._checked_at < self.check_interval_seconds:
+                return bool(self.replica_usable)
+            await self._check_lag()
+            self._checked_at = time.monotonic()
+        return bool(self.replica_usable)
+
+    async def _check_lag(self) -> None:
+        try:
+            async with self.replica_factory() as session:
+                lag = await asyncio.wait_for(
+                    session.scalar(REPLICA_LAG_SQL), timeout=LAG_QUERY_TIMEOUT_SECONDS)
+        except Exception as e:
+            self.last_lag_seconds = None
+            self._mark(False, f"unavailable: {e}")
+            return
+        if lag is None:
+            self.last_lag_seconds = None
+            self._mark(False, "not streaming, nothing replayed yet")
+            return
+        self.last_lag_seconds = float(lag)
+        if self.last_lag_seconds > self.max_lag_seconds:
+            self._mark(False, f"lag {self.last_lag_seconds:.1f}s over {self.max_lag_seconds:.0f}s")
+        else:
+            self._mark(True, f"lag {self.last_lag_seconds:.1f}s")
+
+    def _mark(self, usable: bool, reason: str) -> None:
+        if usable == self.replica_usable:
+            return
+        self.replica_usable = usable
+        if usable:
+            logging.info(f"Read replica in use ({reason})")
+        else:
+            logging.warning(f"Read replica not used, reads go to the primary ({reason})")
+            # Re-check after the interval, not right away
+            self._checked_at = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "replica_usable": self.replica_usable,
+            "lag_seconds": self.last_lag_seconds,
+            "max_lag_seconds": self.max_lag_seconds,
+            "replica_sessions": self.replica_sessions,
+            "primary_sessions": self.primary_sessions,
+        }